@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Reddit-Deeplearning-Imagetool-Benchmarks
+=========================================
+Benchmarks written for the Reddit-Deeplearning-Imagetool
+Run them as modules from the root of the repository, e.g.:
+
+    python -m benchmarks.bench_sqlite_profiles
+"""
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Compares memory and lookup speed of the seen set backends
+Random reddit post ids (base 36, like 'hx3k2a') are added to every backend,
+then the same amount of stored and unknown ids is looked up. The Bloom
+filter also reports its measured false positive rate.
+"""
+import argparse
+import random
+import time
+
+from helper.dedup.SeenSet import SEEN_SET_BACKENDS, create_seen_set
+
+BASE_36 = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def base36(number):
+    digits = []
+    while number:
+        number, digit = divmod(number, 36)
+        digits.append(BASE_36[digit])
+    return ''.join(reversed(digits)) or '0'
+
+
+def post_ids(amount, seed):
+    """Distinct ids in the range of current reddit posts"""
+    numbers = random.Random(seed).sample(range(36 ** 5, 36 ** 7), amount)
+    return [base36(number) for number in numbers]
+
+
+def time_lookups(seen_set, keys):
+    """Mean microseconds per lookup and the amount of keys found"""
+    started = time.perf_counter()
+    found = sum(key in seen_set for key in keys)
+    return (time.perf_counter() - started) / len(keys) * 1e6, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--ids", type=int, default=10_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--error_rate", type=float, default=0.001)
+    parser.add_argument("--backends", nargs='+', choices=list(SEEN_SET_BACKENDS), default=list(SEEN_SET_BACKENDS))
+    args = parser.parse_args()
+
+    ids = post_ids(args.ids + args.lookups, seed=0)
+    unknown_ids = ids[args.ids:]
+    ids = ids[:args.ids]
+    stored_ids = random.Random(1).sample(ids, min(args.lookups, args.ids))
+
+    options = {
+        'exact': {'capacity': args.ids},
+        'bloom': {'capacity': args.ids, 'error_rate': args.error_rate},
+    }
+    print(f"{args.ids} ids, {args.lookups} lookups")
+    print(f"{'backend':>8} {'MiB':>10} {'bytes/id':>10} {'add s':>8} {'hit us':>8} {'miss us':>8} {'false pos':>10}")
+    for backend in args.backends:
+        started = time.perf_counter()
+        seen_set = create_seen_set(backend, **options.get(backend, {}))
+        seen_set.update(ids)
+        add_seconds = time.perf_counter() - started
+
+        hit_us, _ = time_lookups(seen_set, stored_ids)
+        miss_us, false_positives = time_lookups(seen_set, unknown_ids)
+        memory_bytes = seen_set.memory_bytes
+        print(f"{backend:>8} {memory_bytes / 1024 ** 2:>10.1f} {memory_bytes / args.ids:>10.1f} "
+              f"{add_seconds:>8.1f} {hit_us:>8.2f} {miss_us:>8.2f} {false_positives / len(unknown_ids):>10.5f}")
+        del seen_set
+
+
+if __name__ == '__main__':
+    main()
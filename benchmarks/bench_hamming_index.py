@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Compares near-duplicate query latency against the index size
+Random 64 bit hashes are indexed, the queries are stored hashes with a few
+flipped bits. Multi-index hashing and the BK-tree are compared to a
+brute-force NumPy scan.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from core.image.HammingIndex import BKTree, MultiIndexHashing
+from core.image.ImageHasher import hamming_distance
+
+
+def near_duplicates(hashes, amount, flipped_bits, random):
+    queries = hashes[random.integers(0, len(hashes), size=amount)].copy()
+    for position in range(amount):
+        for bit in random.choice(64, flipped_bits, replace=False):
+            queries[position] ^= np.uint64(1 << int(bit))
+    return queries
+
+
+def time_queries(query, queries, radius):
+    """Mean milliseconds per query"""
+    started = time.perf_counter()
+    for query_hash in queries:
+        query(query_hash, radius)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--radius", type=int, default=6)
+    parser.add_argument("--bk_tree_limit", type=int, default=100000,
+                        help="Largest index size the (pure Python) BK-tree is built for")
+    args = parser.parse_args()
+
+    random = np.random.default_rng(0)
+    print(f"radius {args.radius}, {args.queries} queries, mean ms/query")
+    print(f"{'size':>10} {'brute force':>12} {'multi-index':>12} {'bk-tree':>12}")
+    for size in args.sizes:
+        hashes = random.integers(0, 2 ** 64 - 1, size=size, dtype=np.uint64)
+        ids = list(range(size))
+        queries = near_duplicates(hashes, args.queries, args.radius // 2, random)
+
+        def brute_force(query_hash, radius):
+            return np.flatnonzero(hamming_distance(hashes, query_hash) <= radius)
+
+        multi_index = MultiIndexHashing()
+        multi_index.add(ids, hashes)
+        multi_index.query(queries[0], args.radius)  # builds the sorted chunks
+
+        bk_tree_ms = float('nan')
+        if size <= args.bk_tree_limit:
+            bk_tree = BKTree()
+            bk_tree.add(ids, hashes)
+            bk_tree_ms = time_queries(bk_tree.query, queries, args.radius)
+
+        print(f"{size:>10} {time_queries(brute_force, queries, args.radius):>12.3f} "
+              f"{time_queries(multi_index.query, queries, args.radius):>12.3f} {bk_tree_ms:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Compares peak memory and CPU time of the listing parsers
+Every parser turns listing pages of 100 posts into RedditDataHolders.
+'response.json' is the former path, which builds the whole listing with
+all unused fields before picking the needed ones.
+
+Recorded pages are read from --pages_dir (*.json), otherwise synthetic
+pages with previews, awards and media like reddit's are generated.
+"""
+import argparse
+import glob
+import json
+import time
+import tracemalloc
+
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.helper.RedditListingParser import PARSER_BACKENDS, parse_listing
+from helper.replay.SyntheticData import synthetic_listing
+
+
+def former_path(reddit, content):
+    children = json.loads(content)['data']['children']
+    return [reddit._get_child_info(child['data'], 'top', 'day') for child in children]
+
+
+def projected_path(reddit, content, backend):
+    children, _ = parse_listing(content, backend)
+    return [reddit._get_child_info(child, 'top', 'day') for child in children]
+
+
+def measure(parse, pages):
+    """CPU milliseconds per page and peak KiB of a single page"""
+    started = time.process_time()
+    for content in pages:
+        parse(content)
+    cpu_ms = (time.process_time() - started) / len(pages) * 1000
+
+    tracemalloc.start()
+    parse(pages[0])
+    peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+    tracemalloc.stop()
+    return cpu_ms, peak_kib
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages_dir", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.pages_dir:
+        pages = []
+        for path in sorted(glob.glob(f'{args.pages_dir}/*.json')):
+            with open(path, 'rb') as page_file:
+                pages.append(page_file.read())
+    else:
+        pages = [synthetic_listing(page) for page in range(args.pages)]
+
+    reddit = RedditChecker([], db_file_path=None, google_workers=0)
+    parsers = {'response.json': lambda content: former_path(reddit, content)}
+    for backend in PARSER_BACKENDS:
+        parsers[backend] = lambda content, backend=backend: projected_path(reddit, content, backend)
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB per page")
+    print(f"{'parser':>14} {'cpu ms/page':>12} {'peak KiB':>10}")
+    for name, parse in parsers.items():
+        cpu_ms, peak_kib = measure(parse, pages)
+        print(f"{name:>14} {cpu_ms:>12.2f} {peak_kib:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
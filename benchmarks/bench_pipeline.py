@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Measures the whole ingest pipeline without a network
+Subreddits are fetched, parsed, formatted and inserted into a temporary
+SQLite3 database, like reddit_deeplearn_imagetool does. Reddit and google
+are answered by synthetic pages (--subreddits x --pages x --posts posts)
+or by a recorded cassette (--cassette, see --record_dir of the tool).
+
+Reported are posts/sec end to end, the throughput of every stage out of
+the METRICS registry and the memory peak. With --min_posts_per_second
+the benchmark fails below that throughput, e.g. to catch regressions:
+
+    python -m benchmarks.bench_pipeline --subreddits 1000 --pages 10 --min_posts_per_second 2000
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import RedditDBHelper
+from core.io.FileReader import FileReader
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from helper.metrics.MetricsRegistry import METRICS
+from helper.replay.HttpCassette import HttpCassette, ReplayAdapter, ReplayServer, mount_adapter
+from helper.replay.SyntheticData import SyntheticAdapter
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+def recorded_subreddits(http_cassette):
+    """The subreddits of all listings within a cassette"""
+    subreddits = set()
+    for meta in http_cassette:
+        path = meta['url'].split('?')[0].split('/')
+        if len(path) > 4 and path[3] == 'r':
+            subreddits.add(path[4])
+    return sorted(subreddits)
+
+
+def run_pipeline(args, db_handler, subreddits, replay_server=None):
+    """Crawls all subreddits once
+
+    :return: The RedditChecker, after its data was inserted
+    """
+    reddit = RedditChecker(
+        subreddits,
+        db_file_path=None,
+        max_workers=args.workers,
+        max_pages=args.pages,
+        page_size=args.posts,
+        google_workers=args.google_workers,
+        google_rate=args.google_rate,
+        seen_set_backend=args.dedup_backend,
+        json_backend=args.json_backend,
+        timeseries=args.timeseries,
+    )
+    reddit.db_handler = db_handler
+    if not args.google:
+        reddit.reddit_db_formatter.google_crawler.google_knows = True
+
+    sessions = (reddit.reddit_http_handler.session, reddit.reddit_db_formatter.google_crawler.session)
+    if replay_server is not None:
+        reddit.reddit_http_handler = RedditHttpHandler(base_url=replay_server.base_url, pool_maxsize=args.workers)
+        mount_adapter(ReplayAdapter(replay_server.http_cassette), reddit.reddit_db_formatter.google_crawler.session)
+    elif args.cassette:
+        mount_adapter(ReplayAdapter(HttpCassette(args.cassette)), *sessions)
+    else:
+        mount_adapter(SyntheticAdapter(pages=args.pages, posts=args.posts, seed=args.seed), *sessions)
+
+    reddit_data = RedditDBHelper.generate_reddit_data(reddit, args.reddit_sort, args.reddit_time)
+    RedditDBHelper.insert_reddit_data_to_db(db_handler, reddit_data)
+    RedditDBHelper.insert_reddit_data_to_db(db_handler, [reddit.reddit_db_formatter.close()])
+    RedditDBHelper.save_crawl_checkpoints(db_handler, reddit.crawl_checkpoint_rows())
+
+    reddit.reddit_http_handler.close()
+    return reddit
+
+
+def stage_throughput(metrics):
+    """Calls per second of every timed stage, while it was running"""
+    return {
+        name: histogram['count'] / histogram['sum']
+        for name, histogram in metrics['histograms'].items()
+        if histogram['sum'] > 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subreddits", type=int, default=20, help="Synthetic subreddits")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per subreddit")
+    parser.add_argument("--posts", type=int, default=100, help="Posts per page")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cassette", type=str, default=None, help="Replays a recorded cassette directory")
+    parser.add_argument("--server", action='store_true', help="Serves the cassette through a local HTTP server")
+    parser.add_argument("--reddit_sort", type=str, default='top')
+    parser.add_argument("--reddit_time", type=str, default='day')
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--google", action='store_true', help="Runs the reverse image searches")
+    parser.add_argument("--google_workers", type=int, default=0)
+    parser.add_argument("--google_rate", type=float, default=1000.0)
+    parser.add_argument("--dedup_backend", type=str, default='set')
+    parser.add_argument("--json_backend", type=str, default=None)
+    parser.add_argument("--timeseries", action='store_true')
+    parser.add_argument("--batch_size", type=int, default=1000)
+    parser.add_argument("--tracemalloc", action='store_true', help="Traces the Python heap peak, slows down")
+    parser.add_argument("--verbose", action='store_true', help="Prints every fetched page")
+    parser.add_argument("--json_output", type=str, default=None, help="Writes the results as JSON")
+    parser.add_argument("--min_posts_per_second", type=float, default=None, help="Fails below this throughput")
+    args = parser.parse_args()
+
+    if args.cassette:
+        http_cassette = HttpCassette(args.cassette)
+        subreddits = recorded_subreddits(http_cassette)
+    else:
+        subreddits = [f'synthetic{index}' for index in range(args.subreddits)]
+
+    METRICS.reset()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    replay_server = ReplayServer(http_cassette).start() if args.cassette and args.server else None
+    with tempfile.TemporaryDirectory() as directory:
+        db_handler = DBHandler(os.path.join(directory, 'bench.db'), flush_rows=args.batch_size)
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+        # Every fetched page is printed, which would dominate large runs
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            started = time.perf_counter()
+            reddit = run_pipeline(args, db_handler, subreddits, replay_server)
+            db_handler.flush()
+            seconds = time.perf_counter() - started
+
+        posts = db_handler.connection.execute("SELECT COUNT(*) FROM image_success").fetchone()[0]
+        db_handler.connection.close()
+    if replay_server is not None:
+        replay_server.close()
+
+    heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    tracemalloc.stop()
+    metrics = METRICS.to_dict()
+    results = {
+        'subreddits': len(subreddits),
+        'posts': posts,
+        'seconds': seconds,
+        'posts_per_second': posts / seconds,
+        'max_rss_bytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        'heap_peak_bytes': heap_peak,
+        'seen_posts_bytes': reddit.reddit_db_formatter.seen_posts.memory_bytes,
+        'stage_calls_per_second': stage_throughput(metrics),
+        'metrics': metrics,
+    }
+
+    print(f"{posts} posts of {len(subreddits)} subreddits in {seconds:.2f}s - "
+          f"{results['posts_per_second']:.0f} posts/sec")
+    print(f"max RSS {results['max_rss_bytes'] / 1024 ** 2:.0f} MiB"
+          + (f" - heap peak {heap_peak / 1024 ** 2:.1f} MiB" if heap_peak is not None else ""))
+    print(METRICS.summary())
+
+    if args.json_output:
+        with open(args.json_output, 'w') as json_file:
+            json.dump(results, json_file, indent=2, sort_keys=True)
+
+    if args.min_posts_per_second and results['posts_per_second'] < args.min_posts_per_second:
+        print(f"Regression: {results['posts_per_second']:.0f} < {args.min_posts_per_second:.0f} posts/sec")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Compares the record pipeline against the former dict pipeline
+Every post of synthetic listings is turned into a record, formatted into
+rows and buffered into an in-memory database:
+
+    - 'dicts': the former path, a RedditDataHolder namedtuple holding a
+      datetime, formatted into one dict per table with strftime'd and
+      datetime values, inserted through DBHandler.bulk_insert_to_db
+      (both paths share RedditDBFormatter.format_data)
+    - 'records': slotted RedditDataHolders with epoch timestamps, formatted
+      into row tuples of TABLE_COLUMNS, inserted through bulk_insert_row
+
+Reported are milliseconds per 100k posts for formatting and inserting,
+and the memory blocks and bytes the formatted rows of a post keep alive
+until they are flushed (counted with tracemalloc).
+"""
+import argparse
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import RedditDBHelper
+from core.db.reddit.RedditDBFormatter import RedditDBFormatter
+from core.io.FileReader import FileReader
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.helper.RedditHelperClasses import reddit_data_parameters
+from core.reddit.helper.RedditListingParser import parse_listing
+from helper.replay.SyntheticData import synthetic_listing
+
+FormerDataHolder = namedtuple(
+    'RedditData', [field if field != 'created_utc' else 'utc_datetime' for field in reddit_data_parameters]
+)
+
+
+def former_child_info(reddit, child_attributes):
+    if child_attributes.get('post_hint') != 'image':
+        return None
+    return FormerDataHolder(
+        title=child_attributes['title'].title(),
+        post_id=child_attributes['id'],
+        subreddit_id=child_attributes['subreddit_id'],
+        subreddit_name_prefixed=child_attributes['subreddit_name_prefixed'],
+        subreddit_subscribers=child_attributes['subreddit_subscribers'],
+        ups=child_attributes['ups'],
+        gildings=child_attributes['gildings'],
+        num_comments=child_attributes['num_comments'],
+        reddit_sort=reddit.configs.accepted_sorts['top'],
+        reddit_time=reddit.configs.accepted_times['day'],
+        domain=child_attributes['domain'],
+        url=child_attributes['url'],
+        permalink=child_attributes['permalink'],
+        utc_datetime=datetime.utcfromtimestamp(child_attributes['created_utc']),
+    )
+
+
+class FormerDBFormatter(RedditDBFormatter):
+    """The former dict rows, within the same format_data"""
+    def _generate_subreddits_table(self, data):
+        return {
+            'id': data.subreddit_id,
+            'subreddit_name_prefixed': data.subreddit_name_prefixed,
+            'subreddit_subscribers': data.subreddit_subscribers,
+        }
+
+    def _generate_images_table(self, data):
+        return {
+            'id': data.post_id,
+            'subreddit_id': data.subreddit_id,
+            'image_url': data.url,
+            'permalink': data.permalink,
+            'upload_time': data.utc_datetime.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    @staticmethod
+    def _image_processing_row(post_id, title, google_process):
+        return {
+            'image_id': post_id,
+            'title': title,
+            'guess': google_process['guess'],
+            'google_permalink': google_process['google_permalink'],
+            'first_result': google_process['first_result'],
+        }
+
+    def _generate_image_success_table(self, data):
+        return {
+            'image_id': data.post_id,
+            'ups': data.ups,
+            'num_comments': data.num_comments,
+            'reddit_sort': data.reddit_sort,
+            'reddit_time': data.reddit_time,
+            'last_checked': datetime.utcnow(),
+            'time_passed': str(datetime.utcnow() - data.utc_datetime),
+            'gid_1': data.gildings.get('gid_1', None),
+            'gid_2': data.gildings.get('gid_2', None),
+            'gid_3': data.gildings.get('gid_3', None),
+        }
+
+
+def new_formatter(formatter_class):
+    # A fresh formatter per run, so every post is new
+    reddit_db_formatter = formatter_class()
+    # Never reach out to google while benchmarking
+    reddit_db_formatter.google_crawler.google_knows = True
+    return reddit_db_formatter
+
+
+def former_path(reddit, children):
+    records = (former_child_info(reddit, child) for child in children)
+    return list(new_formatter(FormerDBFormatter).format_data(record for record in records if record))
+
+
+def former_insert(db_handler, posts):
+    for post in posts:
+        for table_name, row in post.items():
+            db_handler.bulk_insert_to_db(table_name, row)
+    db_handler.flush()
+
+
+def record_path(reddit, children):
+    records = (reddit._get_child_info(child, 'top', 'day') for child in children)
+    return list(new_formatter(RedditDBFormatter).format_data(record for record in records if record))
+
+
+def record_insert(db_handler, posts):
+    for post in posts:
+        RedditDBHelper.insert_formatted_post(db_handler, post)
+    db_handler.flush()
+
+
+def new_db_handler(batch_size):
+    db_handler = DBHandler(':memory:', flush_rows=batch_size, flush_interval=3600)
+    db_handler.init_database(FileReader.read_file('sql/create.sql'))
+    return db_handler
+
+
+def measure(path, insert, reddit, children, batch_size):
+    """Milliseconds of formatting and inserting, retained blocks and bytes per post"""
+    started = time.perf_counter()
+    posts = path(reddit, children)
+    format_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    insert(new_db_handler(batch_size), posts)
+    insert_ms = (time.perf_counter() - started) * 1000
+    del posts
+
+    sample = children[:10000]
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    posts = path(reddit, sample)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = [stat for stat in after.compare_to(before, 'filename') if stat.count_diff > 0]
+    blocks = sum(stat.count_diff for stat in retained) / len(posts)
+    size = sum(stat.size_diff for stat in retained) / len(posts)
+    return format_ms, insert_ms, blocks, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--batch_size", type=int, default=1000)
+    args = parser.parse_args()
+
+    pages = -(-args.posts // 100)
+    children = []
+    for page in range(pages):
+        page_children, _ = parse_listing(synthetic_listing(page, pages=pages))
+        children.extend(page_children)
+    children = children[:args.posts]
+
+    reddit = RedditChecker([], db_file_path=None)
+
+    scale = 100000 / len(children)
+    print(f"{len(children)} posts, ms per 100k posts, retained per post")
+    print(f"{'path':>8} {'format ms':>10} {'insert ms':>10} {'total ms':>10} {'blocks':>7} {'bytes':>7}")
+    for name, path, insert in (('dicts', former_path, former_insert), ('records', record_path, record_insert)):
+        format_ms, insert_ms, blocks, size = measure(path, insert, reddit, children, args.batch_size)
+        print(f"{name:>8} {format_ms * scale:>10.0f} {insert_ms * scale:>10.0f} "
+              f"{(format_ms + insert_ms) * scale:>10.0f} {blocks:>7.1f} {size:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
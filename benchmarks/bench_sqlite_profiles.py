@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Compares inserts/sec of the SQLite3 performance profiles
+A synthetic image_success row is inserted --rows times per profile,
+using the batched DBHandler.bulk_insert_to_db path.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from core.db.DBBackends import SQLITE_PROFILES
+from core.db.DBHandler import DBHandler
+from core.io.FileReader import FileReader
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+def synthetic_image_success_rows(amount):
+    """Generates rows looking like RedditDBFormatter._generate_image_success_table"""
+    for index in range(amount):
+        yield {
+            'image_id': format(index, 'x'),
+            'ups': index % 5000,
+            'num_comments': index % 300,
+            'reddit_sort': 5,
+            'reddit_time': 2,
+            'last_checked': '2020-01-01 00:00:00',
+            'time_passed': '1:00:00',
+            'gid_1': None,
+            'gid_2': None,
+            'gid_3': None,
+        }
+
+
+def bench_profile(db_profile, rows, batch_size):
+    """Inserts rows into a fresh database
+
+    :return: Inserts per second
+    :rtype: float
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db_handler = DBHandler(
+            os.path.join(directory, "bench.db"), flush_rows=batch_size,
+            flush_interval=float('inf'), db_profile=db_profile,
+        )
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+        started = time.perf_counter()
+        for row in synthetic_image_success_rows(rows):
+            db_handler.bulk_insert_to_db('image_success', row)
+        db_handler.flush()
+        seconds = time.perf_counter() - started
+
+        db_handler.connection.close()
+    return rows / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch_size", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, batch size {args.batch_size}")
+    for db_profile in SQLITE_PROFILES:
+        print(f"{db_profile:>10}: {bench_profile(db_profile, args.rows, args.batch_size):12.0f} inserts/sec")
+
+
+if __name__ == '__main__':
+    main()
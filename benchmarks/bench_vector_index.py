@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Compares recall and query latency of the vector indexes
+Clustered, L2 normalized random vectors stand in for image embeddings,
+the queries are stored vectors with a little noise. Recall@k is the share
+of the exact k nearest neighbours (BruteForceIndex) an index returns.
+IVF-PQ is also run with reranking its candidates by the exact vectors.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from core.image.VectorIndex import BruteForceIndex, IVFPQIndex
+
+
+def clustered_vectors(size, dim, clusters, random):
+    centers = random.normal(size=(clusters, dim))
+    vectors = centers[random.integers(0, clusters, size=size)] + 0.6 * random.normal(size=(size, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def recall(exact, approximate):
+    return np.mean([
+        len({vector_id for vector_id, _ in exact_matches} & {vector_id for vector_id, _ in matches}) / len(exact_matches)
+        for exact_matches, matches in zip(exact, approximate)
+    ])
+
+
+def time_queries(query, queries, **kwargs):
+    """Matches of every query and the mean milliseconds per query"""
+    started = time.perf_counter()
+    matches = [query(query_vector, **kwargs) for query_vector in queries]
+    return matches, (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=256)
+    parser.add_argument("--subvectors", type=int, nargs='+', default=[16, 64])
+    parser.add_argument("--probes", type=int, nargs='+', default=[4, 16, 64])
+    args = parser.parse_args()
+
+    random = np.random.default_rng(0)
+    print(f"dim {args.dim}, {args.queries} queries, recall@{args.k} and mean ms/query")
+    print(f"{'size':>10} {'index':>26} {'bytes/vector':>12} {'build s':>8} {'recall':>7} {'ms/query':>9}")
+    for size in args.sizes:
+        vectors = clustered_vectors(size, args.dim, args.clusters, random)
+        ids = list(range(size))
+        queries = vectors[random.integers(0, size, size=args.queries)]
+        queries = queries + 0.01 * random.normal(size=queries.shape).astype(np.float32)
+
+        brute_force = BruteForceIndex(args.dim)
+        brute_force.add(ids, vectors)
+        brute_force.query(queries[0])  # appends the added vectors
+        exact, brute_force_ms = time_queries(brute_force.query, queries, k=args.k)
+        print(f"{size:>10} {'brute force':>26} {args.dim * 4:>12} {0:>8.2f} {1:>7.3f} {brute_force_ms:>9.3f}")
+
+        for subvectors in args.subvectors:
+            started = time.perf_counter()
+            ivfpq = IVFPQIndex(args.dim, lists=args.lists, subvectors=subvectors)
+            # Trained on the first half, the second half is added incrementally
+            ivfpq.add(ids[:size // 2], vectors[:size // 2])
+            ivfpq.train()
+            ivfpq.add(ids[size // 2:], vectors[size // 2:])
+            ivfpq.query(queries[0])  # encodes the added vectors
+            build_seconds = time.perf_counter() - started
+
+            for probes in args.probes:
+                for rerank_vectors in (None, vectors):
+                    matches, ivfpq_ms = time_queries(
+                        ivfpq.query, queries, k=args.k, probes=probes, rerank_vectors=rerank_vectors
+                    )
+                    name = f"ivfpq m={subvectors} p={probes}{' rerank' if rerank_vectors is not None else ''}"
+                    print(f"{size:>10} {name:>26} {subvectors:>12} "
+                          f"{build_seconds:>8.2f} {recall(exact, matches):>7.3f} {ivfpq_ms:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
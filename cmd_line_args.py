@@ -2,6 +2,19 @@
 import argparse
 
 import __init__
+from core.db.DBBackends import DB_BACKENDS, SQLITE_PROFILES
+from core.db.reddit.ExportViews import EXPORT_VIEWS
+from core.io.ColumnarFormats import COLUMNAR_FORMATS
+from core.reddit.helper.RedditListingParser import PARSER_BACKENDS
+from helper.dedup.SeenSet import SEEN_SET_BACKENDS
+
+
+def positive_float(value):
+    """A float above 0, e.g. a rate limit"""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not above 0")
+    return number
 
 
 def arg_parse_info():
@@ -34,12 +47,148 @@ def arg_parse_info():
                         help="Path to your database", default='AUTOGENERATED.db')
 
     parser.add_argument("-db_type", "--database_type", metavar='', type=str,
-                        help="Type of your database", default='sqlite3')
+                        choices=list(DB_BACKENDS),
+                        help="Type of your database (sqlite3, postgres), postgres \
+                              takes a connection string as database path",
+                        default='sqlite3')
 
     parser.add_argument("-db_schema", "--database_schema", metavar='', type=str,
                         help="The database schema - needs to be provided, if you \
-                              provide a path to your database.",
-                        default="./sql/create.sql")
+                              provide a path to your database. Defaults to \
+                              ./sql/create.sql or ./sql/create_postgres.sql",
+                        default=None)
+
+    parser.add_argument("-w", "--workers", metavar='', type=int,
+                        help="Maximum number of concurrent requests to reddit", default=8)
+
+    parser.add_argument("-p", "--pages", metavar='', type=int,
+                        help="Maximum pages of 100 posts fetched per subreddit", default=1)
+
+    parser.add_argument("-bs", "--batch_size", metavar='', type=int,
+                        help="Rows buffered before they are written to the database", default=1000)
+
+    parser.add_argument("-db_profile", "--database_profile", metavar='', type=str,
+                        choices=list(SQLITE_PROFILES),
+                        help="SQLite3 performance profile (default, durable, fast)",
+                        default='default')
+
+    parser.add_argument("-db_pool", "--database_pool", metavar='', type=int,
+                        help="Maximum open database connections, defaults to 1 for \
+                              sqlite3 and 4 for postgres",
+                        default=None)
+
+    parser.add_argument("-cache", "--cache_path", metavar='', type=str,
+                        help="Path to a file caching reddit responses between runs", default=None)
+
+    parser.add_argument("-cache_size", "--cache_size", metavar='', type=int,
+                        help="Maximum size of the response cache in MiB", default=256)
+
+    parser.add_argument("-gw", "--google_workers", metavar='', type=int,
+                        help="Threads running google reverse image searches in the background, \
+                              0 searches while formatting", default=2)
+
+    parser.add_argument("-gr", "--google_rate", metavar='', type=positive_float,
+                        help="Maximum google reverse image searches per second", default=1.0)
+
+    parser.add_argument("-google_cache", "--google_cache_path", metavar='', type=str,
+                        help="Path to a file caching google reverse image searches", default=None)
+
+    parser.add_argument("-dl", "--download_dir", metavar='', type=str,
+                        help="Directory to download the images to, nothing is downloaded if empty",
+                        default=None)
+
+    parser.add_argument("-dl_workers", "--download_workers", metavar='', type=int,
+                        help="Maximum number of concurrent image downloads", default=8)
+
+    parser.add_argument("-hash", "--hash_images", action='store_true',
+                        help="Compute perceptual hashes of downloaded images")
+
+    parser.add_argument("-proc", "--processes", metavar='', type=int,
+                        help="Worker processes crawling the subreddits, split into shards", default=1)
+
+    parser.add_argument("-inc", "--incremental", action='store_true',
+                        help="Stop paginating at posts ingested by an earlier run")
+
+    parser.add_argument("-dedup", "--dedup_backend", metavar='', type=str,
+                        choices=list(SEEN_SET_BACKENDS),
+                        help="How seen posts are remembered (set, exact, bloom)", default='set')
+
+    parser.add_argument("-dedup_error", "--dedup_error_rate", metavar='', type=float,
+                        help="False positive rate of the bloom dedup backend", default=0.001)
+
+    parser.add_argument("-json", "--json_backend", metavar='', type=str,
+                        choices=PARSER_BACKENDS,
+                        help="Parser of the reddit listings (orjson, json, ijson), \
+                              ijson needs less memory, but more time", default=PARSER_BACKENDS[0])
+
+    parser.add_argument("-ts", "--timeseries", action='store_true',
+                        help="Track popularity in the compact image_success_series table \
+                              instead of image_success")
+
+    parser.add_argument("-daemon", "--daemon", action='store_true',
+                        help="Keep crawling within one process, every subreddit \
+                              is polled as often as it gets new posts")
+
+    parser.add_argument("-min_interval", "--min_interval", metavar='', type=int,
+                        help="Shortest seconds between two crawls of a subreddit as a daemon", default=60)
+
+    parser.add_argument("-max_interval", "--max_interval", metavar='', type=int,
+                        help="Longest seconds between two crawls of a subreddit as a daemon", default=3600)
+
+    parser.add_argument("-profile", "--profile", action='store_true',
+                        help="Print the time spent in every stage of the pipeline")
+
+    parser.add_argument("-profile_out", "--profile_output", metavar='', type=str,
+                        help="Path prefix to write cProfile stats (.prof) and all metrics \
+                              (.json, .prom) to", default=None)
+
+    parser.add_argument("-request_rate", "--request_rate", metavar='', type=positive_float,
+                        help="Maximum reddit requests per second, requests are always paced \
+                              by the budget reddit announces", default=None)
+
+    parser.add_argument("-record", "--record_dir", metavar='', type=str,
+                        help="Directory to record all reddit and google responses to", default=None)
+
+    parser.add_argument("-replay", "--replay_dir", metavar='', type=str,
+                        help="Directory of recorded responses to answer all reddit and google \
+                              requests from, without a network", default=None)
+
+    parser.add_argument("-export", "--export_dir", metavar='', type=str,
+                        help="Directory to export the crawled data to as a columnar dataset, \
+                              only rows newer than the last export are appended, needs a \
+                              sqlite3 database", default=None)
+
+    parser.add_argument("-export_view", "--export_view", metavar='', type=str,
+                        choices=EXPORT_VIEWS,
+                        help="The exported table or view (images, image_success, image_processing, \
+                              training)", default='training')
+
+    parser.add_argument("-export_format", "--export_format", metavar='', type=str,
+                        choices=COLUMNAR_FORMATS,
+                        help="Format of the exported files (parquet, arrow, npy), \
+                              parquet and arrow need pyarrow", default=COLUMNAR_FORMATS[0])
+
+    parser.add_argument("-export_partition", "--export_partition", metavar='', type=str,
+                        help="Partition the export by 'subreddit' and/or 'date', \
+                              separated by spaces", default='')
+
+    parser.add_argument("-embed", "--embedding_dir", metavar='', type=str,
+                        help="Directory of the embedding store, every downloaded image without \
+                              a vector is embedded into it", default=None)
+
+    parser.add_argument("-embed_kind", "--embedding_kind", metavar='', type=str,
+                        choices=('features', 'pixels'),
+                        help="The stored vectors: 'features' (256 color, layout and edge features) \
+                              or 'pixels' (normalized 64x64 model inputs)", default='features')
+
+    parser.add_argument("-vector_index", "--vector_index", metavar='', type=str,
+                        choices=('brute_force', 'ivfpq'),
+                        help="Keep a nearest-neighbour index of the embeddings up to date \
+                              (brute_force, ivfpq), saved within the embedding directory", default=None)
+
+    parser.add_argument("-similar_to", "--similar_to", metavar='', type=str,
+                        help="Print the visually most similar posts of an images.id, with their \
+                              ups and comments, needs --embedding_dir", default=None)
 
     parser.add_argument("-v", "--version", action='version', version=__init__.__version__,
                         help="Shows the version number")
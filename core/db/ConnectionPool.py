@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""A bounded pool of database connections
+Connections are only opened once they are needed and are reused after
+being released. At most size connections are open at the same time,
+further acquire calls wait for a released one.
+"""
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """Lends connections created by connect
+    Usage:
+
+        pool = ConnectionPool(lambda: sqlite3.connect('reddit.db'), size=2)
+        with pool.connection() as connection:
+            connection.execute("SELECT 1")
+    """
+    def __init__(self, connect, size=1, timeout=30.0):
+        """Init for the ConnectionPool class
+
+        :param connect:
+            Opens a new connection, called without arguments
+        :param size:
+            Maximum number of open connections, defaults to 1
+        :param timeout:
+            Seconds acquire waits for a released connection, defaults to 30.0
+        """
+        if size < 1:
+            raise ValueError(f"A connection pool needs at least one connection, got {size}")
+
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+
+        self.idle = queue.LifoQueue()
+        self.opened = []
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """An idle connection, a new one while fewer than size are open
+
+        :raises TimeoutError:
+            If no connection was released within timeout seconds
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if len(self.opened) < self.size:
+                connection = self.connect()
+                self.opened.append(connection)
+                return connection
+
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"All {self.size} database connections stayed in use for {self.timeout}s")
+
+    def release(self, connection):
+        """Returns an acquired connection to the pool"""
+        self.idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        """Lends a connection for the duration of the with block"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Closes every opened connection, the pool can be used again afterwards"""
+        with self.lock:
+            opened, self.opened = self.opened, []
+            self.idle = queue.LifoQueue()
+        for connection in opened:
+            connection.close()
+
+    @property
+    def stats(self):
+        return {
+            'size': self.size,
+            'opened': len(self.opened),
+            'idle': self.idle.qsize(),
+        }
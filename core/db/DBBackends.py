@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""The database types DBHandler can connect to
+Every backend opens connections, builds INSERT statements in its dialect
+and writes batches of row tuples its fastest way:
+
+    - 'sqlite3': a local SQLite3 file, executemany within a transaction
+    - 'postgres': a PostgreSQL compatible server via psycopg, batches are
+      COPY'd into a temporary table and inserted from there, skipping
+      conflicting rows with ON CONFLICT DO NOTHING
+
+Values can be converted by the database while inserting, e.g. epochs into
+timestamps. Rows name a conversion per column (EPOCH_DATETIME,
+SECONDS_TIME), each backend has its own SQL expression for it.
+"""
+import os
+import sqlite3
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+
+try:
+    import psycopg
+except ImportError:
+    psycopg = None
+
+# Seconds since the epoch, stored as the UTC datetime
+EPOCH_DATETIME = 'epoch_datetime'
+# Seconds, stored as str(timedelta) would print them, e.g. '2 days, 3:04:05'
+SECONDS_TIME = 'seconds_time'
+
+# PRAGMA statements applied right after connecting to a SQLite3 database
+SQLITE_PROFILES = {
+    'default': {},
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+    },
+    'fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,  # 256 MiB
+        'cache_size': -65536,  # 64 MiB
+        'temp_store': 'MEMORY',
+    },
+}
+
+
+class SQLite3Backend:
+    """A local SQLite3 database file"""
+    db_type = 'sqlite3'
+    schema_path = './sql/create.sql'
+    default_pool_size = 1
+    errors = (sqlite3.OperationalError, )
+    integrity_errors = (sqlite3.IntegrityError, )
+    conversions = {
+        EPOCH_DATETIME: "datetime(?, 'unixepoch')",
+        SECONDS_TIME: (
+            "CASE WHEN ? >= 86400 THEN printf('%d day%s, ', ? / 86400, CASE WHEN ? >= 172800 THEN 's' ELSE '' END) "
+            "ELSE '' END || printf('%d:%02d:%02d', ? % 86400 / 3600, ? % 3600 / 60, ? % 60)"
+        ),
+    }
+
+    def __init__(self, db_file_path, db_profile='default'):
+        """
+        :param db_file_path: The path and name of your database file
+        :param db_profile: Performance profile of SQLITE_PROFILES, defaults to 'default'
+        :raises KeyError: If the profile does not exist
+        """
+        try:
+            self.pragmas = SQLITE_PROFILES[db_profile]
+        except KeyError:
+            raise KeyError(f"Unknown database profile '{db_profile}', "
+                           f"choose one of: {', '.join(SQLITE_PROFILES)}")
+        self.db_file_path = db_file_path
+
+    def connect(self):
+        """Connects to the SQLite3 database and applies the performance profile"""
+        # The pool lends a connection to one thread at a time, but not always the same one
+        connection = sqlite3.connect(self.db_file_path, cached_statements=256, check_same_thread=False)
+        for pragma, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {pragma}={value}")
+        return connection
+
+    def exists(self):
+        return os.path.isfile(self.db_file_path)
+
+    @staticmethod
+    def transaction(connection):
+        """Commits the with block, or rolls it back on an exception"""
+        return connection
+
+    @staticmethod
+    def savepoint(connection):
+        # A failing statement leaves the rest of a SQLite3 transaction intact
+        return nullcontext(connection)
+
+    @staticmethod
+    def execute(connection, sql, parameters=()):
+        return connection.execute(sql, parameters)
+
+    def insert_statement(self, table_name, columns, or_ignore=False, or_replace=False, conversions=None):
+        """The INSERT statement for rows of columns
+
+        :param conversions:
+            Name of the conversion of every value or None, defaults to None
+        :type conversions: tuple
+        """
+        if conversions is None:
+            values = ", ".join("?" * len(columns))
+        else:
+            # Numbered parameters, an expression may use its value more than once
+            values = ", ".join(
+                self.conversions[conversion].replace("?", f"?{position}") if conversion else f"?{position}"
+                for position, conversion in enumerate(conversions, start=1)
+            )
+        return "INSERT {}INTO {}({}) VALUES ({})".format(
+            "OR REPLACE " if or_replace else "OR IGNORE " if or_ignore else "",
+            table_name,
+            ", ".join(str(column) for column in columns),
+            values,
+        )
+
+    @staticmethod
+    def insert_rows(connection, insert_statement, rows):
+        connection.executemany(insert_statement, rows)
+
+
+# The SQL of a PostgresBackend insert, staging is None for single rows and upserts
+PostgresInsert = namedtuple('PostgresInsert', ['values', 'repeats', 'staging', 'copy', 'insert_staged'])
+
+
+class PostgresBackend:
+    """A PostgreSQL compatible server, connected via psycopg 3
+    db_file_path is a connection string, e.g. 'postgresql://user@localhost/reddit'.
+    Connections run in autocommit mode, transaction() groups statements.
+    """
+    db_type = 'postgres'
+    schema_path = './sql/create_postgres.sql'
+    default_pool_size = 4
+    errors = (psycopg.Error, ) if psycopg else ()
+    integrity_errors = (psycopg.IntegrityError, ) if psycopg else ()
+    conversions = {
+        EPOCH_DATETIME: "to_timestamp(?::bigint) AT TIME ZONE 'UTC'",
+        SECONDS_TIME: (
+            "CASE WHEN ?::bigint >= 86400 THEN (?::bigint / 86400) "
+            "|| CASE WHEN ?::bigint >= 172800 THEN ' days, ' ELSE ' day, ' END ELSE '' END "
+            "|| mod(?::bigint, 86400) / 3600 || ':' || lpad((mod(?::bigint, 3600) / 60)::text, 2, '0') "
+            "|| ':' || lpad(mod(?::bigint, 60)::text, 2, '0')"
+        ),
+    }
+    # Batches of fewer rows are inserted with executemany instead of COPY
+    copy_min_rows = 16
+
+    def __init__(self, db_file_path, db_profile='default'):
+        """
+        :param db_file_path: A libpq connection string or URI
+        :param db_profile: Ignored, the profiles only apply to SQLite3
+        """
+        self.db_file_path = db_file_path
+        self.staging_tables = 0
+
+    def connect(self):
+        return psycopg.connect(self.db_file_path, autocommit=True)
+
+    @staticmethod
+    def exists():
+        # The server creates nothing on connect, a missing database fails there
+        return True
+
+    @staticmethod
+    @contextmanager
+    def transaction(connection):
+        """Commits the with block, or rolls it back on an exception"""
+        with connection.transaction():
+            yield connection
+
+    # Nested within a transaction, psycopg uses a savepoint
+    savepoint = transaction
+
+    @staticmethod
+    def execute(connection, sql, parameters=()):
+        """Runs sql written for SQLite3, '?' placeholders become '%s'"""
+        if not parameters:
+            return connection.execute(sql)
+        return connection.execute(sql.replace('%', '%%').replace('?', '%s'), parameters)
+
+    def insert_statement(self, table_name, columns, or_ignore=False, or_replace=False, conversions=None):
+        """The INSERT statements for rows of columns, see SQLite3Backend.insert_statement
+        Ignoring inserts are staged, the batch is COPY'd into a temporary
+        table with the raw values and converted while inserting from it.
+        """
+        conversions = conversions or (None, ) * len(columns)
+        expressions = [self.conversions[conversion] if conversion else "?" for conversion in conversions]
+        column_list = ", ".join(columns)
+
+        if or_replace:
+            on_conflict = f" ON CONFLICT ON CONSTRAINT {table_name}_pkey DO UPDATE SET " + ", ".join(
+                f"{column} = EXCLUDED.{column}" for column in columns
+            )
+        elif or_ignore:
+            on_conflict = " ON CONFLICT DO NOTHING"
+        else:
+            on_conflict = ""
+        values = "INSERT INTO {}({}) VALUES ({}){}".format(
+            table_name, column_list, ", ".join(expression.replace("?", "%s") for expression in expressions), on_conflict
+        )
+        repeats = tuple(expression.count("?") for expression in expressions)
+        if not or_ignore or or_replace:
+            return PostgresInsert(values, repeats, None, None, None)
+
+        staging_table = f"staged_{table_name}_{self.staging_tables}"
+        self.staging_tables += 1
+        staged_columns = ", ".join(
+            f"NULL::bigint AS {column}" if conversion else column for column, conversion in zip(columns, conversions)
+        )
+        return PostgresInsert(
+            values,
+            repeats,
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} ON COMMIT DELETE ROWS AS "
+            f"SELECT {staged_columns} FROM {table_name} WITH NO DATA",
+            f"COPY {staging_table}({column_list}) FROM STDIN",
+            "INSERT INTO {}({}) SELECT {} FROM {}{}".format(
+                table_name,
+                column_list,
+                ", ".join(expression.replace("?", column) for column, expression in zip(columns, expressions)),
+                staging_table,
+                on_conflict,
+            ),
+        )
+
+    def insert_rows(self, connection, insert_statement, rows):
+        if insert_statement.staging is None or len(rows) < self.copy_min_rows:
+            if any(repeat > 1 for repeat in insert_statement.repeats):
+                rows = [
+                    tuple(value for value, repeat in zip(row, insert_statement.repeats) for _ in range(repeat))
+                    for row in rows
+                ]
+            with connection.cursor() as cursor:
+                cursor.executemany(insert_statement.values, rows)
+            return
+
+        # The staged rows are deleted once the transaction commits
+        with self.transaction(connection), connection.cursor() as cursor:
+            cursor.execute(insert_statement.staging)
+            with cursor.copy(insert_statement.copy) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            cursor.execute(insert_statement.insert_staged)
+
+
+DB_BACKENDS = {
+    'sqlite3': SQLite3Backend,
+    'postgres': PostgresBackend,
+}
+
+
+def create_db_backend(db_type, db_file_path, db_profile='default'):
+    """The backend of db_type, see DB_BACKENDS
+
+    :raises KeyError:
+        If the database type does not exist or its driver is not installed
+    """
+    try:
+        backend = DB_BACKENDS[db_type.lower()]
+    except KeyError:
+        raise KeyError(f"Unknown database type '{db_type}', choose one of: {', '.join(DB_BACKENDS)}")
+    if backend is PostgresBackend and psycopg is None:
+        raise KeyError("The database type 'postgres' needs psycopg, install it with 'pip install psycopg'")
+    return backend(db_file_path, db_profile)
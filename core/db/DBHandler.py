@@ -2,35 +2,55 @@
 """An abstract class, combining different DB handlers
 Combines different DB types and can be used by other tools.
 
-For now, the following DB types are available:
+For now, the following DB types are available, see DBBackends:
     - SQLite3
+    - PostgreSQL
 """
 import os
-import sqlite3
 import sys
-from sqlite3 import OperationalError
+import threading
+import time
+from contextlib import contextmanager
 
+from core.db.ConnectionPool import ConnectionPool
+from core.db.DBBackends import create_db_backend
 from core.io.FileReader import FileReader
+from helper.metrics.MetricsRegistry import METRICS
 
 
 class DBHandler:
-    """Create a connection to any given database format via '.connect'
+    """Connect to any given database type, the connections are opened on first use
     Usage:
 
-        db_handler = DBHandler()
-        db_handler_connection = db_handler.connect('sqlite3')
+        db_handler = DBHandler('reddit.db')
+        db_handler_connection = db_handler.connection
     """
-    def __init__(self, db_file_path, db_type='sqlite3'):
+    def __init__(self, db_file_path, db_type='sqlite3', flush_rows=1000, flush_interval=5.0,
+                 db_profile='default', pool_size=None, table_order=()):
         """Init for the DBHandler class
 
         :param db_file_path:
             The path and name of your database file
         :param db_type:
             The type of your database, defaults to 'sqlite3'
+        :param flush_rows:
+            Buffered rows which trigger a flush of bulk_insert_to_db, defaults to 1000
+        :param flush_interval:
+            Seconds after which bulk_insert_to_db flushes, defaults to 5.0
+        :param db_profile:
+            Performance profile of SQLITE_PROFILES, defaults to 'default'
+        :param pool_size:
+            Maximum open connections, threads writing at the same time wait
+            for each other's transaction, defaults to the backend's default_pool_size
+        :param table_order:
+            Tables every flush writes first and in this order, e.g. the ones
+            referenced by foreign keys, defaults to () (the order they were buffered)
+        :raises KeyError:
+            If the database type or profile does not exist
         """
-        self.db_types = {
-            'sqlite3': sqlite3.connect(db_file_path),
-        }
+        self.backend = create_db_backend(db_type, db_file_path, db_profile)
+        self.pool = ConnectionPool(self.backend.connect, size=pool_size or self.backend.default_pool_size)
+        self.leases = threading.local()
         self.db_file_path = db_file_path
         self.db_type = db_type.lower()
 
@@ -38,17 +58,30 @@ class DBHandler:
             'init_db_done': False,
             'create_db_done': False,
         }
-        self.known_datatypes = {}
+        self.insert_statements = {}
+
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.table_order = {table_name: position for position, table_name in enumerate(table_order)}
+        self.bulk_buffer = {}
+        self.buffered_rows = 0
+        # Threads share the buffer, a flush takes it as a whole
+        self.buffer_lock = threading.RLock()
+        self.last_flush = time.monotonic()
+        self.bulk_insert_stats = {}
 
     @property
     def create_db(self):
         """Creates a file according to the given db file path
         If a directory is provided, a default file will be created and initialized.
+        Database servers create nothing, their database has to exist.
         """
-        if os.path.isdir(self.db_file_path):
-            self.db_file_path = os.path.join(self.db_file_path, "AUTOGENERATED.db")
+        if self.db_type == 'sqlite3':
+            if os.path.isdir(self.db_file_path):
+                self.db_file_path = os.path.join(self.db_file_path, "AUTOGENERATED.db")
+                self.backend.db_file_path = self.db_file_path
 
-        FileReader.read_file(self.db_file_path, "w+")
+            FileReader.read_file(self.db_file_path, "w+")
 
         self.job_check['create_db_done'] = True
         return self.db_file_path
@@ -63,33 +96,88 @@ class DBHandler:
         :param sql_schema: str, optional
         :param sep: Seperation type, defaults to ';'
         """
-        with self.connection as cursor:
-            DBHandler._init_database_helper(cursor, sql_schema, sep)
+        with self._lease() as connection, self.backend.transaction(connection):
+            self._init_database_helper(connection, sql_schema, sep)
 
         self.job_check['init_db_done'] = True
 
-    @staticmethod
-    def _init_database_helper(cursor, commands, sep):
+    def _init_database_helper(self, connection, commands, sep):
         commands = commands.split(sep)
         for command in commands:
+            if not command.strip():
+                continue
             try:
-                cursor.execute(command)
-            except OperationalError as msg:
+                with self.backend.savepoint(connection):
+                    self.backend.execute(connection, command)
+            except self.backend.errors as msg:
                 print(f"Command skipped: {msg}")
 
     @property
     def connection(self):
-        """Create a connection to a given database type
-        The database type given is not case sensitive
+        """The connection of the calling thread
+        It is acquired from the pool on first use and kept until
+        release_connection or close is called, e.g. while a cursor of
+        select_from_db is read.
 
         :return: Database connection object
-        :raises sqlite3.Error:
-            Raises exception, if it can't connect to the SQLite3 database
+        :raises TimeoutError:
+            If every connection of the pool is used by other threads
         """
-        try:
-            return self.db_types[self.db_type]
-        except sqlite3.Error as error:
-            raise f"An SQLite3 Error occurred: {error}"
+        connection = getattr(self.leases, 'connection', None)
+        if connection is None:
+            connection = self.leases.connection = self.pool.acquire()
+        return connection
+
+    @contextmanager
+    def _lease(self):
+        """Lends a connection for one transaction
+        Threads without a connection of their own return it right after,
+        so a pool of one connection serves any amount of threads.
+        """
+        connection = getattr(self.leases, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        with self.pool.connection() as connection:
+            yield connection
+
+    def release_connection(self):
+        """Returns the connection of the calling thread to the pool"""
+        connection = getattr(self.leases, 'connection', None)
+        if connection is not None:
+            self.leases.connection = None
+            self.pool.release(connection)
+
+    def close(self):
+        """Closes all connections, they are reopened when used again
+        Buffered rows are not flushed, call flush() first.
+        """
+        self.leases = threading.local()
+        self.pool.close()
+
+    def select_from_db(self, sql_query, parameters=()):
+        """Runs a read-only query
+
+        :param sql_query:
+            Any SELECT statement, use '?' as placeholders
+        :param parameters:
+            Values for the placeholders, defaults to ()
+        :return: A cursor, which can be iterated row by row
+            The calling thread keeps its connection until release_connection
+        """
+        return self.backend.execute(self.connection, sql_query, parameters)
+
+    def update_db(self, statements):
+        """Runs statements which change rows, e.g. UPDATE or DELETE, within a single transaction
+
+        :param statements:
+            (sql, parameters) tuples, use '?' as placeholders
+        :return: The amount of changed rows of every statement
+        :rtype: list
+        """
+        self._check_db_ready()
+        with self._lease() as connection, self.backend.transaction(connection):
+            return [self.backend.execute(connection, sql, parameters).rowcount for sql, parameters in statements]
 
     def insert_to_db(self, table_name, data_to_insert):
         """Insert data into one of your tables
@@ -101,36 +189,169 @@ class DBHandler:
             All data to insert
         :type data_to_insert:
             Dict
-        :raises OperationalError:
-            If insertion was not possible
         """
-        if not any(self.job_check.values()) and not os.path.isfile(self.db_file_path):
-            print("Init. and create your db before inserting!")
-            sys.exit()
+        self._check_db_ready()
+        columns = tuple(data_to_insert.keys())
 
-        data_types = ""
-        querstionmarks = ""
-
-        # Learns to connect datatypes with tables
-        if table_name not in self.known_datatypes.keys():
-            for data in data_to_insert.keys():
-                data_types += str(data) + ", "
-                querstionmarks += "?, "
-            data_types = data_types[:-2]
-            querstionmarks = querstionmarks[:-2]
-            self.known_datatypes[table_name] = (data_types, querstionmarks)
-        else:
-            data_types = self.known_datatypes[table_name][0]
-            querstionmarks = self.known_datatypes[table_name][1]
-
-        with self.connection as cursor:
+        with METRICS.timer('db_insert_seconds', 'Single row inserts'):
             try:
-                cursor.execute(
-                    "INSERT INTO " + table_name + "(" + data_types + ") VALUES (" + querstionmarks +")",
-                    tuple(data_to_insert.values()))
-                cursor.commit()
-            except OperationalError:
-                print(f"Could not insert to {table_name}: {data_types} - {list(data_to_insert.values())}")
-            except sqlite3.IntegrityError as ie:
+                with self._lease() as connection, self.backend.transaction(connection):
+                    self.backend.insert_rows(
+                        connection,
+                        self._get_insert_statement(table_name, columns),
+                        [tuple(data_to_insert.values())])
+            except self.backend.integrity_errors:
                 pass
-                # print(f"{ie} in table {table_name} at {data_types} - {list(data_to_insert.values())}")
+            except self.backend.errors:
+                print(f"Could not insert to {table_name}: {columns} - {list(data_to_insert.values())}")
+
+    def bulk_insert_to_db(self, table_name, data_to_insert):
+        """Buffers data for one of your tables and inserts it in batches
+        The buffer is flushed once flush_rows rows are buffered or
+        flush_interval seconds have passed since the last flush.
+        Call flush() when you are done inserting.
+
+        Rows violating a constraint (e.g. duplicates) are skipped,
+        just like with insert_to_db.
+
+        :param table_name:
+            Name of your SQL Table
+        :param data_to_insert:
+            All data to insert
+        :type data_to_insert:
+            Dict
+        """
+        self.bulk_insert_row(table_name, tuple(data_to_insert.keys()), tuple(data_to_insert.values()))
+
+    def bulk_insert_row(self, table_name, columns, row, conversions=None):
+        """Buffers a row tuple for one of your tables, see bulk_insert_to_db
+        Rows of a table should share the same columns tuple, the buffer is
+        flushed whenever they change.
+
+        :param table_name:
+            Name of your SQL Table
+        :param columns:
+            Column names in the order of the row's values
+        :type columns: tuple
+        :param row:
+            The values to insert
+        :type row: tuple
+        :param conversions:
+            Conversion of every value by the database, e.g. EPOCH_DATETIME,
+            or None to store it as it is, defaults to None (plain values)
+        :type conversions: tuple
+        """
+        layout = (columns, conversions)
+        with self.buffer_lock:
+            buffered_layout, rows = self.bulk_buffer.get(table_name, (layout, []))
+            if buffered_layout != layout:
+                self.flush()
+                rows = []
+
+            rows.append(row)
+            self.bulk_buffer[table_name] = (layout, rows)
+            self.buffered_rows += 1
+
+            if (self.buffered_rows >= self.flush_rows
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """Writes all buffered rows within a single transaction, the backend's fastest way
+        The tables of table_order are written first, the others in the order they were buffered.
+
+        Tables which can not be written are skipped and reported.
+        """
+        with self.buffer_lock:
+            self.last_flush = time.monotonic()
+            if not self.buffered_rows:
+                return
+
+            self._check_db_ready()
+            bulk_buffer = self.bulk_buffer
+            METRICS.count('db_rows', self.buffered_rows)
+            self.bulk_buffer = {}
+            self.buffered_rows = 0
+
+        flush_timer = METRICS.timer('db_flush_seconds', 'Writing a batch of rows')
+        with flush_timer, self._lease() as connection, self.backend.transaction(connection):
+            for table_name in sorted(bulk_buffer, key=lambda name: self.table_order.get(name, len(self.table_order))):
+                (columns, conversions), rows = bulk_buffer[table_name]
+                started = time.perf_counter()
+                try:
+                    with self.backend.savepoint(connection):
+                        self.backend.insert_rows(
+                            connection,
+                            self._get_insert_statement(table_name, columns, or_ignore=True, conversions=conversions),
+                            rows)
+                except self.backend.errors as msg:
+                    print(f"Could not insert {len(rows)} rows to {table_name}: {msg}")
+                    continue
+                self._update_bulk_insert_stats(table_name, len(rows), time.perf_counter() - started)
+
+    def replace_to_db(self, table_name, rows):
+        """Inserts or replaces rows within a single transaction
+        Rows with the same primary key as an existing row overwrite it,
+        e.g. to move a checkpoint forward.
+
+        :param table_name:
+            Name of your SQL Table
+        :param rows:
+            Dicts sharing the same keys
+        :type rows: list
+        """
+        if not rows:
+            return
+
+        self._check_db_ready()
+        columns = tuple(rows[0].keys())
+        try:
+            with self._lease() as connection, self.backend.transaction(connection):
+                self.backend.insert_rows(
+                    connection,
+                    self._get_insert_statement(table_name, columns, or_replace=True),
+                    [tuple(row[column] for column in columns) for row in rows])
+        except self.backend.errors as msg:
+            print(f"Could not replace {len(rows)} rows in {table_name}: {msg}")
+
+    def _update_bulk_insert_stats(self, table_name, rows, seconds):
+        table_stats = self.bulk_insert_stats.setdefault(
+            table_name, {'rows': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+        )
+        table_stats['rows'] += rows
+        table_stats['seconds'] += seconds
+        if table_stats['seconds']:
+            table_stats['rows_per_second'] = table_stats['rows'] / table_stats['seconds']
+
+    def _check_db_ready(self):
+        if not any(self.job_check.values()) and not self.backend.exists():
+            print("Init. and create your db before inserting!")
+            sys.exit()
+
+    def _get_insert_statement(self, table_name, columns, or_ignore=False, or_replace=False, conversions=None):
+        """Learns to connect datatypes with tables
+        The SQL text is built once per table and column tuple, so SQLite3
+        can reuse its prepared statement from the statement cache.
+
+        :param table_name:
+            Name of your SQL Table
+        :param columns:
+            Column names in the order of the inserted values
+        :type columns: tuple
+        :param or_ignore:
+            Skip rows violating a constraint, defaults to False
+        :param or_replace:
+            Overwrite rows with the same unique key, defaults to False
+        :param conversions:
+            Conversion of every value, see bulk_insert_row, defaults to None
+        :return: The INSERT statement of the backend
+        """
+        key = (table_name, columns, or_ignore, or_replace, conversions)
+        try:
+            return self.insert_statements[key]
+        except KeyError:
+            insert_statement = self.backend.insert_statement(
+                table_name, columns, or_ignore=or_ignore, or_replace=or_replace, conversions=conversions
+            )
+            self.insert_statements[key] = insert_statement
+            return insert_statement
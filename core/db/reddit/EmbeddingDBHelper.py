@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""Helper functions to embed and search the images of our specific DB
+Vectors are kept next to the database in an EmbeddingStore, keyed by
+images.id. Only downloaded images without a vector are embedded, decoding
+runs in threads while Pillow releases the GIL.
+
+A vector index holds the store's rows in the same order, so only rows
+beyond its length have to be added after new images were embedded.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.image.EmbeddingStore import EmbeddingStore
+from core.image.ImageEmbedder import ImageEmbedder
+from core.image.VectorIndex import create_vector_index, load_vector_index
+from helper.metrics.MetricsRegistry import METRICS
+
+
+def open_embedding_store(store_dir, image_embedder):
+    """Opens or creates the store of an embedder's vectors
+
+    :raises ValueError: If the store holds vectors of another kind
+    """
+    return EmbeddingStore(store_dir, image_embedder.dim, image_embedder.dtype)
+
+
+def embed_downloaded_images(reddit_db_handler, embedding_store, image_embedder=None, batch_size=256,
+                            decode_workers=4):
+    """Embeds all downloaded images, which are not in the store yet
+    Images, which can not be decoded, are skipped.
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param embedding_store: The EmbeddingStore the vectors are appended to
+    :param image_embedder: The ImageEmbedder, defaults to None ('features')
+    :param batch_size: Images embedded at once, defaults to 256
+    :param decode_workers: Threads decoding images, defaults to 4
+    :return: Amount of embedded images
+    :rtype: int
+    """
+    image_embedder = image_embedder or ImageEmbedder()
+    cursor = reddit_db_handler.select_from_db("SELECT image_id, file_path FROM image_files ORDER BY image_id")
+    image_files = [
+        (image_id, file_path) for image_id, file_path in cursor.fetchall() if image_id not in embedding_store
+    ]
+
+    embedded = 0
+    with ThreadPoolExecutor(max_workers=decode_workers) as executor:
+        for start in range(0, len(image_files), batch_size):
+            batch = image_files[start:start + batch_size]
+            with METRICS.timer('embed_decode_seconds', 'Decoding a batch of images to embed'):
+                images = list(executor.map(lambda image_file: _load_image(image_embedder, *image_file), batch))
+
+            decoded = [(image_id, image) for (image_id, _), image in zip(batch, images) if image is not None]
+            if not decoded:
+                continue
+            image_ids, images = zip(*decoded)
+            with METRICS.timer('embed_seconds', 'Embedding a batch of decoded images'):
+                vectors = image_embedder.embed(np.stack(images))
+            embedded += embedding_store.append(list(image_ids), vectors)
+            METRICS.count('embedded_images', len(image_ids), 'Images with a new vector in the embedding store')
+    return embedded
+
+
+def update_vector_index(embedding_store, vector_index, chunk_rows=100_000):
+    """Adds the vectors embedded since the index was last updated
+
+    :param embedding_store: The EmbeddingStore the index was filled from
+    :param vector_index: A BruteForceIndex or IVFPQIndex
+    :param chunk_rows: Vectors read at once, defaults to 100000
+    :return: Amount of added vectors
+    :rtype: int
+    """
+    if len(vector_index) > len(embedding_store) or vector_index.ids != embedding_store.ids[:len(vector_index)]:
+        raise ValueError("The vector index was not filled from this embedding store")
+
+    first_row = len(vector_index)
+    for start in range(first_row, len(embedding_store), chunk_rows):
+        vector_index.add(
+            embedding_store.ids[start:start + chunk_rows], embedding_store.vectors[start:start + chunk_rows]
+        )
+    return len(embedding_store) - first_row
+
+
+def open_vector_index(index_dir, embedding_store, kind='ivfpq'):
+    """Loads the index saved in index_dir, or creates an empty one
+
+    :param kind: One of VECTOR_INDEXES, used if there is no saved index
+    """
+    if os.path.exists(os.path.join(index_dir, 'meta.json')):
+        return load_vector_index(index_dir)
+    return create_vector_index(kind, embedding_store.dim)
+
+
+def similar_images(reddit_db_handler, embedding_store, vector_index, image_id, k=10):
+    """Finds the visually closest posts of an image, with their latest popularity
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param embedding_store: The EmbeddingStore holding the image's vector
+    :param vector_index: An index filled from the store
+    :param image_id: The images.id to search with
+    :param k: Amount of similar posts, the image itself included, defaults to 10
+    :return:
+        List of dicts with image_id, distance, subreddit, permalink and ups,
+        num_comments and last_checked of the image's latest image_success row,
+        closest first
+    :rtype: list
+    :raises KeyError: If the image has no vector
+    """
+    query_vector = embedding_store.get([image_id])[0]
+    if vector_index.kind == 'ivfpq':
+        # The store holds the exact vectors in the order of the index
+        neighbours = vector_index.query(query_vector, k, rerank_vectors=embedding_store.vectors)
+    else:
+        neighbours = vector_index.query(query_vector, k)
+    if not neighbours:
+        return []
+
+    placeholders = ', '.join('?' * len(neighbours))
+    cursor = reddit_db_handler.select_from_db(
+        "SELECT images.id, substr(subreddits.subreddit_name_prefixed, 3), images.permalink, "
+        "image_success.ups, image_success.num_comments, image_success.last_checked FROM images "
+        "LEFT JOIN subreddits ON subreddits.id = images.subreddit_id "
+        "LEFT JOIN (SELECT image_id, max(id) AS id FROM image_success "
+        f"WHERE image_id IN ({placeholders}) GROUP BY image_id) latest ON latest.image_id = images.id "
+        "LEFT JOIN image_success ON image_success.id = latest.id "
+        f"WHERE images.id IN ({placeholders})",
+        [neighbour_id for neighbour_id, _ in neighbours] * 2,
+    )
+    posts = {row[0]: row[1:] for row in cursor}
+
+    columns = ('subreddit', 'permalink', 'ups', 'num_comments', 'last_checked')
+    return [
+        dict(image_id=neighbour_id, distance=distance, **dict(zip(columns, posts.get(neighbour_id, (None, ) * 5))))
+        for neighbour_id, distance in neighbours
+    ]
+
+
+def _load_image(image_embedder, image_id, file_path):
+    try:
+        return image_embedder.load_image(file_path)
+    except OSError as error:
+        print(f"Could not embed {file_path}: {error}")
+        return None
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Helper functions to export our specific DB into columnar datasets
+A view is streamed chunk by chunk, every chunk becomes one part file per
+partition, e.g. with partition_by=('subreddit', 'date'):
+
+    <output_dir>/subreddit=EarthPorn/date=2020-01-01/part-000000000001.parquet
+
+Every view is read in the order of an increasing watermark column. The
+last exported watermark is kept in <output_dir>/_export.json, the next
+export of the same view into the same directory only appends newer rows.
+Exported rows are never updated, joined columns hold their values at the
+time of the export.
+"""
+import json
+import os
+
+from core.db.reddit.ExportViews import EXPORT_VIEWS, PARTITION_KEYS
+from core.io.ColumnarFormats import COLUMNAR_FORMATS
+from core.io.ColumnarWriter import write_part
+
+MANIFEST_NAME = '_export.json'
+
+
+def export_view(reddit_db_handler, view_name, output_dir, export_format=None, partition_by=(),
+                chunk_rows=50_000):
+    """Appends all rows of a view newer than the last export to a dataset
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param view_name: One of EXPORT_VIEWS
+    :param output_dir: The directory of the dataset
+    :param export_format: One of COLUMNAR_FORMATS, defaults to the first one
+    :param partition_by: Any of PARTITION_KEYS, defaults to () (no partitions)
+    :param chunk_rows: Rows read and written at once, defaults to 50000
+    :return: Dict with 'rows' and 'parts' of this export and the 'watermark'
+    :rtype: Dict
+    :raises KeyError: If the view or format is unknown
+    :raises ValueError:
+        If the view can not be partitioned as asked or the dataset
+        was exported with another format or partitioning
+    """
+    try:
+        view = EXPORT_VIEWS[view_name]
+    except KeyError:
+        raise KeyError(f"Unknown export view '{view_name}', choose one of: {', '.join(EXPORT_VIEWS)}")
+    export_format = export_format or COLUMNAR_FORMATS[0]
+    partition_by = tuple(partition_by)
+    partition_columns = _partition_columns(view, partition_by)
+
+    manifest = _read_manifest(output_dir)
+    view_manifest = manifest.setdefault(view_name, {
+        'format': export_format, 'partition_by': list(partition_by), 'watermark': 0, 'rows': 0,
+    })
+    if view_manifest['format'] != export_format or view_manifest['partition_by'] != list(partition_by):
+        raise ValueError(
+            f"{output_dir} holds '{view_name}' as {view_manifest['format']} partitioned by "
+            f"{view_manifest['partition_by']}, export into another directory"
+        )
+
+    view_dir = os.path.join(output_dir, view_name)
+    stats = {'rows': 0, 'parts': 0, 'watermark': view_manifest['watermark']}
+    cursor = reddit_db_handler.select_from_db(view.query, (view_manifest['watermark'], ))
+    while True:
+        rows = cursor.fetchmany(chunk_rows)
+        if not rows:
+            break
+
+        # Named after the first watermark, a chunk written again replaces its parts
+        part_name = f'part-{rows[0][0]:012d}'
+        for partition, partition_rows in _partitions(rows, partition_columns, partition_by).items():
+            values = list(zip(*partition_rows))[1:]
+            columns = [(name, column_type, list(column_values))
+                       for (name, column_type), column_values in zip(view.columns, values)]
+            write_part(os.path.join(view_dir, *partition), part_name, columns, export_format)
+            stats['parts'] += 1
+
+        stats['rows'] += len(rows)
+        stats['watermark'] = rows[-1][0]
+        view_manifest['watermark'] = stats['watermark']
+        view_manifest['rows'] += len(rows)
+        # Only moved once all parts of the chunk are written
+        _write_manifest(output_dir, manifest)
+    return stats
+
+
+def _partition_columns(view, partition_by):
+    """Indices of the partition keys within a selected row"""
+    partition_columns = []
+    names = [name for name, _ in view.columns]
+    for partition_key in partition_by:
+        if partition_key not in PARTITION_KEYS:
+            raise ValueError(f"Unknown partition key '{partition_key}', choose one of: {', '.join(PARTITION_KEYS)}")
+        column = view.subreddit_column if partition_key == 'subreddit' else view.date_column
+        if column is None:
+            raise ValueError(f"The view can not be partitioned by {partition_key}")
+        # + 1 skips the watermark
+        partition_columns.append(names.index(column) + 1)
+    return partition_columns
+
+
+def _partitions(rows, partition_columns, partition_by):
+    """Groups rows by their partition directories, e.g. ('subreddit=pics', 'date=2020-01-01')"""
+    partitions = {}
+    for row in rows:
+        partition = []
+        for partition_key, column in zip(partition_by, partition_columns):
+            value = row[column]
+            if value is None:
+                value = '__null__'
+            elif partition_key == 'date':
+                value = str(value)[:10]
+            partition.append(f"{partition_key}={str(value).replace('/', '_')}")
+        partitions.setdefault(tuple(partition), []).append(row)
+    return partitions
+
+
+def _read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_manifest(output_dir, manifest):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(path + '.tmp', path)
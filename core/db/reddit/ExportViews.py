@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""The views ExportDBHelper exports
+Every view selects an increasing watermark column first, followed by the
+exported columns and their types (see ColumnarWriter).
+"""
+from collections import namedtuple
+
+ExportView = namedtuple('ExportView', ['query', 'columns', 'subreddit_column', 'date_column'])
+PARTITION_KEYS = ('subreddit', 'date')
+
+# The first selected column is the watermark, it is not exported
+EXPORT_VIEWS = {
+    'images': ExportView(
+        "SELECT images.rowid, images.id, images.subreddit_id, images.image_url, images.permalink, "
+        "images.upload_time FROM images WHERE images.rowid > ? ORDER BY images.rowid",
+        (('id', 'str'), ('subreddit_id', 'str'), ('image_url', 'str'), ('permalink', 'str'),
+         ('upload_time', 'datetime')),
+        'subreddit_id', 'upload_time',
+    ),
+    'image_success': ExportView(
+        "SELECT id, image_id, ups, num_comments, gid_1, gid_2, gid_3, reddit_sort, reddit_time, "
+        "last_checked, time_passed FROM image_success WHERE id > ? ORDER BY id",
+        (('image_id', 'str'), ('ups', 'int'), ('num_comments', 'int'), ('gid_1', 'int'), ('gid_2', 'int'),
+         ('gid_3', 'int'), ('reddit_sort', 'str'), ('reddit_time', 'str'), ('last_checked', 'datetime'),
+         ('time_passed', 'str')),
+        None, 'last_checked',
+    ),
+    'image_processing': ExportView(
+        "SELECT id, image_id, title, google_permalink, guess, first_result FROM image_processing "
+        "WHERE id > ? ORDER BY id",
+        (('image_id', 'str'), ('title', 'str'), ('google_permalink', 'str'), ('guess', 'str'),
+         ('first_result', 'str')),
+        None, None,
+    ),
+    # One row per observation of an image, with everything a training job needs.
+    # Only image_success.id is watermarked, title, guess, sha256 and file_path are a snapshot
+    # at export time: they stay empty for rows exported before the image was looked up or downloaded.
+    'training': ExportView(
+        "SELECT image_success.id, image_success.image_id, substr(subreddits.subreddit_name_prefixed, 3), "
+        "subreddits.subreddit_subscribers, images.image_url, images.upload_time, image_success.ups, "
+        "image_success.num_comments, "
+        "coalesce(image_success.gid_1, 0) + coalesce(image_success.gid_2, 0) + coalesce(image_success.gid_3, 0), "
+        "image_success.reddit_sort, image_success.reddit_time, image_success.last_checked, "
+        "image_processing.title, image_processing.guess, image_files.sha256, image_files.file_path "
+        "FROM image_success "
+        "JOIN images ON images.id = image_success.image_id "
+        "LEFT JOIN subreddits ON subreddits.id = images.subreddit_id "
+        "LEFT JOIN image_processing ON image_processing.image_id = image_success.image_id "
+        "LEFT JOIN image_files ON image_files.image_id = image_success.image_id "
+        "WHERE image_success.id > ? ORDER BY image_success.id",
+        (('image_id', 'str'), ('subreddit', 'str'), ('subreddit_subscribers', 'int'), ('image_url', 'str'),
+         ('upload_time', 'datetime'), ('ups', 'int'), ('num_comments', 'int'), ('gildings', 'int'),
+         ('reddit_sort', 'str'), ('reddit_time', 'str'), ('last_checked', 'datetime'), ('title', 'str'),
+         ('guess', 'str'), ('sha256', 'str'), ('file_path', 'str')),
+        'subreddit', 'upload_time',
+    ),
+}
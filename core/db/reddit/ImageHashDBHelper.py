@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Helper functions to store perceptual hashes in our specific DB
+The hashes live in the image_hashes table, next to the images table.
+"""
+import numpy as np
+
+from core.image.HammingIndex import MultiIndexHashing
+from core.image.ImageHasher import HASH_NAMES, ImageHasher, to_signed, to_unsigned
+
+
+def insert_image_hashes(reddit_db_handler, image_ids, hashes):
+    """Stores perceptual hashes next to their images
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param image_ids: The images.id of every hashed image
+    :param hashes: Output of ImageHasher.hash_files
+    :type hashes: Dict
+    """
+    signed_hashes = [to_signed(hashes[hash_name]).tolist() for hash_name in HASH_NAMES]
+    for image_id, *image_hashes in zip(image_ids, *signed_hashes):
+        reddit_db_handler.bulk_insert_to_db(
+            'image_hashes', dict(image_id=image_id, **dict(zip(HASH_NAMES, image_hashes)))
+        )
+    reddit_db_handler.flush()
+
+
+def hash_downloaded_images(reddit_db_handler, batch_size=256):
+    """Hashes all downloaded images, which are not hashed yet
+    Images, which can not be decoded, are skipped.
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param batch_size: Images hashed at once, defaults to 256
+    """
+    cursor = reddit_db_handler.select_from_db(
+        "SELECT image_files.image_id, image_files.file_path FROM image_files "
+        "LEFT JOIN image_hashes ON image_hashes.image_id = image_files.image_id "
+        "WHERE image_hashes.image_id IS NULL"
+    )
+    image_files = cursor.fetchall()
+
+    for start in range(0, len(image_files), batch_size):
+        image_ids, thumbnails = [], []
+        for image_id, file_path in image_files[start:start + batch_size]:
+            try:
+                thumbnails.append(ImageHasher.load_thumbnail(file_path))
+            except OSError as error:
+                print(f"Could not hash {file_path}: {error}")
+                continue
+            image_ids.append(image_id)
+
+        if image_ids:
+            insert_image_hashes(
+                reddit_db_handler, image_ids, ImageHasher.hash_thumbnails(np.stack(thumbnails))
+            )
+
+
+def load_image_hash_index(reddit_db_handler, hash_name='phash', hash_index=None):
+    """Loads the stored hashes into a near-duplicate index
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param hash_name: One of 'ahash', 'dhash', 'phash', defaults to 'phash'
+    :param hash_index: The index to fill, defaults to a new MultiIndexHashing
+    :return: The filled index
+    """
+    if hash_name not in HASH_NAMES:
+        raise KeyError(f"Unknown hash '{hash_name}', choose one of: {', '.join(HASH_NAMES)}")
+
+    hash_index = MultiIndexHashing() if hash_index is None else hash_index
+    cursor = reddit_db_handler.select_from_db(
+        f"SELECT image_id, {hash_name} FROM image_hashes WHERE {hash_name} IS NOT NULL"
+    )
+    while True:
+        rows = cursor.fetchmany(100000)
+        if not rows:
+            return hash_index
+        image_ids, image_hashes = zip(*rows)
+        hash_index.add(list(image_ids), to_unsigned(image_hashes))
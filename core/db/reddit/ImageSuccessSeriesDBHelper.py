@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Helper functions to track the popularity of posts over time
+Observations live in the image_success_series table, one row per change
+of a post's ups, comments or gildings at an integer epoch timestamp.
+A value holds until the next row of the post, so unchanged observations
+are never stored.
+
+Older rows are rolled up: of every resolution wide bucket only the
+last row is kept, see ROLLUP_TIERS.
+"""
+import time
+
+# (age in seconds, resolution in seconds) - rows older than age keep one row per resolution
+ROLLUP_TIERS = (
+    (24 * 60 * 60, 60 * 60),
+    (30 * 24 * 60 * 60, 24 * 60 * 60),
+)
+
+
+def rollup_image_success_series(reddit_db_handler, rollup_tiers=ROLLUP_TIERS, now=None):
+    """Keeps the last observation per bucket of every rollup tier
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param rollup_tiers:
+        (age, resolution) tuples in seconds, defaults to ROLLUP_TIERS
+    :param now:
+        The current epoch timestamp, defaults to time.time()
+    :return: Amount of deleted rows
+    :rtype: int
+    """
+    now = int(time.time() if now is None else now)
+
+    statements = []
+    for age, resolution in rollup_tiers:
+        cutoff = now - age
+        statements.append((
+            "DELETE FROM image_success_series "
+            "WHERE observed_at < ? AND resolution <= ? "
+            "AND (image_id, observed_at) NOT IN ("
+            "    SELECT image_id, MAX(observed_at) FROM image_success_series "
+            "    WHERE observed_at < ? AND resolution <= ? "
+            "    GROUP BY image_id, observed_at / ?"
+            ")",
+            (cutoff, resolution, cutoff, resolution, resolution),
+        ))
+        statements.append((
+            "UPDATE image_success_series SET resolution = ? WHERE observed_at < ? AND resolution < ?",
+            (resolution, cutoff, resolution),
+        ))
+    # Every second statement is an UPDATE
+    return sum(reddit_db_handler.update_db(statements)[::2])
+
+
+def image_success_trajectory(reddit_db_handler, image_id, start=0, end=None):
+    """The observations of a single post, oldest first
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param image_id: The images.id of the post
+    :param start: First epoch timestamp, defaults to 0
+    :param end: Last epoch timestamp, defaults to now
+    :return: (observed_at, ups, num_comments, gildings) tuples
+    :rtype: list
+    """
+    end = int(time.time() if end is None else end)
+    return reddit_db_handler.select_from_db(
+        "SELECT observed_at, ups, num_comments, gildings FROM image_success_series "
+        "WHERE image_id = ? AND observed_at BETWEEN ? AND ? ORDER BY observed_at",
+        (image_id, start, end),
+    ).fetchall()
+
+
+def top_risers(reddit_db_handler, start, end=None, limit=10):
+    """The posts which gained the most ups within a time window
+    The gain is measured from the value a post had at start (or its
+    first observation within the window) to its last value at end.
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param start: First epoch timestamp of the window
+    :param end: Last epoch timestamp of the window, defaults to now
+    :param limit: Amount of posts, defaults to 10
+    :return: (image_id, gained ups) tuples, highest gain first
+    :rtype: list
+    """
+    end = int(time.time() if end is None else end)
+    return reddit_db_handler.select_from_db(
+        "WITH changed AS ("
+        "    SELECT DISTINCT image_id FROM image_success_series "
+        "    WHERE observed_at BETWEEN ? AND ?"
+        ") "
+        "SELECT image_id, ("
+        "    SELECT ups FROM image_success_series AS latest "
+        "    WHERE latest.image_id = changed.image_id AND latest.observed_at <= ? "
+        "    ORDER BY latest.observed_at DESC LIMIT 1"
+        ") - COALESCE(("
+        "    SELECT ups FROM image_success_series AS baseline "
+        "    WHERE baseline.image_id = changed.image_id AND baseline.observed_at <= ? "
+        "    ORDER BY baseline.observed_at DESC LIMIT 1"
+        "), ("
+        "    SELECT ups FROM image_success_series AS earliest "
+        "    WHERE earliest.image_id = changed.image_id AND earliest.observed_at >= ? "
+        "    ORDER BY earliest.observed_at LIMIT 1"
+        ")) AS gained_ups "
+        "FROM changed ORDER BY gained_ups DESC LIMIT ?",
+        (start, end, end, start, start, limit),
+    ).fetchall()
@@ -1,25 +1,99 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+import time
+from collections import OrderedDict
 
+from core.db.DBBackends import EPOCH_DATETIME, SECONDS_TIME
 from helper.google.GoogleCrawler import GoogleCrawler
+from helper.google.GoogleSearchPool import GoogleSearchPool
+from helper.dedup.SeenSet import create_seen_set
+from helper.metrics.MetricsRegistry import METRICS
+
+# Every formatted row is a tuple of the table's columns in this order
+TABLE_COLUMNS = {
+    'subreddits': ('id', 'subreddit_name_prefixed', 'subreddit_subscribers'),
+    'images': ('id', 'subreddit_id', 'image_url', 'permalink', 'upload_time'),
+    'image_processing': ('image_id', 'title', 'guess', 'google_permalink', 'first_result'),
+    'image_success': (
+        'image_id', 'ups', 'num_comments', 'reddit_sort', 'reddit_time', 'last_checked', 'time_passed',
+        'gid_1', 'gid_2', 'gid_3',
+    ),
+    'image_success_series': ('image_id', 'observed_at', 'ups', 'num_comments', 'gildings'),
+}
+# Tables referenced by foreign keys are written before the tables referencing them
+TABLE_ORDER = tuple(TABLE_COLUMNS)
+
+# Timestamps stay epochs in the rows, the database converts them while inserting
+COLUMN_CONVERSIONS = {
+    'upload_time': EPOCH_DATETIME,
+    'last_checked': EPOCH_DATETIME,
+    'time_passed': SECONDS_TIME,
+}
+TABLE_CONVERSIONS = {
+    table_name: (
+        tuple(COLUMN_CONVERSIONS.get(column) for column in columns)
+        if any(column in COLUMN_CONVERSIONS for column in columns) else None
+    )
+    for table_name, columns in TABLE_COLUMNS.items()
+}
 
 
 class RedditDBFormatter:
     """Allows formatting of RedditChecker Output
     """
 
-    def __init__(self):
-        self.seen_subreddits = set()
-        self.seen_posts = set()
-        self.google_crawler = GoogleCrawler()
+    def __init__(self, google_workers=0, google_rate=1.0, google_result_cache=None,
+                 seen_set_backend='set', seen_set_options=None, timeseries=False,
+                 max_tracked_posts=1_000_000):
+        """Init for the RedditDBFormatter class
+
+        :param google_workers:
+            Threads running the reverse image searches in the background,
+            defaults to 0 (searches block format_data)
+        :param google_rate:
+            Maximum reverse image searches per second, defaults to 1.0
+            Only used with google_workers
+        :param google_result_cache:
+            A GoogleResultCache checked before every search, defaults to None
+        :param seen_set_backend:
+            How seen posts and subreddits are remembered, one of
+            SEEN_SET_BACKENDS ('set', 'exact', 'bloom'), defaults to 'set'
+        :param seen_set_options:
+            Keyword arguments of the seen set backend, defaults to None
+        :param timeseries:
+            Writes image_success_series instead of image_success rows,
+            an observation equal to the previous one of the post is skipped,
+            defaults to False
+        :param max_tracked_posts:
+            Posts whose last observation is remembered in timeseries mode,
+            defaults to 1 million. A forgotten post gets one redundant row.
+        """
+        seen_set_options = seen_set_options or {}
+        self.seen_subreddits = create_seen_set(seen_set_backend, **seen_set_options)
+        self.seen_posts = create_seen_set(seen_set_backend, **seen_set_options)
+        self.timeseries = timeseries
+        self.max_tracked_posts = max_tracked_posts
+        self.last_observations = OrderedDict()
+        self.google_crawler = GoogleCrawler(result_cache=google_result_cache)
+        self.google_search_pool = None
+        if google_workers:
+            self.google_search_pool = GoogleSearchPool(
+                self.google_crawler, workers=google_workers, rate=google_rate
+            )
 
     def format_data(self, reddit_data):
         """Corrects the data output format to fit the database
 
+        If a google_search_pool is used, the image_processing rows are yielded
+        on their own, once their lookup is finished and the next post is
+        formatted. The rows of the last lookups are returned by close().
+
         :param reddit_data: General data from RedditChecker
-        :return: Data in a format to be used in DBHandler.insert_to_database
+        :return:
+            Dicts of table names and row tuples, see TABLE_COLUMNS,
+            to be used with DBHandler.bulk_insert_row
         """
         for data in reddit_data:
+            started = time.perf_counter()
             temporary_formatted_data = {}
 
             if not data.subreddit_id in self.seen_subreddits:
@@ -29,50 +103,91 @@ class RedditDBFormatter:
             if not data.post_id in self.seen_posts:
                 temporary_formatted_data['images'] = self._generate_images_table(data)
 
-                image_url = temporary_formatted_data['images']['image_url']
-                temporary_formatted_data['image_processing'] = self._generate_image_processing_table(data, image_url)
+                image_url = data.url
+                if self.google_search_pool is None:
+                    temporary_formatted_data['image_processing'] = self._generate_image_processing_table(data, image_url)
+                else:
+                    self.google_search_pool.submit(data.post_id, data.title, image_url)
                 self.seen_posts.add(data.post_id)
 
-            temporary_formatted_data['image_success'] = self._generate_image_success_table(data)
-            yield temporary_formatted_data
+            if not self.timeseries:
+                temporary_formatted_data['image_success'] = self._generate_image_success_table(data)
+            else:
+                image_success_series = self._generate_image_success_series_table(data)
+                if image_success_series:
+                    temporary_formatted_data['image_success_series'] = image_success_series
+
+            METRICS.observe('format_seconds', time.perf_counter() - started, 'Formatting a post into rows')
+            if temporary_formatted_data:
+                yield temporary_formatted_data
+
+            if self.google_search_pool is not None:
+                yield from self._generate_completed_image_processing()
+
+    def close(self):
+        """Finishes the queued google lookups and stops their workers
+        Lookups still running after the last format_data are only
+        returned here, insert them like the rows of format_data.
+
+        :return: List of dicts of table names and row tuples
+        :rtype: list
+        """
+        if self.google_search_pool is None:
+            return []
+        self.google_search_pool.close()
+        return list(self._generate_completed_image_processing())
+
+    def _generate_completed_image_processing(self):
+        for post_id, title, google_process in self.google_search_pool.completed():
+            yield {'image_processing': self._image_processing_row(post_id, title, google_process)}
 
     def _generate_subreddits_table(self, data):
-        return {
-            'id': data.subreddit_id,
-            'subreddit_name_prefixed': data.subreddit_name_prefixed,
-            'subreddit_subscribers': data.subreddit_subscribers,
-        }
-    
+        return data.subreddit_id, data.subreddit_name_prefixed, data.subreddit_subscribers
+
     def _generate_images_table(self, data):
-        return {
-            'id': data.post_id,
-            'subreddit_id': data.subreddit_id,
-            'image_url': data.url,
-            'permalink': data.permalink,
-            'upload_time': data.utc_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-        }
-    
+        return data.post_id, data.subreddit_id, data.url, data.permalink, data.created_utc
+
     def _generate_image_processing_table(self, data, image_url):
         google_process = self.google_crawler.google_reverse_image_search(image_url)
-        return {
-            'image_id': data.post_id,
-            'title': data.title,
-            'guess': google_process['guess'],
-            'google_permalink': google_process['google_permalink'],
-            'first_result': google_process['first_result'],
-        }
+        return self._image_processing_row(data.post_id, data.title, google_process)
+
+    @staticmethod
+    def _image_processing_row(post_id, title, google_process):
+        return (
+            post_id,
+            title,
+            google_process['guess'],
+            google_process['google_permalink'],
+            google_process['first_result'],
+        )
+
+    def _generate_image_success_series_table(self, data):
+        """A compact observation of the post or None, if nothing changed since the last one"""
+        observation = (data.ups, data.num_comments, sum(data.gildings.values()))
+        if self.last_observations.get(data.post_id) == observation:
+            self.last_observations.move_to_end(data.post_id)
+            return None
+
+        self.last_observations[data.post_id] = observation
+        self.last_observations.move_to_end(data.post_id)
+        if len(self.last_observations) > self.max_tracked_posts:
+            self.last_observations.popitem(last=False)
+
+        return (data.post_id, int(time.time())) + observation
 
     def _generate_image_success_table(self, data):
-        return {
-            'image_id': data.post_id,
-            'ups': data.ups,
-            'num_comments': data.num_comments,
-            'reddit_sort': data.reddit_sort,
-            'reddit_time': data.reddit_time,
-            'last_checked': datetime.utcnow(),
-            'time_passed': str(datetime.utcnow() - data.utc_datetime),
+        checked_utc = int(time.time())
+        gildings = data.gildings
+        return (
+            data.post_id,
+            data.ups,
+            data.num_comments,
+            data.reddit_sort,
+            data.reddit_time,
+            checked_utc,
+            max(checked_utc - data.created_utc, 0),
             # TODO generalize
-            'gid_1': data.gildings.get('gid_1', None),
-            'gid_2': data.gildings.get('gid_2', None),
-            'gid_3': data.gildings.get('gid_3', None),
-        }
+            gildings.get('gid_1'),
+            gildings.get('gid_2'),
+            gildings.get('gid_3'),
+        )
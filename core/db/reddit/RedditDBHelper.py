@@ -3,8 +3,12 @@
 
 """
 import re
+
 import requests
 
+from core.db.reddit.RedditDBFormatter import TABLE_COLUMNS, TABLE_CONVERSIONS
+from core.reddit.helper.RedditArgumentSpelling import correct_sort, correct_time
+
 
 def generate_reddit_data(reddit, reddit_sorts, reddit_times):
     """Helper to generate all needed data
@@ -16,16 +20,44 @@ def generate_reddit_data(reddit, reddit_sorts, reddit_times):
     :param reddit_times: The time arguments given by the user
     :type reddit_times: str
     """
-    reddit_sorts = reddit_sorts.split(" ")
-    reddit_times = reddit_times.split(" ")
+    # All combinations are fetched through one request pool
+    yield reddit.subreddit_grid_data(sort_time_pairs(reddit_sorts, reddit_times))
+
 
-    for reddit_sort in reddit_sorts:
-        for reddit_time in reddit_times:
-            yield reddit.subreddit_data(reddit_sort=reddit_sort, reddit_time=reddit_time)
+def sort_time_pairs(reddit_sorts, reddit_times):
+    """Every combination of the sort and time arguments given by the user
+    Misspelled arguments are corrected once, before any request is sent.
+
+    :param reddit_sorts: The sort arguments, separated by spaces
+    :type reddit_sorts: str
+    :param reddit_times: The time arguments, separated by spaces
+    :type reddit_times: str
+    :rtype: list
+    """
+    corrected_sorts = _corrected_arguments(reddit_sorts.split(), correct_sort)
+    corrected_times = _corrected_arguments(reddit_times.split(), correct_time)
+    return [
+        (reddit_sort, reddit_time)
+        for reddit_sort in corrected_sorts
+        for reddit_time in corrected_times
+    ]
+
+
+def _corrected_arguments(arguments, correct):
+    """Corrects every argument, arguments equal after the correction are kept once"""
+    corrected_arguments = []
+    for argument in arguments:
+        corrected = correct(argument)
+        if corrected != argument:
+            print(f"'{corrected}' is the correct spelling :)")
+        if corrected not in corrected_arguments:
+            corrected_arguments.append(corrected)
+    return corrected_arguments
 
 
 def insert_reddit_data_to_db(reddit_db_handler, data):
     """Allows easier insertion into our specific database
+    Rows are buffered and written in batches, see DBHandler.bulk_insert_to_db
 
     :param reddit_db_handler:
         A RedditChecker.db_handler object
@@ -34,8 +66,90 @@ def insert_reddit_data_to_db(reddit_db_handler, data):
     """
     for reddit_data in data:
         for post in reddit_data:
-            for table_name, post_data in post.items():
-                reddit_db_handler.insert_to_db(table_name, post_data)
+            insert_formatted_post(reddit_db_handler, post)
+
+    reddit_db_handler.flush()
+
+
+def insert_formatted_post(reddit_db_handler, post):
+    """Buffers the row tuples of one post of RedditDBFormatter.format_data
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param post: Dict of table names and row tuples
+    """
+    for table_name, row in post.items():
+        reddit_db_handler.bulk_insert_row(
+            table_name, TABLE_COLUMNS[table_name], row, TABLE_CONVERSIONS[table_name]
+        )
+
+
+def load_crawl_state(reddit, reddit_db_handler):
+    """Warm-starts an incremental crawl from an earlier run
+    Loads the high-water marks of crawl_checkpoints and marks all
+    stored posts and subreddits as seen by the RedditDBFormatter.
+
+    :param reddit: The RedditChecker object
+    :type reddit: RedditChecker
+    :param reddit_db_handler:
+        A DBHandler connected to the database of the earlier runs
+    :type reddit_db_handler: DBHandler
+    """
+    try:
+        checkpoints = reddit_db_handler.select_from_db(
+            "SELECT subreddit, reddit_sort, reddit_time, newest_created_utc, newest_fullname "
+            "FROM crawl_checkpoints"
+        )
+        for subreddit, reddit_sort, reddit_time, newest_created_utc, newest_fullname in checkpoints:
+            reddit.crawl_checkpoints[(subreddit, reddit_sort, reddit_time)] = (
+                newest_created_utc, newest_fullname
+            )
+
+        reddit_db_formatter = reddit.reddit_db_formatter
+        reddit_db_formatter.seen_posts.update(
+            image_id for image_id, in reddit_db_handler.select_from_db("SELECT id FROM images")
+        )
+        reddit_db_formatter.seen_subreddits.update(
+            subreddit_id for subreddit_id, in reddit_db_handler.select_from_db("SELECT id FROM subreddits")
+        )
+    except reddit_db_handler.backend.errors as msg:
+        print(f"Could not load the crawl state, crawling everything: {msg}")
+
+
+def save_crawl_checkpoints(reddit_db_handler, crawl_checkpoints):
+    """Moves the high-water marks forward
+    Call it after the crawled posts are inserted, so an interrupted
+    run never skips posts.
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param crawl_checkpoints: Rows of RedditChecker.crawl_checkpoint_rows
+    :type crawl_checkpoints: list
+    """
+    reddit_db_handler.replace_to_db('crawl_checkpoints', crawl_checkpoints)
+
+
+def download_reddit_images(reddit_db_handler, reddit_downloader):
+    """Downloads all images, which are not downloaded yet
+
+    :param reddit_db_handler:
+        A RedditChecker.db_handler object
+    :type reddit_db_handler: DBHandler
+    :param reddit_downloader: The downloader to use
+    :type reddit_downloader: RedditDownloader
+    """
+    pending_images = reddit_db_handler.select_from_db(
+        "SELECT images.id, images.image_url FROM images "
+        "LEFT JOIN image_files ON image_files.image_id = images.id "
+        "WHERE image_files.image_id IS NULL AND images.image_url IS NOT NULL"
+    ).fetchall()
+
+    for image_file in reddit_downloader.download(pending_images):
+        reddit_db_handler.bulk_insert_to_db('image_files', image_file)
+
+    reddit_db_handler.flush()
 
 
 # Seperate in the future
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""An append-only, memory-mapped array of vectors keyed by images.id
+A store is a directory of three files:
+
+    vectors.bin: the raw vectors, one row after another
+    ids.txt: the images.id of every row, one per line
+    meta.json: dim, dtype and the amount of complete rows
+
+Rows are appended to the end of the files, the row count in meta.json
+is written last. Rows beyond it, left behind by an interrupted append,
+are cut off when the store is opened again.
+
+Reading maps vectors.bin into memory, training runs slice it without
+copying or decoding anything.
+"""
+import json
+import os
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """Stores one vector per image
+    Usage:
+
+        embedding_store = EmbeddingStore('embeddings', dim=256)
+        embedding_store.append(['abc', 'abd'], vectors)
+        embedding_store.vectors[embedding_store.row('abc')]
+    """
+    def __init__(self, directory, dim=None, dtype=None):
+        """Init for the EmbeddingStore class
+
+        :param directory: The directory of the store, it is created if needed
+        :param dim: Length of every vector, defaults to None (the dim of an existing store)
+        :param dtype:
+            numpy dtype of the vectors, defaults to None
+            (the dtype of an existing store or float32)
+        :raises ValueError: If dim or dtype differ from the existing store
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, 'vectors.bin')
+        self.ids_path = os.path.join(directory, 'ids.txt')
+        self.meta_path = os.path.join(directory, 'meta.json')
+
+        meta = self._read_meta()
+        if meta is None:
+            if dim is None:
+                raise ValueError(f"{directory} holds no store, a dim is needed to create one")
+            meta = {'dim': dim, 'dtype': np.dtype(dtype or 'float32').str, 'count': 0}
+            self._write_meta(meta)
+        elif (dim is not None and dim != meta['dim']) or (dtype is not None and np.dtype(dtype).str != meta['dtype']):
+            raise ValueError(
+                f"{directory} holds vectors of dim {meta['dim']} and dtype {meta['dtype']}, "
+                f"not {dim} and {dtype}"
+            )
+
+        self.dim = meta['dim']
+        self.dtype = np.dtype(meta['dtype'])
+        self.count = meta['count']
+        self.ids = self._recover()
+        self.rows = {image_id: row for row, image_id in enumerate(self.ids)}
+        self._vectors = None
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, image_id):
+        return image_id in self.rows
+
+    def row(self, image_id):
+        """Row of an image within vectors
+
+        :raises KeyError: If the image has no vector
+        """
+        return self.rows[image_id]
+
+    @property
+    def vectors(self):
+        """All vectors as a read-only memory map of shape (len, dim)
+
+        :rtype: numpy.ndarray
+        """
+        if self._vectors is None or len(self._vectors) != self.count:
+            if self.count == 0:
+                self._vectors = np.empty((0, self.dim), dtype=self.dtype)
+            else:
+                self._vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(self.count, self.dim))
+        return self._vectors
+
+    def get(self, image_ids):
+        """Copies the vectors of some images
+
+        :rtype: numpy.ndarray
+        """
+        return self.vectors[[self.rows[image_id] for image_id in image_ids]]
+
+    def append(self, image_ids, vectors):
+        """Appends the vectors of images, which are not stored yet
+
+        :param image_ids: The images.id of every vector
+        :param vectors: Array-like of shape (len(image_ids), dim)
+        :return: Amount of appended vectors
+        :rtype: int
+        """
+        vectors = np.asarray(vectors, dtype=self.dtype).reshape(-1, self.dim)
+        if len(image_ids) != len(vectors):
+            raise ValueError("Every vector needs an id")
+
+        new_rows = {}
+        for position, image_id in enumerate(image_ids):
+            if image_id not in self.rows and image_id not in new_rows:
+                new_rows[image_id] = position
+        if not new_rows:
+            return 0
+
+        with open(self.vectors_path, 'ab') as vectors_file:
+            vectors_file.write(np.ascontiguousarray(vectors[list(new_rows.values())]).tobytes())
+        with open(self.ids_path, 'a') as ids_file:
+            ids_file.write(''.join(f'{image_id}\n' for image_id in new_rows))
+
+        for image_id in new_rows:
+            self.rows[image_id] = len(self.ids)
+            self.ids.append(image_id)
+        self.count += len(new_rows)
+        self._write_meta({'dim': self.dim, 'dtype': self.dtype.str, 'count': self.count})
+        return len(new_rows)
+
+    def _recover(self):
+        """Reads the ids and cuts off rows of an interrupted append"""
+        row_bytes = self.dim * self.dtype.itemsize
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > self.count * row_bytes:
+            with open(self.vectors_path, 'r+b') as vectors_file:
+                vectors_file.truncate(self.count * row_bytes)
+
+        ids = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path) as ids_file:
+                ids = ids_file.read().splitlines()
+            if len(ids) < self.count:
+                raise ValueError(f"{self.ids_path} is missing ids, the store is broken")
+            if len(ids) > self.count:
+                ids = ids[:self.count]
+                with open(self.ids_path, 'w') as ids_file:
+                    ids_file.write(''.join(f'{image_id}\n' for image_id in ids))
+        elif self.count:
+            raise ValueError(f"{self.ids_path} is missing, the store is broken")
+        return ids
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path) as meta_file:
+                return json.load(meta_file)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        with open(self.meta_path + '.tmp', 'w') as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
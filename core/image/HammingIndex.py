@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Near-duplicate search over 64 bit perceptual hashes
+Two indexes are available:
+
+    - MultiIndexHashing: splits every hash into chunks and looks up the
+      chunks in sorted arrays. By the pigeonhole principle, a hash within
+      radius r differs in at most r // chunks bits in one of its chunks.
+      Fast for small radii on millions of hashes.
+    - BKTree: a metric tree, useful for larger radii on smaller sets.
+"""
+from itertools import combinations
+
+import numpy as np
+
+from core.image.ImageHasher import hamming_distance
+
+HASH_BITS = 64
+
+
+class MultiIndexHashing:
+    """Multi-index hashing over uint64 hashes
+    Usage:
+
+        index = MultiIndexHashing()
+        index.add(['abc', 'abd'], hashes)
+        index.query(some_hash, radius=6)  # [('abc', 0), ('abd', 3)]
+    """
+    def __init__(self, chunks=4):
+        """Init for the MultiIndexHashing class
+
+        :param chunks:
+            Amount of chunks every hash is split into, defaults to 4 (16 bits each)
+        """
+        if HASH_BITS % chunks:
+            raise ValueError(f"{HASH_BITS} bits can not be split into {chunks} chunks")
+
+        self.chunks = chunks
+        self.chunk_bits = HASH_BITS // chunks
+        self.chunk_mask = np.uint64((1 << self.chunk_bits) - 1)
+        self.ids = []
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.pending_hashes = []
+        self.sorted_chunks = []
+        self.sorted_positions = []
+        self.flip_masks = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, hashes):
+        """Adds hashes to the index
+
+        :param ids:
+            Identifier of every hash, e.g. images.id
+        :param hashes:
+            Array-like of uint64 hashes
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(ids) != len(hashes):
+            raise ValueError("Every hash needs an id")
+
+        self.ids.extend(ids)
+        self.pending_hashes.append(hashes)
+
+    def query(self, query_hash, radius):
+        """Finds all hashes within a hamming distance
+
+        :param query_hash:
+            The uint64 hash to search for
+        :param radius:
+            Maximum amount of differing bits
+        :return: List of (id, distance) tuples, closest first
+        :rtype: list
+        """
+        self._build()
+        if not self.ids:
+            return []
+
+        query_hash = np.uint64(query_hash)
+        chunk_radius = radius // self.chunks
+
+        candidates = []
+        for chunk in range(self.chunks):
+            query_chunk = (query_hash >> np.uint64(chunk * self.chunk_bits)) & self.chunk_mask
+            values = np.bitwise_xor(self._flip_masks(chunk_radius), query_chunk)
+            left = np.searchsorted(self.sorted_chunks[chunk], values, side='left')
+            right = np.searchsorted(self.sorted_chunks[chunk], values, side='right')
+            for start, end in zip(left[left < right], right[left < right]):
+                candidates.append(self.sorted_positions[chunk][start:end])
+
+        if not candidates:
+            return []
+
+        positions = np.unique(np.concatenate(candidates))
+        distances = hamming_distance(self.hashes[positions], query_hash)
+        matches = distances <= radius
+        positions, distances = positions[matches], distances[matches]
+        order = np.argsort(distances, kind='stable')
+        return [(self.ids[position], int(distance))
+                for position, distance in zip(positions[order], distances[order])]
+
+    def _flip_masks(self, chunk_radius):
+        """All values with at most chunk_radius bits set within one chunk"""
+        if chunk_radius not in self.flip_masks:
+            masks = [0]
+            for flipped_bits in range(1, chunk_radius + 1):
+                for bits in combinations(range(self.chunk_bits), flipped_bits):
+                    masks.append(sum(1 << bit for bit in bits))
+            self.flip_masks[chunk_radius] = np.array(masks, dtype=np.uint64)
+        return self.flip_masks[chunk_radius]
+
+    def _build(self):
+        """Sorts the chunks of all hashes, after new ones were added"""
+        if not self.pending_hashes:
+            return
+
+        self.hashes = np.concatenate([self.hashes] + self.pending_hashes)
+        self.pending_hashes = []
+        self.sorted_chunks = []
+        self.sorted_positions = []
+        for chunk in range(self.chunks):
+            chunk_values = (self.hashes >> np.uint64(chunk * self.chunk_bits)) & self.chunk_mask
+            order = np.argsort(chunk_values, kind='stable')
+            self.sorted_chunks.append(chunk_values[order])
+            self.sorted_positions.append(order)
+
+
+class BKTree:
+    """A Burkhard-Keller tree over uint64 hashes
+    Usage:
+
+        bk_tree = BKTree()
+        bk_tree.add(['abc', 'abd'], hashes)
+        bk_tree.query(some_hash, radius=6)
+    """
+    def __init__(self):
+        # A node is a list of [hash, ids, {distance: child node}]
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, ids, hashes):
+        """Adds hashes to the tree
+
+        :param ids:
+            Identifier of every hash, e.g. images.id
+        :param hashes:
+            Iterable of uint64 hashes
+        """
+        for hash_id, image_hash in zip(ids, hashes):
+            self._add(hash_id, int(image_hash))
+            self.size += 1
+
+    def _add(self, hash_id, image_hash):
+        if self.root is None:
+            self.root = [image_hash, [hash_id], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = bin(node[0] ^ image_hash).count('1')
+            if distance == 0:
+                node[1].append(hash_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [image_hash, [hash_id], {}]
+                return
+            node = child
+
+    def query(self, query_hash, radius):
+        """Finds all hashes within a hamming distance
+
+        :param query_hash:
+            The uint64 hash to search for
+        :param radius:
+            Maximum amount of differing bits
+        :return: List of (id, distance) tuples, closest first
+        :rtype: list
+        """
+        if self.root is None:
+            return []
+
+        query_hash = int(query_hash)
+        matches = []
+        nodes = [self.root]
+        while nodes:
+            image_hash, hash_ids, children = nodes.pop()
+            distance = bin(image_hash ^ query_hash).count('1')
+            if distance <= radius:
+                matches.extend((hash_id, distance) for hash_id in hash_ids)
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    nodes.append(child)
+
+        return sorted(matches, key=lambda match: match[1])
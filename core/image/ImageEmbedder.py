@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Turns images into model inputs and feature vectors on the CPU
+Every image is decoded once into a small RGB array, whole batches are
+normalized and embedded with NumPy. Two kinds of vectors are available:
+
+    - 'features': a 256 dimensional, L2 normalized descriptor of
+      colors (64 bin histogram), layout (8x8 grayscale) and edges
+      (4x4 cells of 8 gradient orientations). Similar pictures are
+      close by cosine similarity.
+    - 'pixels': the normalized input of a model, flattened
+      (input_size x input_size x 3), so training runs never decode
+      the JPEGs again.
+"""
+import numpy as np
+from PIL import Image
+
+INPUT_SIZE = 64
+# Channel statistics of ImageNet, expected by most pretrained models
+CHANNEL_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+CHANNEL_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+EMBEDDING_KINDS = ('features', 'pixels')
+
+COLOR_LEVELS = 4
+LAYOUT_SIZE = 8
+EDGE_CELLS = 4
+EDGE_ORIENTATIONS = 8
+
+
+class ImageEmbedder:
+    """Embeds batches of images
+    Usage:
+
+        image_embedder = ImageEmbedder()
+        vectors = image_embedder.embed_files(['a.jpg', 'b.png'])  # (2, 256) float32
+    """
+    def __init__(self, kind='features', input_size=INPUT_SIZE):
+        """Init for the ImageEmbedder class
+
+        :param kind: One of EMBEDDING_KINDS, defaults to 'features'
+        :param input_size:
+            Width and height every image is resized to, defaults to 64
+            Has to be a multiple of 8 and of 4
+        :raises KeyError: If the kind is unknown
+        """
+        if kind not in EMBEDDING_KINDS:
+            raise KeyError(f"Unknown embedding kind '{kind}', choose one of: {', '.join(EMBEDDING_KINDS)}")
+        if input_size % LAYOUT_SIZE or input_size % EDGE_CELLS:
+            raise ValueError(f"The input size has to be a multiple of {LAYOUT_SIZE} and {EDGE_CELLS}")
+        self.kind = kind
+        self.input_size = input_size
+
+    @property
+    def dim(self):
+        """Length of every vector"""
+        if self.kind == 'pixels':
+            return self.input_size * self.input_size * 3
+        return COLOR_LEVELS ** 3 + LAYOUT_SIZE ** 2 + EDGE_CELLS ** 2 * EDGE_ORIENTATIONS
+
+    @property
+    def dtype(self):
+        """Model inputs are kept as float16, half the size at plenty of precision"""
+        return np.float16 if self.kind == 'pixels' else np.float32
+
+    def load_image(self, image_file):
+        """Decodes an image into an RGB array
+
+        :param image_file: A path or file object of the image
+        :return: Array of shape (input_size, input_size, 3) of uint8
+        :rtype: numpy.ndarray
+        """
+        with Image.open(image_file) as image:
+            # Lets JPEGs decode at a fraction of their size
+            image.draft('RGB', (self.input_size * 2, self.input_size * 2))
+            image = image.convert('RGB').resize((self.input_size, self.input_size), Image.BILINEAR)
+            return np.asarray(image, dtype=np.uint8)
+
+    def embed_files(self, image_files):
+        """Embeds a batch of image files
+
+        :rtype: numpy.ndarray
+        """
+        images = [self.load_image(image_file) for image_file in image_files]
+        if not images:
+            return np.empty((0, self.dim), dtype=self.dtype)
+        return self.embed(np.stack(images))
+
+    def embed(self, images):
+        """Embeds a batch of decoded images
+
+        :param images: Array of shape (N, input_size, input_size, 3) of uint8
+        :return: Array of shape (N, dim)
+        :rtype: numpy.ndarray
+        """
+        pixels = images.astype(np.float32) / 255
+        if self.kind == 'pixels':
+            return self.normalize(pixels).reshape(len(images), -1).astype(np.float16)
+
+        gray = pixels.mean(axis=3)
+        features = np.concatenate([
+            self._color_histogram(images),
+            self._layout(gray),
+            self._edges(gray),
+        ], axis=1)
+        return _l2_normalize(features)
+
+    @staticmethod
+    def normalize(pixels):
+        """Scales every channel to zero mean and unit variance, like the model expects"""
+        return (pixels - CHANNEL_MEAN) / CHANNEL_STD
+
+    @staticmethod
+    def _color_histogram(images):
+        """Share of pixels within every one of 4x4x4 color bins, square rooted"""
+        levels = (images // (256 // COLOR_LEVELS)).astype(np.int64)
+        bins = (levels[..., 0] * COLOR_LEVELS + levels[..., 1]) * COLOR_LEVELS + levels[..., 2]
+        bins = bins.reshape(len(images), -1)
+        # Every image counts into its own range of bins
+        offsets = bins + np.arange(len(images))[:, None] * COLOR_LEVELS ** 3
+        histogram = np.bincount(offsets.ravel(), minlength=len(images) * COLOR_LEVELS ** 3)
+        histogram = histogram.reshape(len(images), -1) / bins.shape[1]
+        return np.sqrt(histogram).astype(np.float32) / 2
+
+    @staticmethod
+    def _layout(gray):
+        """8x8 block means, standardized per image"""
+        size = gray.shape[1] // LAYOUT_SIZE
+        blocks = gray.reshape(len(gray), LAYOUT_SIZE, size, LAYOUT_SIZE, size).mean(axis=(2, 4))
+        blocks = blocks.reshape(len(gray), -1)
+        blocks = blocks - blocks.mean(axis=1, keepdims=True)
+        return _l2_normalize(blocks) / 2
+
+    @staticmethod
+    def _edges(gray):
+        """Gradient magnitudes per cell and unsigned orientation"""
+        gradient_y, gradient_x = np.gradient(gray, axis=(1, 2))
+        magnitude = np.hypot(gradient_x, gradient_y)
+        orientation = np.mod(np.arctan2(gradient_y, gradient_x), np.pi)
+        bins = np.minimum((orientation / np.pi * EDGE_ORIENTATIONS).astype(np.int64), EDGE_ORIENTATIONS - 1)
+
+        one_hot = (bins[..., None] == np.arange(EDGE_ORIENTATIONS)) * magnitude[..., None]
+        size = gray.shape[1] // EDGE_CELLS
+        cells = one_hot.reshape(len(gray), EDGE_CELLS, size, EDGE_CELLS, size, EDGE_ORIENTATIONS).sum(axis=(2, 4))
+        return _l2_normalize(cells.reshape(len(gray), -1).astype(np.float32)) / 2
+
+
+def _l2_normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Perceptual image hashes
+Computes 64 bit aHash, dHash and pHash values for batches of images.
+Every image is decoded once into a small grayscale thumbnail, all hashes
+are computed for the whole batch at once with NumPy.
+
+Two hashes of the same picture (resized, recompressed, slightly edited)
+only differ in a few bits, see hamming_distance.
+"""
+import numpy as np
+from PIL import Image
+
+THUMBNAIL_SIZE = 64
+HASH_NAMES = ('ahash', 'dhash', 'phash')
+
+
+def _area_resample_matrix(target_size, source_size):
+    """Matrix averaging source_size pixels into target_size pixels along one axis"""
+    matrix = np.zeros((target_size, source_size))
+    edges = np.linspace(0, source_size, target_size + 1)
+    for target in range(target_size):
+        for source in range(source_size):
+            overlap = min(edges[target + 1], source + 1) - max(edges[target], source)
+            if overlap > 0:
+                matrix[target, source] = overlap
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+
+def _dct_matrix(size):
+    """Orthonormal DCT-II matrix"""
+    frequencies = np.arange(size)[:, None]
+    positions = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * positions + 1) * frequencies / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_RESAMPLE_8 = _area_resample_matrix(8, THUMBNAIL_SIZE)
+_RESAMPLE_9 = _area_resample_matrix(9, THUMBNAIL_SIZE)
+_RESAMPLE_32 = _area_resample_matrix(32, THUMBNAIL_SIZE)
+_DCT_32 = _dct_matrix(32)
+# Set bits of every byte, counts bits where NumPy < 2 has no np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+
+def _resize(thumbnails, rows_matrix, columns_matrix):
+    return np.einsum('ij,njk,lk->nil', rows_matrix, thumbnails, columns_matrix)
+
+
+def _pack_bits(bits):
+    """Packs an (N, 64) boolean array into N unsigned 64 bit integers"""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view('>u8').ravel().astype(np.uint64)
+
+
+class ImageHasher:
+    """Computes perceptual hashes of image batches
+    Usage:
+
+        hashes = ImageHasher.hash_files(['a.jpg', 'b.png'])
+        hashes['phash']  # numpy array of uint64
+    """
+
+    @staticmethod
+    def load_thumbnail(image_file):
+        """Decodes an image into a grayscale thumbnail
+
+        :param image_file:
+            A path or file object of the image
+        :return: Array of shape (THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        :rtype: numpy.ndarray
+        """
+        with Image.open(image_file) as image:
+            image.draft('L', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+            thumbnail = image.convert('L').resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR)
+            return np.asarray(thumbnail, dtype=np.float64)
+
+    @staticmethod
+    def hash_files(image_files):
+        """Hashes a batch of image files
+
+        :param image_files:
+            Paths or file objects of the images
+        :return: Dict of 'ahash', 'dhash' and 'phash' arrays of uint64
+        :rtype: Dict
+        """
+        thumbnails = [ImageHasher.load_thumbnail(image_file) for image_file in image_files]
+        if not thumbnails:
+            return {name: np.empty(0, dtype=np.uint64) for name in HASH_NAMES}
+        return ImageHasher.hash_thumbnails(np.stack(thumbnails))
+
+    @staticmethod
+    def hash_thumbnails(thumbnails):
+        """Hashes a batch of grayscale thumbnails
+
+        :param thumbnails:
+            Array of shape (N, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+        :return: Dict of 'ahash', 'dhash' and 'phash' arrays of uint64
+        :rtype: Dict
+        """
+        return {
+            'ahash': ImageHasher.ahash(thumbnails),
+            'dhash': ImageHasher.dhash(thumbnails),
+            'phash': ImageHasher.phash(thumbnails),
+        }
+
+    @staticmethod
+    def ahash(thumbnails):
+        """Average hash: 8x8 pixels brighter than their mean"""
+        small = _resize(thumbnails, _RESAMPLE_8, _RESAMPLE_8)
+        return _pack_bits(small > small.mean(axis=(1, 2), keepdims=True))
+
+    @staticmethod
+    def dhash(thumbnails):
+        """Difference hash: 8x8 gradients between horizontally neighboured pixels"""
+        small = _resize(thumbnails, _RESAMPLE_8, _RESAMPLE_9)
+        return _pack_bits(small[:, :, 1:] > small[:, :, :-1])
+
+    @staticmethod
+    def phash(thumbnails):
+        """Perceptual hash: 8x8 lowest DCT frequencies above their median"""
+        small = _resize(thumbnails, _RESAMPLE_32, _RESAMPLE_32)
+        frequencies = np.einsum('ij,njk,lk->nil', _DCT_32, small, _DCT_32)[:, :8, :8]
+        coefficients = frequencies.reshape(len(frequencies), 64)
+        # The DC term only holds the overall brightness
+        median = np.median(coefficients[:, 1:], axis=1, keepdims=True)
+        return _pack_bits(coefficients > median)
+
+
+def hamming_distance(hashes, other_hash):
+    """Counts the differing bits between many hashes and one hash
+
+    :param hashes:
+        Array of uint64 hashes
+    :param other_hash:
+        A single uint64 hash
+    :return: Array of distances
+    :rtype: numpy.ndarray
+    """
+    differences = np.bitwise_xor(hashes, np.uint64(other_hash))
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(differences)
+    return _popcount(differences)
+
+
+def _popcount(hashes):
+    """Counts the set bits of uint64 hashes byte by byte"""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    counts = _BYTE_POPCOUNT[np.ascontiguousarray(hashes).view(np.uint8)]
+    return counts.reshape(hashes.shape + (8, )).sum(axis=-1, dtype=np.uint8)
+
+
+def to_signed(hashes):
+    """Converts uint64 hashes to int64, SQLite3 only stores signed integers"""
+    return np.asarray(hashes, dtype=np.uint64).view(np.int64)
+
+
+def to_unsigned(hashes):
+    """Converts int64 hashes read from SQLite3 back to uint64"""
+    return np.asarray(hashes, dtype=np.int64).view(np.uint64)
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""Nearest-neighbour search over image embeddings
+Two indexes are available, both rank by squared euclidean distance (for
+L2 normalized embeddings the same order as cosine similarity):
+
+    - BruteForceIndex: exact, keeps every vector and scans all of them
+      with one matrix product. Fast enough for some hundred thousand
+      vectors.
+    - IVFPQIndex: approximate. A k-means coarse quantizer splits the
+      vectors into lists, only the closest lists are scanned (IVF). The
+      residual of every vector to its list centroid is product quantized
+      into one byte per subvector (PQ), e.g. 16 bytes for 256 floats.
+      Distances are summed up from lookup tables, the closest candidates
+      can be reranked with the exact vectors, e.g. of an EmbeddingStore.
+
+Vectors can be added at any time and are indexed on the next query.
+Both indexes are saved into and loaded from a directory.
+"""
+import json
+import os
+
+import numpy as np
+
+VECTOR_INDEXES = ('brute_force', 'ivfpq')
+PQ_TRAIN_PER_CODEWORD = 64
+# k-means needs some dozen vectors per list, IVFPQIndex searches exactly until it has them
+TRAIN_PER_LIST = 39
+
+
+class BruteForceIndex:
+    """Exact nearest-neighbour search
+    Usage:
+
+        vector_index = BruteForceIndex(dim=256)
+        vector_index.add(['abc', 'abd'], vectors)
+        vector_index.query(some_vector, k=10)  # [('abc', 0.0), ('abd', 0.31)]
+    """
+    kind = 'brute_force'
+
+    def __init__(self, dim):
+        """Init for the BruteForceIndex class
+
+        :param dim: Length of every vector
+        """
+        self.dim = dim
+        self.ids = []
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+        self.pending_vectors = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors):
+        """Adds vectors to the index
+
+        :param ids:
+            Identifier of every vector, e.g. images.id
+        :param vectors:
+            Array-like of shape (len(ids), dim)
+        """
+        vectors = _as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError("Every vector needs an id")
+
+        self.ids.extend(ids)
+        self.pending_vectors.append(vectors)
+
+    def query(self, query_vector, k=10):
+        """Finds the closest vectors
+
+        :param query_vector: Array-like of length dim
+        :param k: Amount of neighbours, defaults to 10
+        :return: List of (id, squared distance) tuples, closest first
+        :rtype: list
+        """
+        return self.query_batch([query_vector], k)[0]
+
+    def query_batch(self, query_vectors, k=10):
+        """Finds the closest vectors of many queries at once
+
+        :rtype: list of lists
+        """
+        self._build()
+        query_vectors = _as_vectors(query_vectors, self.dim)
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+        distances = self.norms[None, :] - 2 * (query_vectors @ self.vectors.T)
+        distances += np.einsum('ij,ij->i', query_vectors, query_vectors)[:, None]
+        positions = np.arange(len(self.ids))
+        return [_closest(self.ids, row_distances, positions, k) for row_distances in distances]
+
+    def _build(self):
+        """Appends the vectors added since the last query"""
+        if not self.pending_vectors:
+            return
+
+        new_vectors = np.concatenate(self.pending_vectors)
+        self.pending_vectors = []
+        self.vectors = np.concatenate([self.vectors, new_vectors])
+        self.norms = np.concatenate([self.norms, np.einsum('ij,ij->i', new_vectors, new_vectors)])
+
+    def save(self, directory):
+        """Writes the index into a directory"""
+        self._build()
+        _save_arrays(directory, self, {'dim': self.dim}, vectors=self.vectors)
+
+    @classmethod
+    def load(cls, directory):
+        """Reads an index written by save"""
+        meta, ids, arrays = _load_arrays(directory, cls.kind)
+        vector_index = cls(meta['dim'])
+        vector_index.add(ids, arrays['vectors'])
+        return vector_index
+
+
+class IVFPQIndex:
+    """Approximate nearest-neighbour search with an inverted file and product quantization
+    The quantizers are trained on a sample of the added vectors, once
+    lists * TRAIN_PER_LIST vectors were added or train is called. Until then
+    queries scan the added vectors exactly. Vectors added later are encoded
+    with the same quantizers.
+    Usage:
+
+        vector_index = IVFPQIndex(dim=256)
+        vector_index.add(image_ids, vectors)
+        vector_index.query(some_vector, k=10)
+    """
+    kind = 'ivfpq'
+
+    def __init__(self, dim, lists=256, subvectors=16, probes=16, iterations=10, max_train_size=16384, seed=0):
+        """Init for the IVFPQIndex class
+
+        :param dim: Length of every vector
+        :param lists: Amount of k-means lists, defaults to 256
+        :param subvectors:
+            Amount of subvectors every residual is split into, dim has to be
+            a multiple of it, defaults to 16 (one byte each)
+        :param probes: Amount of closest lists scanned per query, defaults to 16
+        :param iterations: k-means iterations while training, defaults to 10
+        :param max_train_size: Vectors sampled for training at most, defaults to 16384
+        :param seed: Seed of the k-means initialisation, defaults to 0
+        """
+        if dim % subvectors:
+            raise ValueError(f"{dim} dimensions can not be split into {subvectors} subvectors")
+
+        self.dim = dim
+        self.lists = lists
+        self.subvectors = subvectors
+        self.probes = probes
+        self.iterations = iterations
+        self.max_train_size = max_train_size
+        self.seed = seed
+        self.ids = []
+        self.pending_vectors = []
+        # Set by train
+        self.centroids = None
+        self.codebooks = None
+        self.list_terms = None
+        # All codes sorted by their list, list l is codes[offsets[l]:offsets[l + 1]]
+        self.codes = np.empty((0, subvectors), dtype=np.uint8)
+        self.positions = np.empty(0, dtype=np.int64)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.offsets = np.zeros(lists + 1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def add(self, ids, vectors):
+        """Adds vectors to the index
+
+        :param ids:
+            Identifier of every vector, e.g. images.id
+        :param vectors:
+            Array-like of shape (len(ids), dim)
+        """
+        vectors = _as_vectors(vectors, self.dim)
+        if len(ids) != len(vectors):
+            raise ValueError("Every vector needs an id")
+
+        self.ids.extend(ids)
+        self.pending_vectors.append(vectors)
+
+    def train(self, vectors=None):
+        """Trains the coarse quantizer and the product quantizer
+
+        :param vectors: Training vectors, defaults to None (the added vectors)
+        """
+        if vectors is None:
+            vectors = np.concatenate(self.pending_vectors) if self.pending_vectors else np.empty((0, self.dim))
+        vectors = _as_vectors(vectors, self.dim)
+        if not len(vectors):
+            raise ValueError("No vectors to train the index on")
+
+        random = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_train_size:
+            vectors = vectors[np.sort(random.choice(len(vectors), self.max_train_size, replace=False))]
+
+        # Fewer lists and codewords than vectors would leave them empty
+        self.lists = min(self.lists, len(vectors))
+        self.offsets = np.zeros(self.lists + 1, dtype=np.int64)
+        self.centroids = _kmeans(vectors, self.lists, self.iterations, random)
+        residuals = vectors - self.centroids[_assign(vectors, self.centroids)]
+
+        codewords = min(256, len(vectors))
+        # Some dozen residuals per codeword are plenty to train the product quantizer
+        residuals = residuals[:codewords * PQ_TRAIN_PER_CODEWORD]
+        sub_dim = self.dim // self.subvectors
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(residuals[:, sub * sub_dim:(sub + 1) * sub_dim]), codewords,
+                    self.iterations, random)
+            for sub in range(self.subvectors)
+        ])
+        self._precompute()
+
+    def query(self, query_vector, k=10, probes=None, rerank_vectors=None, rerank_factor=4):
+        """Finds the approximately closest vectors
+
+        :param query_vector: Array-like of length dim
+        :param k: Amount of neighbours, defaults to 10
+        :param probes: Amount of scanned lists, defaults to None (self.probes)
+        :param rerank_vectors:
+            The exact vectors of all ids in the order they were added, e.g.
+            EmbeddingStore.vectors, defaults to None (no reranking)
+        :param rerank_factor: k * rerank_factor candidates are reranked, defaults to 4
+        :return: List of (id, squared distance) tuples, closest first
+        :rtype: list
+        """
+        self._build()
+        if not self.ids:
+            return []
+
+        query_vector = _as_vectors([query_vector], self.dim)[0]
+        if not self.is_trained:
+            vectors = np.concatenate(self.pending_vectors)
+            return _closest(self.ids, ((vectors - query_vector) ** 2).sum(axis=1), np.arange(len(self.ids)), k)
+
+        list_distances = ((self.centroids - query_vector) ** 2).sum(axis=1)
+        probed_lists = np.argsort(list_distances)[:probes or self.probes]
+        # |q - c - r|^2 = |q - c|^2 + (|r|^2 + 2 c.r) - 2 q.r, summed up over the subvectors
+        query_products = 2 * np.einsum('mkd,md->mk', self.codebooks, query_vector.reshape(self.subvectors, -1))
+
+        distances, positions = [], []
+        subvector_range = np.arange(self.subvectors)
+        for probed_list in probed_lists:
+            start, end = self.offsets[probed_list], self.offsets[probed_list + 1]
+            if start == end:
+                continue
+            table = self.list_terms[probed_list] - query_products
+            distances.append(list_distances[probed_list] + table[subvector_range, self.codes[start:end]].sum(axis=1))
+            positions.append(self.positions[start:end])
+
+        if not distances:
+            return []
+        distances, positions = np.concatenate(distances), np.concatenate(positions)
+        if rerank_vectors is None:
+            return _closest(self.ids, distances, positions, k)
+
+        positions = np.sort(positions[np.argsort(distances)[:k * rerank_factor]])
+        exact_vectors = np.asarray(rerank_vectors[positions], dtype=np.float32)
+        return _closest(self.ids, ((exact_vectors - query_vector) ** 2).sum(axis=1), positions, k)
+
+    def _precompute(self):
+        """|r|^2 + 2 c.r of every list, subvector and codeword"""
+        sub_dim = self.dim // self.subvectors
+        centroids = self.centroids.reshape(self.lists, self.subvectors, sub_dim)
+        self.list_terms = (
+            (self.codebooks ** 2).sum(axis=2)[None, :, :]
+            + 2 * np.einsum('lmd,mkd->lmk', centroids, self.codebooks)
+        ).astype(np.float32)
+
+    def _build(self):
+        """Encodes the vectors added since the last query and sorts them into their lists"""
+        if not self.pending_vectors:
+            return
+        if not self.is_trained:
+            if len(self.ids) < self.lists * TRAIN_PER_LIST:
+                return
+            self.train()
+
+        new_vectors = np.concatenate(self.pending_vectors)
+        self.pending_vectors = []
+        new_assignments = _assign(new_vectors, self.centroids)
+        new_codes = self._encode(new_vectors - self.centroids[new_assignments])
+
+        first_position = len(self.ids) - len(new_vectors)
+        assignments = np.concatenate([self.assignments, new_assignments.astype(np.int32)])
+        positions = np.concatenate([self.positions, np.arange(first_position, len(self.ids))])
+        codes = np.concatenate([self.codes, new_codes])
+        order = np.argsort(assignments, kind='stable')
+        self.assignments, self.positions, self.codes = assignments[order], positions[order], codes[order]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.assignments, minlength=self.lists))])
+
+    def _encode(self, residuals):
+        sub_dim = self.dim // self.subvectors
+        codes = np.empty((len(residuals), self.subvectors), dtype=np.uint8)
+        for sub in range(self.subvectors):
+            codes[:, sub] = _assign(np.ascontiguousarray(residuals[:, sub * sub_dim:(sub + 1) * sub_dim]),
+                                    self.codebooks[sub])
+        return codes
+
+    def save(self, directory):
+        """Writes the index into a directory"""
+        self._build()
+        meta = {'dim': self.dim, 'lists': self.lists, 'subvectors': self.subvectors, 'probes': self.probes,
+                'iterations': self.iterations, 'max_train_size': self.max_train_size, 'seed': self.seed}
+        arrays = {'vectors': np.concatenate(self.pending_vectors)} if self.pending_vectors else {}
+        if self.is_trained:
+            arrays = {'centroids': self.centroids, 'codebooks': self.codebooks, 'codes': self.codes,
+                      'positions': self.positions, 'assignments': self.assignments}
+        _save_arrays(directory, self, meta, **arrays)
+
+    @classmethod
+    def load(cls, directory):
+        """Reads an index written by save"""
+        meta, ids, arrays = _load_arrays(directory, cls.kind)
+        vector_index = cls(**meta)
+        vector_index.ids = ids
+        if 'vectors' in arrays:
+            vector_index.pending_vectors = [arrays['vectors']]
+        if 'centroids' in arrays:
+            vector_index.centroids = arrays['centroids']
+            vector_index.codebooks = arrays['codebooks']
+            vector_index.codes = arrays['codes']
+            vector_index.positions = arrays['positions']
+            vector_index.assignments = arrays['assignments']
+            vector_index.offsets = np.concatenate(
+                [[0], np.cumsum(np.bincount(vector_index.assignments, minlength=vector_index.lists))]
+            )
+            vector_index._precompute()
+        return vector_index
+
+
+def create_vector_index(kind, dim, **kwargs):
+    """Creates an empty index of one of VECTOR_INDEXES
+
+    :raises KeyError: If the kind is unknown
+    """
+    if kind not in VECTOR_INDEXES:
+        raise KeyError(f"Unknown vector index '{kind}', choose one of: {', '.join(VECTOR_INDEXES)}")
+    return (BruteForceIndex if kind == 'brute_force' else IVFPQIndex)(dim, **kwargs)
+
+
+def load_vector_index(directory):
+    """Reads an index of any kind written by its save method"""
+    with open(os.path.join(directory, 'meta.json')) as meta_file:
+        kind = json.load(meta_file)['kind']
+    return (BruteForceIndex if kind == 'brute_force' else IVFPQIndex).load(directory)
+
+
+def _as_vectors(vectors, dim):
+    return np.asarray(vectors, dtype=np.float32).reshape(-1, dim)
+
+
+def _closest(ids, distances, positions, k):
+    """The k smallest distances as (id, distance) tuples, closest first"""
+    if len(distances) > k:
+        nearest = np.argpartition(distances, k - 1)[:k]
+        distances, positions = distances[nearest], positions[nearest]
+    order = np.argsort(distances, kind='stable')
+    # Rounding can make the distance of a vector to itself slightly negative
+    return [(ids[position], max(float(distance), 0.0))
+            for position, distance in zip(positions[order], distances[order])]
+
+
+def _assign(vectors, centroids, chunk_rows=8192):
+    """Position of the closest centroid of every vector"""
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_rows):
+        chunk = vectors[start:start + chunk_rows]
+        assignments[start:start + chunk_rows] = np.argmin(centroid_norms[None, :] - 2 * (chunk @ centroids.T), axis=1)
+    return assignments
+
+
+def _kmeans(vectors, clusters, iterations, random):
+    """Lloyd's k-means, empty clusters are moved onto random vectors"""
+    centroids = vectors[random.choice(len(vectors), clusters, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        counts = np.bincount(assignments, minlength=clusters)
+        order = np.argsort(assignments, kind='stable')
+        empty = counts == 0
+        # Sums of the vectors of every non-empty cluster, in cluster order
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[~empty]
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[~empty] = sums / counts[~empty, None]
+        centroids[empty] = vectors[random.choice(len(vectors), int(empty.sum()))]
+    return centroids
+
+
+def _save_arrays(directory, vector_index, meta, **arrays):
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), array)
+    with open(os.path.join(directory, 'ids.txt'), 'w') as ids_file:
+        ids_file.write(''.join(f'{vector_id}\n' for vector_id in vector_index.ids))
+    # Written last, a directory without it holds no complete index
+    meta = dict(meta, kind=vector_index.kind, count=len(vector_index), arrays=sorted(arrays))
+    with open(os.path.join(directory, 'meta.json.tmp'), 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(os.path.join(directory, 'meta.json.tmp'), os.path.join(directory, 'meta.json'))
+
+
+def _load_arrays(directory, kind):
+    with open(os.path.join(directory, 'meta.json')) as meta_file:
+        meta = json.load(meta_file)
+    if meta.pop('kind') != kind:
+        raise ValueError(f"{directory} holds no {kind} index")
+    count = meta.pop('count')
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy')) for name in meta.pop('arrays')}
+    with open(os.path.join(directory, 'ids.txt')) as ids_file:
+        ids = ids_file.read().splitlines()[:count]
+    return meta, ids, arrays
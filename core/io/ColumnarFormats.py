@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""The formats ColumnarWriter can write
+Only looks pyarrow up instead of importing it, the command line arguments
+list the formats without loading NumPy or pyarrow.
+"""
+from importlib.util import find_spec
+
+COLUMNAR_FORMATS = ('parquet', 'arrow', 'npy') if find_spec('pyarrow') is not None else ('npy', )
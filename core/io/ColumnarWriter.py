@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Writes typed columns into columnar files
+Three formats are available:
+
+    - 'parquet': one compressed Parquet file per part, needs pyarrow
+    - 'arrow': one Arrow IPC (Feather v2) file per part, needs pyarrow
+    - 'npy': one directory per part holding a .npy file per column,
+      every column can be opened with np.load(path, mmap_mode='r')
+
+Column types are 'int', 'float', 'str' and 'datetime'. Within .npy files
+missing ints are stored as NULL_INT, missing datetimes as NaT and strings
+as UTF-8 encoded, fixed-width bytes.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core.io.ColumnarFormats import COLUMNAR_FORMATS
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+NULL_INT = -1
+
+
+def to_epoch(value):
+    """Seconds since the epoch of a SQLite3 DATETIME, which is stored in UTC
+
+    :param value: A str like '2020-01-01 12:00:00', an int or None
+    :rtype: int | None
+    """
+    if value is None or isinstance(value, int):
+        return value
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+def write_part(directory, part_name, columns, export_format='npy'):
+    """Writes one part of a dataset
+
+    :param directory: The directory of the part, it is created if needed
+    :param part_name: The file name of the part without extension
+    :param columns:
+        A list of (name, column_type, values) tuples,
+        values is a list of equal length for every column
+    :param export_format: One of COLUMNAR_FORMATS, defaults to 'npy'
+    :return: The path of the written part
+    :raises KeyError: If the format is unknown or pyarrow is not installed
+    """
+    if export_format not in COLUMNAR_FORMATS:
+        raise KeyError(f"Unknown export format '{export_format}', choose one of: {', '.join(COLUMNAR_FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+
+    if export_format == 'npy':
+        path = os.path.join(directory, part_name)
+        os.makedirs(path, exist_ok=True)
+        for name, column_type, values in columns:
+            np.save(os.path.join(path, f'{name}.npy'), _to_numpy(column_type, values))
+        with open(os.path.join(path, '_columns.json'), 'w') as columns_file:
+            json.dump([[name, column_type] for name, column_type, _ in columns], columns_file)
+        return path
+
+    table = pyarrow.table({name: _to_arrow(column_type, values) for name, column_type, values in columns})
+    path = os.path.join(directory, f'{part_name}.{export_format}')
+    if export_format == 'parquet':
+        pyarrow.parquet.write_table(table, path, compression='zstd')
+    else:
+        pyarrow.feather.write_feather(table, path, compression='uncompressed')
+    return path
+
+
+def read_npy_part(path, mmap_mode='r'):
+    """Opens every column of a .npy part, memory mapped by default
+
+    :return: Dict of column name -> numpy array
+    :rtype: Dict
+    """
+    with open(os.path.join(path, '_columns.json')) as columns_file:
+        names = [name for name, _ in json.load(columns_file)]
+    return {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in names}
+
+
+def _to_numpy(column_type, values):
+    if column_type == 'int':
+        return np.array([NULL_INT if value is None else value for value in values], dtype=np.int64)
+    if column_type == 'float':
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    if column_type == 'datetime':
+        # NaT is the smallest int64
+        epochs = [to_epoch(value) for value in values]
+        nat = np.iinfo(np.int64).min
+        return np.array([nat if epoch is None else epoch for epoch in epochs], dtype=np.int64).view('datetime64[s]')
+    # Fixed-width bytes, unlike object arrays they can be memory mapped
+    return np.array([b'' if value is None else str(value).encode() for value in values], dtype=np.bytes_)
+
+
+def _to_arrow(column_type, values):
+    if column_type == 'int':
+        return pyarrow.array(values, type=pyarrow.int64())
+    if column_type == 'float':
+        return pyarrow.array(values, type=pyarrow.float64())
+    if column_type == 'datetime':
+        return pyarrow.array([to_epoch(value) for value in values], type=pyarrow.timestamp('s', tz='UTC'))
+    return pyarrow.array([None if value is None else str(value) for value in values], type=pyarrow.string())
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""A persistent, size-bounded key-value cache
+Entries are stored in a SQLite3 file, together with their expiry time.
+Once the cache grows beyond its size limit, the least recently used
+entries are evicted.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'meta', 'stored_at', 'expires_at', 'is_fresh'])
+
+
+class DiskCache:
+    """Stores bytes on disk, keyed by a string
+    Usage:
+
+        disk_cache = DiskCache('cache.db', max_bytes=64 * 1024 ** 2)
+        disk_cache.set('key', b'value', ttl=60)
+        disk_cache.get('key').value
+    """
+    def __init__(self, cache_path, max_bytes=256 * 1024 ** 2):
+        """Init for the DiskCache class
+
+        :param cache_path:
+            The path and name of the cache file, ':memory:' keeps it in memory
+        :param max_bytes:
+            Maximum size of all stored values, defaults to 256 MiB
+        """
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+        }
+
+        self.connection = sqlite3.connect(cache_path, check_same_thread=False)
+        with self.connection as cursor:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY NOT NULL, value BLOB, meta TEXT, size INT, "
+                "stored_at REAL, expires_at REAL, last_access REAL)"
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS last_access ON cache_entries(last_access)")
+        self.total_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()[0]
+
+    def get(self, key, allow_stale=False):
+        """Looks up a cached value
+
+        :param key:
+            The key of the value
+        :param allow_stale:
+            Also return expired entries, defaults to False
+            Useful to revalidate them
+        :return:
+            The CacheEntry or None, if nothing (fresh) is cached
+        :rtype: CacheEntry
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value, meta, stored_at, expires_at FROM cache_entries WHERE key = ?", (key, )
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            value, meta, stored_at, expires_at = row
+            is_fresh = expires_at > now
+            if not is_fresh and not allow_stale:
+                self.stats['misses'] += 1
+                return None
+
+            self.stats['hits' if is_fresh else 'stale_hits'] += 1
+            with self.connection as cursor:
+                cursor.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+
+        return CacheEntry(value, json.loads(meta), stored_at, expires_at, is_fresh)
+
+    def set(self, key, value, ttl, meta=None):
+        """Stores a value and evicts old entries, if the cache is full
+
+        :param key:
+            The key of the value
+        :param value:
+            The value to store
+        :type value: bytes
+        :param ttl:
+            Seconds the value stays fresh
+        :param meta:
+            Any json serializable information about the value, defaults to None
+        """
+        now = time.time()
+        with self.lock:
+            previous = self.connection.execute(
+                "SELECT size FROM cache_entries WHERE key = ?", (key, )
+            ).fetchone()
+            with self.connection as cursor:
+                cursor.execute(
+                    "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, value, json.dumps(meta or {}), len(value), now, now + ttl, now),
+                )
+            self.total_bytes += len(value) - (previous[0] if previous else 0)
+            self._evict()
+
+    def refresh(self, key, ttl):
+        """Marks a stored value as fresh again, e.g. after a revalidation
+
+        :param key:
+            The key of the value
+        :param ttl:
+            Seconds the value stays fresh
+        """
+        now = time.time()
+        with self.lock, self.connection as cursor:
+            cursor.execute(
+                "UPDATE cache_entries SET stored_at = ?, expires_at = ?, last_access = ? WHERE key = ?",
+                (now, now + ttl, now, key),
+            )
+
+    def _evict(self):
+        """Deletes the least recently used entries until the cache fits its size limit"""
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        rows = self.connection.execute(
+            "SELECT key, size FROM cache_entries ORDER BY last_access"
+        )
+        evicted_keys = []
+        for key, size in rows:
+            if self.total_bytes <= self.max_bytes:
+                break
+            evicted_keys.append((key, ))
+            self.total_bytes -= size
+        rows.close()
+
+        with self.connection as cursor:
+            cursor.executemany("DELETE FROM cache_entries WHERE key = ?", evicted_keys)
+        self.stats['evictions'] += len(evicted_keys)
+
+    def close(self):
+        """Closes the cache file"""
+        self.connection.close()
@@ -11,23 +11,33 @@ all needed information, such as:
     - Amount of comments
     - etc.
 """
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from difflib import SequenceMatcher
 
 import requests
 
 from core.db.DBHandler import DBHandler
-from core.db.reddit.RedditDBFormatter import RedditDBFormatter
+from core.db.reddit.RedditDBFormatter import TABLE_ORDER, RedditDBFormatter
 from core.reddit.config.RedditConfigrations import reddit_configs
+from core.reddit.helper.RedditArgumentSpelling import correct_sort, correct_time
 from core.reddit.helper.RedditHelperClasses import RedditDataHolder
+from core.reddit.helper.RedditListingParser import parse_listing
 from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from helper.metrics.MetricsRegistry import METRICS
+from helper.ratelimit.AdaptiveRateLimiter import RETRY_STATUSES
 
 
 class RedditChecker:
     """
     RedditChecker allows to check subreddits and filter the json dump of them
     """
-    def __init__(self, subreddits, db_file_path, db_type='sqlite3'):
+    def __init__(self, subreddits, db_file_path, db_type='sqlite3', max_workers=8,
+                 max_pages=1, page_size=100, batch_size=1000, db_profile='default',
+                 response_cache=None, google_workers=2, google_rate=1.0,
+                 google_result_cache=None, incremental=False, seen_set_backend='set',
+                 seen_set_options=None, json_backend=None, timeseries=False, rate_limiter=None):
         """Init for the RedditChecker class
         Allows to add subreddits as a list or str
         :param subreddits: Any amount of subreddit names
@@ -38,21 +48,77 @@ class RedditChecker:
 
         :param db_file_path:
             The path and name of your database file
+            None skips the database connection, e.g. if another process writes the data
         :param db_type:
             The type of your database, defaults to 'sqlite3'
+        :param max_workers:
+            Maximum number of concurrent requests to reddit, defaults to 8
+            Use 1 to fetch one subreddit after another
+        :param max_pages:
+            Maximum amount of pages fetched per subreddit, defaults to 1
+        :param page_size:
+            Posts per page, reddit allows up to 100, defaults to 100
+        :param batch_size:
+            Rows buffered by the DBHandler before they are written, defaults to 1000
+        :param db_profile:
+            The SQLite3 performance profile, defaults to 'default'
+        :param response_cache:
+            A RedditResponseCache for the listings, defaults to None
+        :param google_workers:
+            Threads running the reverse image searches in the background, defaults to 2
+            Use 0 to search while formatting
+        :param google_rate:
+            Maximum reverse image searches per second, defaults to 1.0
+        :param google_result_cache:
+            A GoogleResultCache for the reverse image searches, defaults to None
+        :param incremental:
+            Stop paginating at posts ingested by an earlier run, defaults to False
+            The high-water marks are taken from crawl_checkpoints,
+            see RedditDBHelper.load_crawl_state
+        :param seen_set_backend:
+            How seen posts and subreddits are remembered ('set', 'exact', 'bloom'),
+            defaults to 'set'
+        :param seen_set_options:
+            Keyword arguments of the seen set backend, defaults to None
+        :param json_backend:
+            The listing parser of PARSER_BACKENDS ('orjson', 'ijson', 'json'),
+            defaults to the fastest installed one
+        :param timeseries:
+            Track the popularity of posts in image_success_series instead of
+            image_success, defaults to False
+        :param rate_limiter:
+            The AdaptiveRateLimiter pacing the requests to reddit, defaults to None
+            (one following the budget reddit announces)
         """
         if isinstance(subreddits, (list, tuple)):
             self.subreddits = subreddits
         else:
             self.subreddits = subreddits.split(" ")
 
-        self.seen_spelling_mistakes = {}
         self.wrong_subreddit_set = set()
+        self.max_workers = max(1, max_workers)
+        self.max_pages = max(1, max_pages)
+        self.page_size = page_size
+        self.incremental = incremental
+        self.json_backend = json_backend
+        # (subreddit, reddit_sort, reddit_time) -> (newest_created_utc, newest_fullname)
+        self.crawl_checkpoints = {}
+        self.updated_checkpoints = {}
+        # (subreddit, reddit_sort, reddit_time) -> seconds from the first request to the last page
+        self.job_durations = {}
 
-
-        self.db_handler = DBHandler(db_file_path, db_type)
-        self.reddit_http_handler = RedditHttpHandler()
-        self.reddit_db_formatter = RedditDBFormatter()
+        self.db_handler = None
+        if db_file_path is not None:
+            self.db_handler = DBHandler(
+                db_file_path, db_type, flush_rows=batch_size, db_profile=db_profile, table_order=TABLE_ORDER
+            )
+        self.reddit_http_handler = RedditHttpHandler(
+            pool_maxsize=self.max_workers, response_cache=response_cache, rate_limiter=rate_limiter
+        )
+        self.reddit_db_formatter = RedditDBFormatter(
+            google_workers, google_rate, google_result_cache, seen_set_backend, seen_set_options,
+            timeseries=timeseries,
+        )
         self.configs = reddit_configs
 
 
@@ -80,6 +146,33 @@ class RedditChecker:
 
         return self.reddit_db_formatter.format_data(filtered_data)
 
+    def subreddit_grid_data(self, sort_time_pairs):
+        """Generates all needed data for many sort and time combinations at once
+        All subreddits of every combination share the same request pool,
+        the output is equal to chaining subreddit_data for each combination.
+
+        :param sort_time_pairs:
+            An iterable of (reddit_sort, reddit_time) tuples
+        """
+        jobs = [
+            (subreddit, reddit_sort, reddit_time)
+            for reddit_sort, reddit_time in sort_time_pairs
+            for subreddit in self.subreddits
+        ]
+        return self.subreddit_job_data(jobs)
+
+    def subreddit_job_data(self, jobs):
+        """Generates all needed data for single subreddit, sort and time combinations
+        All jobs share the same request pool.
+
+        :param jobs:
+            An iterable of (subreddit, reddit_sort, reddit_time) tuples
+        """
+        json_data_with_sort = self._generate_reddit_json_for_jobs(jobs)
+        filtered_data = self._generate_filtered_data_from_json(json_data_with_sort)
+
+        return self.reddit_db_formatter.format_data(filtered_data)
+
     def _generate_filtered_data_from_json(self, json_data):
         """Filters the json output for our needs
 
@@ -87,14 +180,16 @@ class RedditChecker:
             Json output from _generate_reddit_json
         """
         for post_data, reddit_sort, reddit_time in json_data:
-            for child in post_data:
-                child_attributes = child['data']
-                child_attributes_data = self._get_child_info(
-                    child_attributes, reddit_sort, reddit_time, source_type='image'
-                )
-
-                if child_attributes_data:
-                    yield child_attributes_data
+            # A page is filtered at once, so the timer does not measure the consumer
+            with METRICS.timer('filter_seconds', 'Filtering a listing page into RedditDataHolders'):
+                filtered_data = [
+                    child_attributes_data for child_attributes_data in (
+                        self._get_child_info(child_attributes, reddit_sort, reddit_time, source_type='image')
+                        for child_attributes in post_data
+                    )
+                    if child_attributes_data
+                ]
+            yield from filtered_data
 
     def _generate_reddit_json(self, reddit_sort, reddit_time):
         """A generator for the reddit_json api
@@ -104,70 +199,210 @@ class RedditChecker:
             Sorting mechanism
         :param reddit_time:
             The time sorting mechanism
-        :raises KeyError:
-            If subreddit does not exist
         """
-        for subreddit in self.subreddits:
-            if subreddit in self.wrong_subreddit_set:
-                continue
+        jobs = [(subreddit, reddit_sort, reddit_time) for subreddit in self.subreddits]
+        return self._generate_reddit_json_for_jobs(jobs)
 
-            request_query = self.reddit_http_handler._create_request_query(
-                self.configs.sorts_with_timeconditon, subreddit, reddit_sort, reddit_time
-            )
+    def _generate_reddit_json_for_jobs(self, jobs):
+        """Fetches the json output of reddit for many jobs concurrently
+        At most max_workers requests are running at the same time, the
+        results are yielded in the order of the given jobs.
 
-            try:
-                response = self.reddit_http_handler.get_response(request_query)
-                if reddit_time not in self.configs.accepted_times.keys() or reddit_sort not in self.configs.accepted_sorts.keys():
-                    reddit_time = self._get_correct_spelling(reddit_time, self.configs.accepted_times.keys())
-                    reddit_sort = self._get_correct_spelling(reddit_sort, self.configs.accepted_sorts.keys())
-                    request_query = self.reddit_http_handler._create_request_query(
-                        self.configs.sorts_with_timeconditon, subreddit, reddit_sort, reddit_time
-                    )
-                    response = self.reddit_http_handler.get_response(request_query)
-                    if not response.ok:
-                        raise KeyError
+        :param jobs:
+            An iterable of (subreddit, reddit_sort, reddit_time) tuples
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            for subreddit, reddit_sort, reddit_time in jobs:
+                # Arguments are corrected before the first request, see sort_time_pairs
+                job = (subreddit, correct_sort(reddit_sort), correct_time(reddit_time))
+                pending.append((job, executor.submit(self._fetch_subreddit_json, *job), time.perf_counter()))
+                # Keeps a small backlog, so idle workers never wait for the consumer
+                if len(pending) > self.max_workers * 2:
+                    yield from self._generate_job_pages(executor, *pending.popleft())
 
-                print(f'r/{subreddit}/{reddit_sort}/?t={reddit_time}')
-                yield response.json()['data']['children'], reddit_sort, reddit_time
-            except KeyError:
-                self.wrong_subreddit_set.add(subreddit)
-                print(f"\tr/{subreddit} does not exists")
-                continue
-
-    def _get_correct_spelling(self, reddit_sort_info, accepted_sort_method):
-        """Correct spelling
-        Checks spelling and replaces the words
-        which have been spelled wrong with the word that is
-        closes to it in allowed sorting or allowed timing
-
-        :param reddit_sort_info:
-            The sorting/timing method given by the user
-        :param accepted_sort_method:
-            A list of allowed keywords
+            while pending:
+                yield from self._generate_job_pages(executor, *pending.popleft())
+
+    def _generate_job_pages(self, executor, job, first_page, submitted):
+        yield from self._generate_subreddit_pages(executor, job[0], first_page)
+        self.job_durations[job] = time.perf_counter() - submitted
+
+    def _generate_subreddit_pages(self, executor, subreddit, first_page):
+        """Follows the 'after' cursor of a subreddit listing
+        The next page is requested before the current one is yielded,
+        so it downloads while the current page is being filtered.
+
+        :param executor:
+            The executor running the requests
+        :param subreddit:
+            The subreddit name
+        :param first_page:
+            Future of the first _fetch_subreddit_json call
+        """
+        page = first_page.result()
+        fetched_pages = 1
+        job_checkpoint = None
+
+        while page:
+            children, reddit_sort, reddit_time, after = page
+            if self.incremental:
+                if job_checkpoint is None:
+                    job_checkpoint = self._start_checkpoint(subreddit, reddit_sort, reddit_time)
+                children, reached_checkpoint = self._skip_ingested_posts(job_checkpoint, children)
+                if reached_checkpoint:
+                    after = None
+
+            next_page = None
+            if after and fetched_pages < self.max_pages:
+                next_page = executor.submit(
+                    self._fetch_subreddit_json, subreddit, reddit_sort, reddit_time, after
+                )
+                fetched_pages += 1
+
+            yield children, reddit_sort, reddit_time
+            page = next_page.result() if next_page else None
+
+        if job_checkpoint is not None:
+            self._finish_checkpoint(job_checkpoint)
+
+    def _start_checkpoint(self, subreddit, reddit_sort, reddit_time):
+        previous = self.crawl_checkpoints.get((subreddit, reddit_sort, reddit_time))
+        newest_created_utc, newest_fullname = previous or (None, None)
+        return {
+            'subreddit': subreddit,
+            'reddit_sort': reddit_sort,
+            'reddit_time': reddit_time,
+            'previous': previous,
+            'newest_created_utc': newest_created_utc,
+            'newest_fullname': newest_fullname,
+            'new_posts': 0,
+        }
+
+    def _skip_ingested_posts(self, job_checkpoint, children):
+        """Drops posts at or behind the high-water mark of an earlier run
+        Only 'new' listings are sorted by their creation time, so other
+        listings keep all posts and end once every image on a page is known.
+
+        :param job_checkpoint:
+            The checkpoint of the current job, see _start_checkpoint
+        :param children:
+            The posts of one page
         :return:
-            They correct sort keyword
+            The remaining posts and whether the previous run is reached
+        :rtype: tuple
+        """
+        previous = job_checkpoint['previous']
+        if job_checkpoint['reddit_sort'] == 'new' and previous:
+            remaining = [child for child in children if self._is_newer(child, previous)]
+            reached_checkpoint = len(remaining) < len(children)
+        else:
+            remaining = children
+            image_ids = [
+                child['id'] for child in children
+                if child.get('post_hint') == 'image'
+            ]
+            seen_posts = self.reddit_db_formatter.seen_posts
+            reached_checkpoint = bool(image_ids) and all(image_id in seen_posts for image_id in image_ids)
+
+        for child_attributes in remaining:
+            if previous is None or self._is_newer(child_attributes, previous):
+                job_checkpoint['new_posts'] += 1
+            newest = (job_checkpoint['newest_created_utc'], job_checkpoint['newest_fullname'])
+            if newest[0] is None or self._is_newer(child_attributes, newest):
+                job_checkpoint['newest_created_utc'] = int(child_attributes['created_utc'])
+                job_checkpoint['newest_fullname'] = self._fullname(child_attributes)
+
+        return remaining, reached_checkpoint
+
+    @staticmethod
+    def _fullname(child_attributes):
+        return child_attributes.get('name') or f"t3_{child_attributes['id']}"
+
+    @staticmethod
+    def _post_order(created_utc, fullname):
+        """Orders posts by creation time, the ids break ties within a second
+        Reddit's ids count up in base 36, a longer id is always the newer one.
+        """
+        post_id = (fullname or '').rpartition('_')[2]
+        return int(created_utc), len(post_id), post_id
+
+    def _is_newer(self, child_attributes, checkpoint):
+        return (self._post_order(child_attributes['created_utc'], self._fullname(child_attributes))
+                > self._post_order(*checkpoint))
+
+    def _finish_checkpoint(self, job_checkpoint):
+        if job_checkpoint['newest_created_utc'] is None:
+            return
+
+        key = (job_checkpoint['subreddit'], job_checkpoint['reddit_sort'], job_checkpoint['reddit_time'])
+        self.crawl_checkpoints[key] = (
+            job_checkpoint['newest_created_utc'], job_checkpoint['newest_fullname']
+        )
+        self.updated_checkpoints[key] = {
+            'subreddit': job_checkpoint['subreddit'],
+            'reddit_sort': job_checkpoint['reddit_sort'],
+            'reddit_time': job_checkpoint['reddit_time'],
+            'newest_created_utc': job_checkpoint['newest_created_utc'],
+            'newest_fullname': job_checkpoint['newest_fullname'],
+            'new_posts': job_checkpoint['new_posts'],
+            'updated_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    def crawl_checkpoint_rows(self):
+        """The high-water marks of all jobs finished since the last call
+
+        :return: Rows for the crawl_checkpoints table
+        :rtype: list
         """
-        if reddit_sort_info in accepted_sort_method:
-            return reddit_sort_info
-        if reddit_sort_info in self.seen_spelling_mistakes:
-            return self.seen_spelling_mistakes[reddit_sort_info]
-
-        best_difference = 0
-        self.seen_spelling_mistakes[reddit_sort_info] = None
-
-        for accepted_sort in accepted_sort_method:
-            sort_difference = SequenceMatcher(a=reddit_sort_info, b=accepted_sort).ratio()
-            # premature stop
-            if sort_difference > 0.9:
-                temp = accepted_sort
-                break
-            if sort_difference > best_difference:
-                temp = accepted_sort
-                best_difference = sort_difference
-
-        print(f"'{temp}' is the correct spelling :)")
-        self.seen_spelling_mistakes[reddit_sort_info] = temp
-        return temp
+        rows = list(self.updated_checkpoints.values())
+        self.updated_checkpoints = {}
+        return rows
+
+    def _fetch_subreddit_json(self, subreddit, reddit_sort, reddit_time, after=None):
+        """Requests one page of the json output of a single subreddit
+
+        :param subreddit:
+            The subreddit name
+        :param reddit_sort:
+            Sorting mechanism
+        :param reddit_time:
+            The time sorting mechanism
+        :param after:
+            The fullname of the last post of the previous page, defaults to None
+        :return:
+            A tuple of (children, reddit_sort, reddit_time, after) or None,
+            if the subreddit does not exist
+            children are the projected 'data' of the posts, see RedditListingParser
+        """
+        if subreddit in self.wrong_subreddit_set:
+            return None
+
+        request_query = self.reddit_http_handler._create_request_query(
+            self.configs.sorts_with_timeconditon, subreddit, reddit_sort, reddit_time,
+            after=after, limit=self.page_size,
+        )
+
+        try:
+            response = self.reddit_http_handler.get_response(request_query)
+            if response is not None and response.status_code in RETRY_STATUSES:
+                # Still throttled after all retries, the subreddit exists
+                print(f"\tr/{subreddit} skipped, reddit answered {response.status_code}")
+                return None
+            if response is None or not response.ok:
+                raise KeyError
+
+            print(f'r/{subreddit}/{reddit_sort}/?t={reddit_time}' + (f'&after={after}' if after else ''))
+            with METRICS.timer('listing_parse_seconds', 'Parsing a listing page'):
+                children, next_after = parse_listing(response.content, self.json_backend)
+            METRICS.count('listing_posts', len(children))
+            return children, reddit_sort, reddit_time, next_after
+        except KeyError:
+            # A broken follow-up page does not mean the subreddit is missing
+            if after is None:
+                self.wrong_subreddit_set.add(subreddit)
+                print(f"\tr/{subreddit} does not exists")
+            return None
 
     def _get_child_info(self, child_attributes, reddit_sort, reddit_time, source_type='image'):
         """Gets all data needed for a given source type
@@ -185,7 +420,7 @@ class RedditChecker:
                 etc.
         :type source_type: str
         :return:
-            Returns a RedditDataHolder, which is essentially a dict with
+            Returns a RedditDataHolder, a slotted record with the
             values filtered from te original data returned by Reddits API
         :rtype: RedditDataHolder
         """
@@ -211,5 +446,5 @@ class RedditChecker:
             domain=child_attributes['domain'],
             url=child_attributes['url'],
             permalink=child_attributes['permalink'],
-            utc_datetime=datetime.utcfromtimestamp(child_attributes['created_utc']),
+            created_utc=int(child_attributes['created_utc']),
         )
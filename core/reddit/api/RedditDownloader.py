@@ -1,6 +1,205 @@
 # -*- coding: utf-8 -*-
+"""Downloads the images of reddit posts
+Images are streamed to disk in chunks by a few worker threads.
+Every file is named after the sha256 of its content, so an image posted
+several times is stored once. Interrupted downloads are resumed with
+HTTP range requests.
+"""
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from helper.metrics.MetricsRegistry import METRICS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
 
 
 class RedditDownloader:
-    def __init__(self):
-        print()
+    """Downloads images in parallel into a content-addressed directory
+    Usage:
+
+        reddit_downloader = RedditDownloader('./images', max_workers=8)
+        for image_file in reddit_downloader.download([(image_id, image_url), ...]):
+            ...  # rows for the image_files table
+    """
+    def __init__(self, download_dir, max_workers=8, chunk_size=64 * 1024, timeout=30,
+                 headers={'User-agent': 'Test Bot'}):
+        """Init for the RedditDownloader class
+
+        :param download_dir:
+            Directory the images are stored in
+        :param max_workers:
+            Maximum number of concurrent downloads, defaults to 8
+        :param chunk_size:
+            Bytes written to disk at once, defaults to 64 KiB
+        :param timeout:
+            Seconds to wait for the server, defaults to 30
+        :param headers:
+            Headers sent with every request
+        """
+        self.download_dir = download_dir
+        self.partial_dir = os.path.join(download_dir, '.partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+        self.max_workers = max(1, max_workers)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        http_adapter = HTTPAdapter(pool_maxsize=self.max_workers, max_retries=2)
+        self.session.mount('https://', http_adapter)
+        self.session.mount('http://', http_adapter)
+
+        self.file_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'images': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'bytes': 0,
+            'seconds': 0.0,
+        }
+
+    def download(self, images):
+        """Downloads images concurrently
+
+        :param images:
+            An iterable of (image_id, image_url) tuples
+        :return:
+            Generator of dicts for the image_files table, in input order
+            Failed downloads are skipped, an url shared by several posts
+            is downloaded once
+        """
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures_by_url = {}
+            pending = deque()
+            for image_id, image_url in images:
+                if image_url not in futures_by_url:
+                    futures_by_url[image_url] = executor.submit(self._download_image, image_url)
+                pending.append((image_id, futures_by_url[image_url]))
+                if len(pending) > self.max_workers * 2:
+                    yield from self._image_file_row(*pending.popleft())
+
+            while pending:
+                yield from self._image_file_row(*pending.popleft())
+        self.stats['seconds'] += time.perf_counter() - started
+
+    @staticmethod
+    def _image_file_row(image_id, future):
+        image_file = future.result()
+        if image_file:
+            yield dict(image_id=image_id, **image_file)
+
+    @property
+    def throughput(self):
+        """Downloaded images and bytes per second
+
+        :rtype: Dict
+        """
+        seconds = self.stats['seconds'] or float('inf')
+        return {
+            'images_per_second': self.stats['images'] / seconds,
+            'bytes_per_second': self.stats['bytes'] / seconds,
+        }
+
+    def _download_image(self, image_url):
+        """Streams a single image to disk
+
+        :return: The sha256, file path and size or None, if the download failed
+        :rtype: Dict
+        """
+        partial_path = os.path.join(
+            self.partial_dir, hashlib.sha1(image_url.encode()).hexdigest() + '.part'
+        )
+        try:
+            with METRICS.timer('download_seconds', 'Streaming an image to disk'):
+                sha256, size, content_type, downloaded_bytes = self._stream_to_file(image_url, partial_path)
+        except (requests.exceptions.RequestException, OSError) as error:
+            print(f"Could not download {image_url}: {error}")
+            self._count(failed=1)
+            return None
+
+        file_path = self._content_path(sha256, self._extension(image_url, content_type))
+        with self.file_lock:
+            is_duplicate = os.path.isfile(file_path)
+            if is_duplicate:
+                os.remove(partial_path)
+            else:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(partial_path, file_path)
+
+        self._count(images=1, duplicates=int(is_duplicate), bytes=downloaded_bytes)
+        METRICS.count('download_bytes', downloaded_bytes)
+        return {
+            'sha256': sha256,
+            'file_path': file_path,
+            'size': size,
+        }
+
+    def _stream_to_file(self, image_url, partial_path):
+        """Writes the response body to partial_path chunk by chunk
+        An existing partial file is resumed, if the server supports range requests.
+
+        :return: sha256 hex digest, size, content type of the image and the downloaded bytes
+        :rtype: tuple
+        :raises requests.exceptions.HTTPError:
+            If the server does not answer with the image
+        """
+        sha256 = hashlib.sha256()
+        offset = os.path.getsize(partial_path) if os.path.isfile(partial_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else None
+
+        with self.session.get(image_url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # The partial file is already complete
+                response = None
+            else:
+                response.raise_for_status()
+
+            mode = 'ab' if response is None or response.status_code == 206 else 'wb'
+            if mode == 'ab':
+                with open(partial_path, 'rb') as partial_file:
+                    for chunk in iter(lambda: partial_file.read(self.chunk_size), b''):
+                        sha256.update(chunk)
+
+            downloaded_bytes = 0
+            if response is not None:
+                with open(partial_path, mode) as partial_file:
+                    for chunk in response.iter_content(self.chunk_size):
+                        partial_file.write(chunk)
+                        sha256.update(chunk)
+                        downloaded_bytes += len(chunk)
+
+            size = (offset if mode == 'ab' else 0) + downloaded_bytes
+            content_type = response.headers.get('Content-Type', '') if response is not None else ''
+        return sha256.hexdigest(), size, content_type, downloaded_bytes
+
+    def _count(self, **counters):
+        with self.stats_lock:
+            for counter, amount in counters.items():
+                self.stats[counter] += amount
+
+    def _content_path(self, sha256, extension):
+        """Files are spread over 256 sub directories by the first byte of their hash"""
+        return os.path.join(self.download_dir, sha256[:2], sha256 + extension)
+
+    @staticmethod
+    def _extension(image_url, content_type):
+        extension = os.path.splitext(urlsplit(image_url).path)[1].lower()
+        if extension in IMAGE_EXTENSIONS:
+            return extension
+        return mimetypes.guess_extension(content_type.split(';')[0].strip()) or ''
+
+    def close(self):
+        """Closes all pooled connections"""
+        self.session.close()
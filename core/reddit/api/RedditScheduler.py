@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Crawls subreddits again and again within one long-running process
+RedditChecker, DBHandler and all caches stay warm between the crawls.
+Every subreddit, sort and time combination is a job with its own polling
+interval, which follows the amount of new posts a job finds:
+
+    - the interval aims at target_new_posts new posts per crawl
+    - a crawl without new posts doubles the interval
+    - a crawl filling the whole page budget halves it, posts may be missed
+
+All jobs due at the same time are crawled together through the request pool.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from core.db.reddit import RedditDBHelper
+
+
+class RedditScheduler:
+    """Schedules recurring, incremental crawls of a RedditChecker
+    Usage:
+
+        reddit_scheduler = RedditScheduler(reddit, db_handler, [('new', 'hour'), ('top', 'day')])
+        reddit_scheduler.run()  # until reddit_scheduler.stop() is called
+        reddit_scheduler.stats
+    """
+    def __init__(self, reddit, db_handler, sort_time_pairs, min_interval=60, max_interval=60 * 60,
+                 initial_interval=5 * 60, target_new_posts=25, clock=time.monotonic):
+        """Init for the RedditScheduler class
+
+        :param reddit:
+            The RedditChecker crawling the jobs, it is switched to incremental mode
+        :type reddit: RedditChecker
+        :param db_handler:
+            The DBHandler storing the crawled data
+        :type db_handler: DBHandler
+        :param sort_time_pairs:
+            An iterable of (reddit_sort, reddit_time) tuples, crawled for every subreddit
+        :param min_interval:
+            Shortest seconds between two crawls of a job, defaults to 60
+        :param max_interval:
+            Longest seconds between two crawls of a job, defaults to 1 hour
+        :param initial_interval:
+            Seconds between the first and the second crawl of a job, defaults to 5 minutes
+            It is kept within min_interval and max_interval
+        :param target_new_posts:
+            New posts a single crawl of a job should find, defaults to 25
+        :param clock:
+            Monotonic clock in seconds, defaults to time.monotonic
+        """
+        self.reddit = reddit
+        self.reddit.incremental = True
+        self.db_handler = db_handler
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_posts = target_new_posts
+        self.clock = clock
+        self.stopped = threading.Event()
+
+        self.jobs = [
+            (subreddit, reddit_sort, reddit_time)
+            for reddit_sort, reddit_time in sort_time_pairs
+            for subreddit in reddit.subreddits
+        ]
+        self.job_stats = {
+            job: {
+                'interval': self._clamp(float(initial_interval)),
+                'runs': 0,
+                'new_posts': 0,
+                'last_run': None,
+                'last_lag': 0.0,
+                'last_duration': 0.0,
+            }
+            for job in self.jobs
+        }
+        self.batch_stats = {'batches': 0, 'max_lag': 0.0, 'total_lag': 0.0, 'runs': 0}
+
+        # (next_run, sequence, job), the sequence keeps the heap from comparing jobs
+        self.sequence = itertools.count()
+        now = self.clock()
+        self.schedule = [(now, next(self.sequence), job) for job in self.jobs]
+        heapq.heapify(self.schedule)
+
+    def run(self, max_batches=None):
+        """Crawls due jobs until stop() is called
+
+        :param max_batches:
+            Stop after this many crawls, defaults to None (run forever)
+        """
+        batches = 0
+        while not self.stopped.is_set() and (max_batches is None or batches < max_batches):
+            wait = self.schedule[0][0] - self.clock()
+            if wait > 0:
+                self.stopped.wait(wait)
+                continue
+
+            self.run_due_jobs()
+            batches += 1
+
+    def stop(self):
+        """Ends run() after the current crawl"""
+        self.stopped.set()
+
+    def run_due_jobs(self):
+        """Crawls all due jobs at once, stores their data and schedules them again"""
+        now = self.clock()
+        due = []
+        while self.schedule and self.schedule[0][0] <= now:
+            next_run, _, job = heapq.heappop(self.schedule)
+            due.append((job, now - next_run))
+        if not due:
+            return
+
+        started = self.clock()
+        jobs = [job for job, _ in due]
+        RedditDBHelper.insert_reddit_data_to_db(self.db_handler, [self.reddit.subreddit_job_data(jobs)])
+        crawl_checkpoints = self.reddit.crawl_checkpoint_rows()
+        RedditDBHelper.save_crawl_checkpoints(self.db_handler, crawl_checkpoints)
+        finished = self.clock()
+
+        new_posts = {
+            (row['subreddit'], row['reddit_sort'], row['reddit_time']): row['new_posts']
+            for row in crawl_checkpoints
+        }
+        for job, lag in due:
+            self._reschedule(job, lag, new_posts.get(job, 0), finished)
+
+        max_lag = max(lag for _, lag in due)
+        self.batch_stats['batches'] += 1
+        self.batch_stats['runs'] += len(due)
+        self.batch_stats['total_lag'] += sum(lag for _, lag in due)
+        self.batch_stats['max_lag'] = max(self.batch_stats['max_lag'], max_lag)
+        print(f"{len(due)} jobs crawled in {finished - started:.1f}s - lag {max_lag:.1f}s - "
+              f"{sum(new_posts.values())} new posts")
+
+    def _reschedule(self, job, lag, new_posts, now):
+        job_stats = self.job_stats[job]
+        job_stats['interval'] = self._next_interval(job_stats, new_posts, now)
+        job_stats['runs'] += 1
+        job_stats['new_posts'] += new_posts
+        job_stats['last_run'] = now
+        job_stats['last_lag'] = lag
+        job_stats['last_duration'] = self.reddit.job_durations.get(job, 0.0)
+        heapq.heappush(self.schedule, (now + job_stats['interval'], next(self.sequence), job))
+
+    def _next_interval(self, job_stats, new_posts, now):
+        """The polling interval adapted to the post velocity of the last crawl"""
+        interval = job_stats['interval']
+        if job_stats['last_run'] is None:
+            # The first crawl reads the whole backlog, it tells nothing about the velocity
+            return self._clamp(interval)
+
+        if new_posts == 0:
+            interval *= 2
+        elif new_posts >= self.reddit.page_size * self.reddit.max_pages:
+            interval /= 2
+        else:
+            posts_per_second = new_posts / max(now - job_stats['last_run'], 1e-3)
+            # Smoothed, a single burst does not throw the interval off
+            interval = (interval + self.target_new_posts / posts_per_second) / 2
+        return self._clamp(interval)
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    @property
+    def stats(self):
+        """Scheduling lag, per-job durations and intervals
+
+        :rtype: Dict
+        """
+        runs = self.batch_stats['runs']
+        return {
+            'batches': self.batch_stats['batches'],
+            'max_lag': self.batch_stats['max_lag'],
+            'mean_lag': self.batch_stats['total_lag'] / runs if runs else 0.0,
+            'jobs': {'/'.join(job): dict(job_stats) for job, job_stats in self.job_stats.items()},
+        }
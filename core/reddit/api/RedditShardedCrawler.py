@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Crawls subreddits with several processes
+The subreddits are split into shards, every shard is fetched, parsed and
+formatted by its own worker process. The formatted rows are streamed over
+a queue to a single writer process, which owns the database connection,
+so SQLite3 never has to handle concurrent writers.
+"""
+import multiprocessing
+import queue
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import RedditDBHelper
+from core.db.reddit.RedditDBFormatter import TABLE_ORDER
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.requests.RedditResponseCache import RedditResponseCache
+from helper.google.GoogleResultCache import GoogleResultCache
+from helper.ratelimit.AdaptiveRateLimiter import AdaptiveRateLimiter
+from helper.replay.HttpCassette import mount_cassette
+
+STOP_WRITING = None
+# Tags the message carrying the high-water marks of a worker
+CRAWL_CHECKPOINTS = 'crawl_checkpoints'
+
+
+class RedditShardedCrawler:
+    """Splits RedditChecker.subreddits across worker processes
+    Usage:
+
+        crawler = RedditShardedCrawler(
+            "pic earthporn spaceporn", 'AUTOGENERATED.db', processes=3,
+            checker_options={'max_workers': 8},
+        )
+        crawler.crawl([('top', 'day'), ('new', 'hour')])
+        crawler.bulk_insert_stats
+    """
+    def __init__(self, subreddits, db_file_path, processes=2, db_options=None, checker_options=None,
+                 rows_per_message=500, queue_size=64, incremental=False):
+        """Init for the RedditShardedCrawler class
+
+        :param subreddits: Any amount of subreddit names, see RedditChecker
+        :type subreddits: str | (list, tuple)
+        :param db_file_path:
+            The path and name of your database file
+        :param processes:
+            Amount of worker processes, defaults to 2
+        :param db_options:
+            Keyword arguments of the writer's DBHandler, defaults to None
+        :param checker_options:
+            Keyword arguments of every worker's RedditChecker, defaults to None
+            Caches are given by their path as 'cache_path', 'cache_size'
+            and 'google_cache_path', every worker opens them itself
+            Responses are recorded to 'record_dir' or replayed from 'replay_dir'
+            'request_rate' caps the requests per second of all workers together
+        :param rows_per_message:
+            Formatted posts sent to the writer at once, defaults to 500
+        :param queue_size:
+            Maximum amount of messages waiting for the writer, defaults to 64
+        :param incremental:
+            Every worker warm-starts from the database and stops at posts
+            ingested by an earlier run, defaults to False
+        """
+        if not isinstance(subreddits, (list, tuple)):
+            subreddits = subreddits.split(" ")
+
+        self.processes = max(1, min(processes, len(subreddits)))
+        self.shards = [list(subreddits[shard::self.processes]) for shard in range(self.processes)]
+        self.db_file_path = db_file_path
+        self.db_options = db_options or {}
+        self.checker_options = checker_options or {}
+        self.rows_per_message = rows_per_message
+        self.queue_size = queue_size
+        self.incremental = incremental
+        self.bulk_insert_stats = {}
+
+    def crawl(self, sort_time_pairs):
+        """Crawls all shards and waits until every row is written
+
+        :param sort_time_pairs:
+            An iterable of (reddit_sort, reddit_time) tuples
+        """
+        context = multiprocessing.get_context('spawn')
+        row_queue = context.Queue(maxsize=self.queue_size)
+        stats_queue = context.Queue()
+
+        writer = context.Process(
+            target=_write_rows, name='reddit-writer',
+            args=(row_queue, stats_queue, self.db_file_path, self.db_options),
+        )
+        workers = [
+            context.Process(
+                target=_crawl_shard, name=f'reddit-shard-{shard}',
+                args=(row_queue, subreddits, list(sort_time_pairs),
+                      dict(self.checker_options, shards=len(self.shards)),
+                      self.rows_per_message, self._crawl_state_options()),
+            )
+            for shard, subreddits in enumerate(self.shards)
+        ]
+
+        writer.start()
+        for worker in workers:
+            worker.start()
+        if not self._wait_for_workers(workers, writer):
+            # Nobody reads the queue anymore, its buffered messages are dropped
+            row_queue.cancel_join_thread()
+            print(f"{writer.name} stopped with exit code {writer.exitcode}, the workers were stopped")
+            self.bulk_insert_stats = {}
+            return
+
+        # Every worker flushed its rows before exiting, so this is the last message
+        self._put_while_writing(row_queue, STOP_WRITING, writer)
+        self.bulk_insert_stats = self._wait_for_writer(writer, stats_queue)
+        writer.join()
+
+    def _crawl_state_options(self):
+        """Where a worker loads its crawl state from, None crawls everything"""
+        if not self.incremental:
+            return None
+        return {'db_file_path': self.db_file_path, **self.db_options}
+
+    @staticmethod
+    def _wait_for_workers(workers, writer):
+        """Joins the workers, they are terminated once the writer died
+        Workers would wait forever on the full queue of a dead writer.
+
+        :return: False, if the writer died before all workers finished
+        :rtype: bool
+        """
+        for worker in workers:
+            while True:
+                worker.join(timeout=1)
+                if worker.exitcode is not None:
+                    break
+                if not writer.is_alive():
+                    for running_worker in workers:
+                        running_worker.terminate()
+                        running_worker.join()
+                    return False
+            if worker.exitcode:
+                print(f"{worker.name} stopped with exit code {worker.exitcode}")
+        return True
+
+    @staticmethod
+    def _put_while_writing(row_queue, message, writer):
+        """Puts a message on the queue, gives up once the writer died"""
+        while writer.is_alive():
+            try:
+                row_queue.put(message, timeout=1)
+                return
+            except queue.Full:
+                continue
+        row_queue.cancel_join_thread()
+
+    @staticmethod
+    def _wait_for_writer(writer, stats_queue):
+        while True:
+            try:
+                return stats_queue.get(timeout=1)
+            except queue.Empty:
+                if writer.is_alive():
+                    continue
+            try:
+                return stats_queue.get_nowait()
+            except queue.Empty:
+                print(f"{writer.name} stopped with exit code {writer.exitcode}")
+                return {}
+
+
+def _crawl_shard(row_queue, subreddits, sort_time_pairs, checker_options, rows_per_message,
+                 crawl_state_options=None):
+    """Worker process: fetches, parses and formats one shard of subreddits"""
+    reddit = _shard_checker(subreddits, checker_options, incremental=crawl_state_options is not None)
+    if crawl_state_options is not None:
+        # Only reads, the writer process stays the only one writing
+        db_handler = DBHandler(**crawl_state_options)
+        RedditDBHelper.load_crawl_state(reddit, db_handler)
+        db_handler.close()
+
+    rows = []
+    for post in reddit.subreddit_grid_data(sort_time_pairs):
+        rows.append(post)
+        if len(rows) >= rows_per_message:
+            row_queue.put(rows)
+            rows = []
+    rows.extend(reddit.reddit_db_formatter.close())
+    if rows:
+        row_queue.put(rows)
+    # Sent after the posts, so the writer moves a checkpoint only once its posts are written
+    row_queue.put((CRAWL_CHECKPOINTS, reddit.crawl_checkpoint_rows()))
+
+    reddit.reddit_http_handler.close()
+
+
+def _shard_checker(subreddits, checker_options, incremental):
+    """The RedditChecker of a worker process, sharing the rate limits of the client with the other shards"""
+    checker_options = dict(checker_options)
+    cache_path = checker_options.pop('cache_path', None)
+    cache_size = checker_options.pop('cache_size', 256)
+    google_cache_path = checker_options.pop('google_cache_path', None)
+    record_dir = checker_options.pop('record_dir', None)
+    replay_dir = checker_options.pop('replay_dir', None)
+    request_rate = checker_options.pop('request_rate', None)
+    google_rate = checker_options.pop('google_rate', 1.0)
+    shards = checker_options.pop('shards', 1)
+
+    if cache_path:
+        checker_options['response_cache'] = RedditResponseCache(cache_path, cache_size * 1024 ** 2)
+    if google_cache_path:
+        checker_options['google_result_cache'] = GoogleResultCache(google_cache_path)
+    # Every worker sees the budget of the whole client, it uses its share of it
+    checker_options['rate_limiter'] = AdaptiveRateLimiter(
+        max_rate=request_rate / shards if request_rate else None, budget_share=1 / shards,
+    )
+    # Google is asked by every worker as well
+    checker_options['google_rate'] = google_rate / shards
+
+    reddit = RedditChecker(subreddits, db_file_path=None, incremental=incremental, **checker_options)
+    mount_cassette(reddit, record_dir, replay_dir)
+    return reddit
+
+
+def _write_rows(row_queue, stats_queue, db_file_path, db_options):
+    """Writer process: the only process connected to the database"""
+    db_handler = DBHandler(db_file_path, table_order=TABLE_ORDER, **db_options)
+    crawl_checkpoints = []
+
+    while True:
+        rows = row_queue.get()
+        if rows is STOP_WRITING:
+            break
+        if isinstance(rows, tuple) and rows[0] == CRAWL_CHECKPOINTS:
+            crawl_checkpoints.extend(rows[1])
+            continue
+        for post in rows:
+            RedditDBHelper.insert_formatted_post(db_handler, post)
+
+    db_handler.flush()
+    RedditDBHelper.save_crawl_checkpoints(db_handler, crawl_checkpoints)
+    stats_queue.put(db_handler.bulk_insert_stats)
+    db_handler.close()
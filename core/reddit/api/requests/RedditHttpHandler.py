@@ -1,9 +1,66 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from helper.metrics.MetricsRegistry import METRICS
+from helper.ratelimit.AdaptiveRateLimiter import AdaptiveRateLimiter, RETRY_STATUSES
 
 
 class RedditHttpHandler:
-    def __init__(self, headers={'User-agent': 'Test Bot'}):
+    """Sends requests to reddit through a pooled keep-alive session
+    Connections are reused between subreddits and sort/time combinations,
+    so only the first request to a host pays for the TCP/TLS handshake.
+    """
+    def __init__(self, headers={'User-agent': 'Test Bot'}, base_url='https://www.reddit.com',
+                 pool_connections=4, pool_maxsize=8, max_retries=3, backoff_factor=0.5,
+                 response_cache=None, rate_limiter=None):
+        """Init for the RedditHttpHandler class
+
+        :param headers:
+            Headers sent with every request
+        :param base_url:
+            The reddit host to query, defaults to 'https://www.reddit.com'
+        :param pool_connections:
+            Amount of hosts to keep a connection pool for, defaults to 4
+        :param pool_maxsize:
+            Maximum amount of open connections per host, defaults to 8
+            Should be at least the amount of concurrent requests
+        :param max_retries:
+            Retries for failed connections, 429 and 5xx responses, defaults to 3
+        :param backoff_factor:
+            Sleeps backoff_factor * 2 ** (retry - 1) seconds between retries,
+            defaults to 0.5
+        :param response_cache:
+            A RedditResponseCache to serve repeated queries from, defaults to None
+        :param rate_limiter:
+            The AdaptiveRateLimiter pacing all requests, may be shared between
+            handlers, defaults to None (a new one)
+        """
         self.headers = headers
+        self.response_cache = response_cache
+        self.base_url = base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(backoff_factor=backoff_factor)
+
+        # 429 and 5xx are retried by _request, paced by the rate limiter
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(),
+            respect_retry_after_header=False,
+            allowed_methods=('GET', ),
+            raise_on_status=False,
+        )
+        self.http_adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retries,
+            pool_block=True,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount('https://', self.http_adapter)
+        self.session.mount('http://', self.http_adapter)
 
     def get_response(self, request_query):
         """HTTP Response getter
@@ -14,34 +71,107 @@ class RedditHttpHandler:
         :return:
             A HTTP response using the request_query
         """
+        if self.response_cache is None:
+            return self._request(request_query)
+
+        cache_entry = self.response_cache.lookup(request_query)
+        if cache_entry is not None and cache_entry.is_fresh:
+            METRICS.count('reddit_cache_hits')
+            return self.response_cache.to_response(request_query, cache_entry)
+
+        response = self._request(
+            request_query, self.response_cache.conditional_headers(cache_entry)
+        )
+        if response is None:
+            return None
+        if response.status_code == 304 and cache_entry is not None:
+            self.response_cache.revalidated(request_query)
+            return self.response_cache.to_response(request_query, cache_entry)
+
+        self.response_cache.store(request_query, response)
+        return response
+
+    def _request(self, request_query, headers=None):
         try:
-            return requests.get(request_query, headers=self.headers)
-        except ConnectionError as max_retries_exceeded_error:
+            with METRICS.timer('reddit_request_seconds', 'Reddit listing requests including retries'):
+                response = self._paced_get(request_query, headers)
+        except requests.exceptions.ConnectionError as max_retries_exceeded_error:
             print(max_retries_exceeded_error)
+            METRICS.count('reddit_request_errors')
             return None
 
-    @staticmethod
-    def _create_request_query(sorts_with_timeconditon, subreddit, reddit_sort, reddit_time):
+        METRICS.count('reddit_requests')
+        METRICS.count('reddit_response_bytes', len(response.content))
+        return response
+
+    def _paced_get(self, request_query, headers):
+        """Sends a request once the rate limiter allows it, 429 and 5xx are retried"""
+        for retry in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(request_query, headers=headers)
+            except requests.exceptions.ConnectionError:
+                self.rate_limiter.release()
+                raise
+            self.rate_limiter.update(response)
+            if response.status_code not in RETRY_STATUSES:
+                break
+            METRICS.count('reddit_throttled', description='Reddit responses with 429 or 5xx')
+        return response
+
+    @property
+    def connection_stats(self):
+        """Counts the connections opened and reused by the session
+
+        :return:
+            Dict with 'requests', 'connections_opened' and 'connections_reused'
+        :rtype: Dict
+        """
+        pools = self.http_adapter.poolmanager.pools
+        connections_opened = 0
+        sent_requests = 0
+        for pool_key in pools.keys():
+            pool = pools[pool_key]
+            connections_opened += pool.num_connections
+            sent_requests += pool.num_requests
+
+        return {
+            'requests': sent_requests,
+            'connections_opened': connections_opened,
+            'connections_reused': sent_requests - connections_opened,
+        }
+
+    def close(self):
+        """Closes all pooled connections"""
+        self.session.close()
+
+    def _create_request_query(self, sorts_with_timeconditon, subreddit, reddit_sort, reddit_time,
+                              after=None, limit=None):
         """Generates a specified request query
 
         :param sorts_with_timeconditon: A list of sorts with time conditions
-        :type sorts_with_timeconditon: list, tuple 
+        :type sorts_with_timeconditon: list, tuple
         :param subreddit: The subreddit name
         :type subreddit: str
         :param reddit_sort: Sorting method
         :param reddit_time: Time sorting method
+        :param after: Fullname of the last post of the previous page, defaults to None
+        :param limit: Amount of posts per page, defaults to None (reddit uses 25)
         :return: A specified request query which can be use within requests.get()
         :rtype: str
         """
-
+        parameters = []
         if reddit_sort in sorts_with_timeconditon:
-            request_query = r'https://www.reddit.com/r/{}/{}/.json?sort={}&t={}'.format(
-                subreddit, reddit_sort, reddit_sort, reddit_time
-            )
-            return request_query
+            parameters.append(f'sort={reddit_sort}')
+            parameters.append(f't={reddit_time}')
+        if limit:
+            parameters.append(f'limit={limit}')
+        if after:
+            parameters.append(f'after={after}')
 
-        request_query = r'https://www.reddit.com/r/{}/{}/.json'.format(
-            subreddit, reddit_sort
+        request_query = r'{}/r/{}/{}/.json'.format(
+            self.base_url, subreddit, reddit_sort
         )
+        if parameters:
+            request_query += '?' + '&'.join(parameters)
         return request_query
-    
\ No newline at end of file
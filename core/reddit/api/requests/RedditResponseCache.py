@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache for reddit listings
+Keeps the responses of RedditHttpHandler on disk, so re-running the tool
+on the same subreddits does not download identical listings again.
+Stale listings are revalidated with conditional requests, if reddit sent
+an ETag or Last-Modified header.
+"""
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from core.io.DiskCache import DiskCache
+from core.reddit.config.RedditConfigrations import reddit_configs
+
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class RedditResponseCache:
+    """Caches reddit responses keyed by their request query
+    Usage:
+
+        response_cache = RedditResponseCache('reddit_cache.db')
+        reddit_http_handler = RedditHttpHandler(response_cache=response_cache)
+    """
+    def __init__(self, cache_path, max_bytes=256 * 1024 ** 2, cache_ttls=reddit_configs.cache_ttls,
+                 default_ttl=60):
+        """Init for the RedditResponseCache class
+
+        :param cache_path:
+            The path and name of the cache file
+        :param max_bytes:
+            Maximum size of all cached listings, defaults to 256 MiB
+        :param cache_ttls:
+            Seconds a listing stays fresh per sort (and time),
+            defaults to reddit_configs.cache_ttls
+        :param default_ttl:
+            Seconds for queries without a known sort, defaults to 60
+        """
+        self.disk_cache = DiskCache(cache_path, max_bytes)
+        self.cache_ttls = cache_ttls
+        self.default_ttl = default_ttl
+        self.revalidations = 0
+
+    def lookup(self, request_query):
+        """Looks up a cached response, expired ones are returned for revalidation
+
+        :param request_query:
+            Your request_query
+        :return:
+            The CacheEntry or None
+        """
+        return self.disk_cache.get(request_query, allow_stale=True)
+
+    @staticmethod
+    def conditional_headers(cache_entry):
+        """Creates the headers to revalidate an expired response
+
+        :param cache_entry:
+            The CacheEntry returned by lookup, may be None
+        :return: If-None-Match/If-Modified-Since headers, if validators are known
+        :rtype: Dict
+        """
+        if cache_entry is None:
+            return {}
+
+        headers = cache_entry.meta['headers']
+        conditional_headers = {}
+        if 'ETag' in headers:
+            conditional_headers['If-None-Match'] = headers['ETag']
+        if 'Last-Modified' in headers:
+            conditional_headers['If-Modified-Since'] = headers['Last-Modified']
+        return conditional_headers
+
+    def store(self, request_query, response):
+        """Caches a successful response
+
+        :param request_query:
+            Your request_query
+        :param response:
+            The response of the request_query
+        :type response: requests.Response
+        """
+        if not response.ok:
+            return
+
+        meta = {
+            'status_code': response.status_code,
+            'encoding': response.encoding,
+            'headers': {
+                header: response.headers[header]
+                for header in CACHED_HEADERS
+                if header in response.headers
+            },
+        }
+        self.disk_cache.set(request_query, response.content, self.ttl(request_query), meta)
+
+    def revalidated(self, request_query):
+        """Marks an expired response as fresh, after reddit answered 304 Not Modified
+
+        :param request_query:
+            Your request_query
+        """
+        self.revalidations += 1
+        self.disk_cache.refresh(request_query, self.ttl(request_query))
+
+    def ttl(self, request_query):
+        """Seconds a listing stays fresh, depending on its sort and time
+
+        :param request_query:
+            Your request_query, e.g. https://www.reddit.com/r/pic/top/.json?sort=top&t=all
+        :rtype: int
+        """
+        url = urlparse(request_query)
+        path = [part for part in url.path.split('/') if part]
+        # ['r', subreddit, reddit_sort, '.json']
+        if len(path) < 3 or path[2] not in self.cache_ttls:
+            return self.default_ttl
+
+        ttl = self.cache_ttls[path[2]]
+        if isinstance(ttl, dict):
+            reddit_time = parse_qs(url.query).get('t', ['day'])[0]
+            return ttl.get(reddit_time, self.default_ttl)
+        return ttl
+
+    @staticmethod
+    def to_response(request_query, cache_entry):
+        """Rebuilds a response out of a cached one
+
+        :param request_query:
+            Your request_query
+        :param cache_entry:
+            The CacheEntry returned by lookup
+        :rtype: requests.Response
+        """
+        response = requests.Response()
+        response.status_code = cache_entry.meta['status_code']
+        response.encoding = cache_entry.meta['encoding']
+        response.headers = CaseInsensitiveDict(cache_entry.meta['headers'])
+        response.url = request_query
+        response._content = cache_entry.value
+        return response
+
+    @property
+    def stats(self):
+        """Hits, misses, revalidations and evictions of the cache
+
+        :rtype: Dict
+        """
+        return dict(self.disk_cache.stats, revalidations=self.revalidations)
+
+    def close(self):
+        """Closes the cache file"""
+        self.disk_cache.close()
@@ -3,7 +3,8 @@ from collections import namedtuple
 """Holds the general configurations needed while working with the Reddit api
 """
 RedditConfigurations = namedtuple(
-    "RedditConfigrations", field_names=["accepted_sorts", "accepted_times", "sorts_with_timeconditon"]
+    "RedditConfigrations",
+    field_names=["accepted_sorts", "accepted_times", "sorts_with_timeconditon", "cache_ttls"]
 )
 
 __accepted_sorts = {
@@ -25,4 +26,30 @@ __accepted_times = {
 
 __sorts_with_timeconditon = ('controversial', 'top')
 
-reddit_configs = RedditConfigurations(__accepted_sorts, __accepted_times, __sorts_with_timeconditon)
\ No newline at end of file
+# Seconds a cached listing stays fresh
+# Sorts with a time condition are looked up by their time
+__cache_ttls = {
+    'hot': 5 * 60,
+    'new': 60,
+    'rising': 60,
+    'controversial': {
+        'hour': 5 * 60,
+        'day': 30 * 60,
+        'week': 3 * 60 * 60,
+        'month': 12 * 60 * 60,
+        'year': 24 * 60 * 60,
+        'all': 7 * 24 * 60 * 60,
+    },
+    'top': {
+        'hour': 5 * 60,
+        'day': 30 * 60,
+        'week': 3 * 60 * 60,
+        'month': 12 * 60 * 60,
+        'year': 24 * 60 * 60,
+        'all': 7 * 24 * 60 * 60,
+    },
+}
+
+reddit_configs = RedditConfigurations(
+    __accepted_sorts, __accepted_times, __sorts_with_timeconditon, __cache_ttls
+)
\ No newline at end of file
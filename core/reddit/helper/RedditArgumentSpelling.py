@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Corrects misspelled sort and time arguments before anything is requested
+Every accepted word and all its typos within one edit (a deleted, replaced,
+inserted or swapped letter) are precomputed into a lookup, e.g.
+'tpo' -> 'top' or 'weak' -> 'week'. Anything further away is matched by
+its difflib similarity, once per distinct argument.
+"""
+from difflib import SequenceMatcher
+from functools import lru_cache
+from string import ascii_lowercase
+
+from core.reddit.config.RedditConfigrations import reddit_configs
+
+
+def typo_lookup(accepted_words):
+    """Maps every word within one edit of an accepted word to the accepted word
+    Exact words win over typos, typos of several words are left out.
+
+    :param accepted_words: The correctly spelled words
+    :rtype: Dict
+    """
+    typos = {}
+    for accepted_word in accepted_words:
+        for typo in _single_edits(accepted_word):
+            typos.setdefault(typo, set()).add(accepted_word)
+
+    lookup = {typo: words.pop() for typo, words in typos.items() if len(words) == 1}
+    lookup.update((accepted_word, accepted_word) for accepted_word in accepted_words)
+    return lookup
+
+
+def correct_sort(reddit_sort):
+    """The accepted sort closest to reddit_sort, e.g. 'tpo' -> 'top'"""
+    return _correct(reddit_sort, SORT_LOOKUP, tuple(reddit_configs.accepted_sorts))
+
+
+def correct_time(reddit_time):
+    """The accepted time closest to reddit_time, e.g. 'weak' -> 'week'"""
+    return _correct(reddit_time, TIME_LOOKUP, tuple(reddit_configs.accepted_times))
+
+
+def _correct(argument, lookup, accepted_words):
+    normalized = argument.strip().lower()
+    corrected = lookup.get(normalized)
+    if corrected is None:
+        corrected = _closest_word(normalized, accepted_words)
+    return corrected
+
+
+@lru_cache(maxsize=None)
+def _closest_word(argument, accepted_words):
+    """The accepted word with the highest difflib similarity"""
+    return max(accepted_words, key=lambda accepted_word: SequenceMatcher(a=argument, b=accepted_word).ratio())
+
+
+def _single_edits(word):
+    splits = [(word[:position], word[position:]) for position in range(len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    swaps = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+    replaces = [left + letter + right[1:] for left, right in splits if right for letter in ascii_lowercase]
+    inserts = [left + letter + right for left, right in splits for letter in ascii_lowercase]
+    return set(deletes + swaps + replaces + inserts)
+
+
+# Built once on import, a few thousand typos
+SORT_LOOKUP = typo_lookup(reddit_configs.accepted_sorts)
+TIME_LOOKUP = typo_lookup(reddit_configs.accepted_times)
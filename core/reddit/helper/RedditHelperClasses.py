@@ -1,6 +1,3 @@
-from collections import namedtuple
-
-
 reddit_data_parameters = [
     'title',
     'post_id',
@@ -15,6 +12,46 @@ reddit_data_parameters = [
     'domain',
     'url',
     'permalink',
-    'utc_datetime',
+    'created_utc',
 ]
-RedditDataHolder = namedtuple('RedditData', reddit_data_parameters)
+
+
+class RedditDataHolder:
+    """The fields of a post used by the tool
+    Slotted, so every post is a single small object without a __dict__.
+    created_utc stays seconds since the epoch, the database backend turns
+    it into upload_time while inserting (EPOCH_DATETIME of DBBackends).
+    Records are mutable and compared by all their fields, so they are
+    not hashable, key posts by their post_id instead.
+    """
+    __slots__ = reddit_data_parameters
+
+    def __init__(self, title, post_id, subreddit_id, subreddit_name_prefixed, subreddit_subscribers, ups,
+                 gildings, num_comments, reddit_sort, reddit_time, domain, url, permalink, created_utc):
+        self.title = title
+        self.post_id = post_id
+        self.subreddit_id = subreddit_id
+        self.subreddit_name_prefixed = subreddit_name_prefixed
+        self.subreddit_subscribers = subreddit_subscribers
+        self.ups = ups
+        self.gildings = gildings
+        self.num_comments = num_comments
+        self.reddit_sort = reddit_sort
+        self.reddit_time = reddit_time
+        self.domain = domain
+        self.url = url
+        self.permalink = permalink
+        self.created_utc = created_utc
+
+    def __eq__(self, other):
+        if not isinstance(other, RedditDataHolder):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in reddit_data_parameters)
+
+    # Defining __eq__ already drops the inherited __hash__, this keeps it so on purpose
+    __hash__ = None
+
+    def __repr__(self):
+        return 'RedditData({})'.format(
+            ', '.join(f'{field}={getattr(self, field)!r}' for field in reddit_data_parameters)
+        )
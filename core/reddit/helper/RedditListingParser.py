@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Parses reddit listings into the few fields the tool needs
+A listing page of 100 posts is about 1 MB of json, most of it previews,
+awards and media the tool never looks at. Only the fields of
+CHILD_FIELDS are kept for every post.
+
+Three backends are available, the fastest installed one is the default:
+
+    - 'orjson': parses the whole page with orjson, then projects the posts
+    - 'json': parses the whole page with the standard library
+    - 'ijson': streams the page with ijson and only builds the projected
+      fields, the unused parts of a post are never turned into objects.
+      It needs about a fifth of the memory, but several times the CPU time,
+      see benchmarks/bench_listing_parser.py
+"""
+import io
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Keys of a post's 'data' used by RedditChecker, see reddit_data_parameters
+CHILD_FIELDS = frozenset((
+    'title',
+    'id',
+    'name',
+    'subreddit_id',
+    'subreddit_name_prefixed',
+    'subreddit_subscribers',
+    'ups',
+    'gildings',
+    'num_comments',
+    'domain',
+    'url',
+    'permalink',
+    'created_utc',
+    'post_hint',
+))
+
+CHILD_PREFIX = 'data.children.item.data'
+# ijson turns a whole buffer into events at once, small buffers keep the peak memory low
+IJSON_BUFFER_SIZE = 8 * 1024
+
+
+def _available_backends():
+    backends = ['json']
+    if orjson is not None:
+        backends.insert(0, 'orjson')
+    if ijson is not None:
+        backends.append('ijson')
+    return backends
+
+
+PARSER_BACKENDS = _available_backends()
+
+
+def parse_listing(content, backend=None):
+    """Parses one listing page
+
+    :param content:
+        The raw json of the listing
+    :type content: bytes
+    :param backend:
+        One of PARSER_BACKENDS, defaults to the first available one
+    :return:
+        The projected 'data' of every post and the 'after' cursor
+    :rtype: tuple
+    :raises KeyError:
+        If the content is no listing or the backend is not installed
+    """
+    backend = backend or PARSER_BACKENDS[0]
+    if backend not in PARSER_BACKENDS:
+        raise KeyError(f"Listing parser '{backend}' is not installed, "
+                       f"choose one of: {', '.join(PARSER_BACKENDS)}")
+
+    if backend == 'ijson':
+        return _parse_ijson(content)
+
+    loads = orjson.loads if backend == 'orjson' else json.loads
+    listing = loads(content)['data']
+    children = [_project(child['data']) for child in listing['children']]
+    return children, listing.get('after')
+
+
+def _project(child_attributes):
+    return {key: value for key, value in child_attributes.items() if key in CHILD_FIELDS}
+
+
+def _parse_ijson(content):
+    """Builds the projected posts from parser events
+    Nested fields (e.g. gildings) are built with an ObjectBuilder,
+    events of all other nested objects are skipped.
+    """
+    children = []
+    after = None
+    has_data = False
+    child_attributes = None
+    builder = None
+    builder_prefix = None
+
+    events = ijson.parse(io.BytesIO(content), buf_size=IJSON_BUFFER_SIZE, use_float=True)
+    for prefix, event, value in events:
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == builder_prefix and event in ('end_map', 'end_array'):
+                child_attributes[builder_prefix[len(CHILD_PREFIX) + 1:]] = builder.value
+                builder = None
+        elif prefix == CHILD_PREFIX:
+            if event == 'start_map':
+                child_attributes = {}
+            elif event == 'end_map':
+                children.append(child_attributes)
+        elif prefix.startswith(CHILD_PREFIX) and prefix[len(CHILD_PREFIX) + 1:] in CHILD_FIELDS:
+            if event in ('start_map', 'start_array'):
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                builder_prefix = prefix
+            else:
+                child_attributes[prefix[len(CHILD_PREFIX) + 1:]] = value
+        elif prefix == 'data' and event == 'start_map':
+            has_data = True
+        elif prefix == 'data.after':
+            after = value
+
+    if not has_data:
+        raise KeyError('data')
+    return children, after
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""Remembers which reddit ids were seen already
+Long crawls see millions of posts, a Python set of strings needs about
+100 bytes for each of them. The backends share the same small interface
+(add, update, `in`, len, memory_bytes), so RedditDBFormatter can use
+any of them:
+
+    - 'set': a plain Python set, exact and fastest
+    - 'exact': base 36 ids decoded to integers in an array backed hash set,
+      exact and about 8x smaller
+    - 'bloom': a Bloom filter, smallest with a configurable false positive
+      rate, a false positive skips the images row of a new post
+"""
+import hashlib
+import math
+import sys
+from array import array
+
+EMPTY_SLOT = -1
+
+
+class PythonSeenSet:
+    """A plain Python set reporting its memory footprint"""
+    def __init__(self):
+        self.keys = set()
+
+    def add(self, key):
+        self.keys.add(key)
+
+    def update(self, keys):
+        self.keys.update(keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def memory_bytes(self):
+        """Bytes used by the set and its strings"""
+        return sys.getsizeof(self.keys) + sum(sys.getsizeof(key) for key in self.keys)
+
+
+class CompactSeenSet:
+    """An exact set of reddit ids stored as 64 bit integers
+    Ids like 'hx3k2a' or fullnames like 't3_hx3k2a' are decoded from
+    base 36 and stored in an open addressing hash table with linear
+    probing. Keys, which are no base 36 number, are kept in a small set.
+    Usage:
+
+        seen_posts = CompactSeenSet()
+        seen_posts.add('t3_hx3k2a')
+        'hx3k2a' in seen_posts  # True, the type prefix is ignored
+    """
+    def __init__(self, capacity=1024, max_load=0.7):
+        """Init for the CompactSeenSet class
+
+        :param capacity:
+            Expected amount of ids, the table grows beyond it, defaults to 1024
+        :param max_load:
+            Share of used slots which doubles the table, defaults to 0.7
+        """
+        self.max_load = max_load
+        self.slots = array('q', [EMPTY_SLOT]) * self._table_size(capacity)
+        self.mask = len(self.slots) - 1
+        self.used_slots = 0
+        self.undecodable_keys = set()
+
+    def _table_size(self, capacity):
+        return 1 << max(4, math.ceil(math.log2(capacity / self.max_load + 1)))
+
+    @staticmethod
+    def _decode(key):
+        """The id as an integer or None, if it is no base 36 number"""
+        digits = key.rpartition('_')[2]
+        # Signs, spaces and leading zeros would decode several keys to the same number, '-1' to EMPTY_SLOT
+        if not (digits.isascii() and digits.isalnum()) or (digits[0] == '0' and len(digits) > 1):
+            return None
+        number = int(digits, 36)
+        return number if number < 2 ** 63 else None
+
+    def _slot(self, number):
+        """Index of the slot holding number or of the empty slot it belongs to"""
+        slots, mask = self.slots, self.mask
+        # Fibonacci hashing spreads consecutive ids over the whole table
+        index = ((number * 0x9E3779B97F4A7C15) >> 32) & mask
+        while slots[index] != EMPTY_SLOT and slots[index] != number:
+            index = (index + 1) & mask
+        return index
+
+    def add(self, key):
+        number = self._decode(key)
+        if number is None:
+            self.undecodable_keys.add(key)
+            return
+
+        index = self._slot(number)
+        if self.slots[index] == EMPTY_SLOT:
+            self.slots[index] = number
+            self.used_slots += 1
+            if self.used_slots > len(self.slots) * self.max_load:
+                self._grow()
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def _grow(self):
+        numbers = [number for number in self.slots if number != EMPTY_SLOT]
+        self.slots = array('q', [EMPTY_SLOT]) * (len(self.slots) * 2)
+        self.mask = len(self.slots) - 1
+        for number in numbers:
+            self.slots[self._slot(number)] = number
+
+    def __contains__(self, key):
+        number = self._decode(key)
+        if number is None:
+            return key in self.undecodable_keys
+        return self.slots[self._slot(number)] == number
+
+    def __len__(self):
+        return self.used_slots + len(self.undecodable_keys)
+
+    @property
+    def memory_bytes(self):
+        """Bytes used by the hash table and the undecodable keys"""
+        return (self.slots.buffer_info()[1] * self.slots.itemsize + sys.getsizeof(self.undecodable_keys)
+                + sum(sys.getsizeof(key) for key in self.undecodable_keys))
+
+
+class BloomSeenSet:
+    """An approximate set of any strings
+    `in` never misses an added key, but claims about error_rate of the
+    other keys as seen as well. The filter is sized once for capacity
+    keys, more keys raise the false positive rate.
+    Usage:
+
+        seen_posts = BloomSeenSet(capacity=10_000_000, error_rate=0.001)
+    """
+    def __init__(self, capacity=10_000_000, error_rate=0.001):
+        """Init for the BloomSeenSet class
+
+        :param capacity:
+            Expected amount of keys, defaults to 10 million
+        :param error_rate:
+            False positive rate at capacity keys, defaults to 0.001
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bit_count = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.bit_count / capacity * math.log(2)))
+        self.bits = bytearray((self.bit_count + 7) // 8)
+        self.added_keys = 0
+
+    def _bit_positions(self, key):
+        # Double hashing, both hashes are taken from one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return [(first_hash + index * second_hash) % self.bit_count for index in range(self.hash_count)]
+
+    def add(self, key):
+        is_new = False
+        for position in self._bit_positions(key):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                is_new = True
+        self.added_keys += is_new
+
+    def update(self, keys):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for position in self._bit_positions(key):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        """Amount of distinct keys added, keys taken for false positives are not counted"""
+        return self.added_keys
+
+    @property
+    def memory_bytes(self):
+        """Bytes used by the bit array"""
+        return sys.getsizeof(self.bits)
+
+
+SEEN_SET_BACKENDS = {
+    'set': PythonSeenSet,
+    'exact': CompactSeenSet,
+    'bloom': BloomSeenSet,
+}
+
+
+def create_seen_set(backend='set', **options):
+    """Creates a seen set of SEEN_SET_BACKENDS
+
+    :param backend:
+        Name of the backend, defaults to 'set'
+    :param options:
+        Keyword arguments of the backend, e.g. error_rate of 'bloom'
+    :raises KeyError:
+        If the backend does not exist
+    """
+    try:
+        seen_set_class = SEEN_SET_BACKENDS[backend]
+    except KeyError:
+        raise KeyError(f"Unknown dedup backend '{backend}', "
+                       f"choose one of: {', '.join(SEEN_SET_BACKENDS)}")
+    return seen_set_class(**options)
@@ -1,36 +1,69 @@
 import re
 import requests
 
+from helper.metrics.MetricsRegistry import METRICS
+
 
 class GoogleCrawler:
-    def __init__(self):
+    def __init__(self, result_cache=None):
+        """Init for the GoogleCrawler class
+
+        :param result_cache:
+            A GoogleResultCache checked before every search, defaults to None
+        """
+        self.result_cache = result_cache
         self.USER_AGENT = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/61.0.3163.100 Safari/537.36',
             'Content-Type': 'application/json',
         }
         self.google_knows = False
+        # Record and replay adapters are mounted on this session
+        self.session = requests.Session()
 
-    def google_reverse_image_search(self, image_url):
+    def google_reverse_image_search(self, image_url, content_hash=None):
         """Uses googles reverse image search
         Returns main information as a dictionary
 
         :param image_url:
             A URL to the image to be analyzed
+        :param content_hash:
+            The sha256 hex digest of the image, finds cached results
+            of the same image behind another url, defaults to None
         :return: 
             - Google Permalink to the search
             - Guess whats on the picture
             - Link of first result
         :rtype: Dict
         """
-        result = {
-            'google_permalink': None,
-            'guess': None,
-            'first_result': None,
-        }
+        cached_result = self.cached_result(image_url, content_hash)
+        if cached_result is not None:
+            return cached_result
+        return self.search(image_url, content_hash)
+
+    def cached_result(self, image_url, content_hash=None):
+        """The result of a previous search for the same image, without any request
+
+        :return: The cached result or None
+        :rtype: Dict
+        """
+        if self.result_cache is None:
+            return None
+
+        cached_result = self.result_cache.get(image_url, content_hash)
+        if cached_result is not None:
+            METRICS.count('google_cache_hits')
+        return cached_result
+
+    def search(self, image_url, content_hash=None):
+        """Asks google, skipping the cache lookup of google_reverse_image_search
+        The result is still stored in the cache.
+        """
+        result = GoogleCrawler.empty_result()
         if self.google_knows:
             return result
 
-        response = self._request_response(image_url)
+        with METRICS.timer('google_search_seconds', 'Google reverse image searches'):
+            response = self._request_response(image_url)
 
         if self._google_blocked_me(response):
             return result
@@ -38,8 +71,19 @@ class GoogleCrawler:
         result.update(self._extract_permalink_guess(response))
         result.update(self._extract_first_result(response))
 
+        if self.result_cache is not None:
+            self.result_cache.set(image_url, result, content_hash)
         return result
 
+    @staticmethod
+    def empty_result():
+        """The result of a search google did not answer"""
+        return {
+            'google_permalink': None,
+            'guess': None,
+            'first_result': None,
+        }
+
     def _extract_first_result(self, response):
         first_result = self._extract_information(
             r'<div class="r"><a href="(.*?)"',
@@ -62,7 +106,7 @@ class GoogleCrawler:
 
     def _request_response(self, url):
         google_url = f'https://images.google.com/searchbyimage?image_url={url}'
-        return requests.get(google_url, headers=self.USER_AGENT)
+        return self.session.get(google_url, headers=self.USER_AGENT)
 
     def _extract_information(self, regex, text, split_by=None, group_at=1):
         try:
@@ -76,4 +120,6 @@ class GoogleCrawler:
                 print("Google found out you're a bot!\nAuthorize here:\t")
                 print(response.url)
                 self.google_knows = True
+            return True
+        return False
         
\ No newline at end of file
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Persistent cache for google reverse image searches
+The same picture shows up again and again (crossposts, reposts, repeated
+top windows), so results are stored by their normalized image url and,
+if known, by the hash of the image content.
+"""
+import json
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.io.DiskCache import DiskCache
+
+# Hosts, which add a per-request signature or resizing options to the url
+QUERY_FREE_HOSTS = ('i.redd.it', 'preview.redd.it', 'external-preview.redd.it', 'i.imgur.com')
+
+
+def normalize_image_url(image_url):
+    """Normalizes an image url, so different links to the same image match
+
+    - reddit's '&amp;' escaping is removed
+    - scheme and host are lower case, http becomes https
+    - fragments, tracking (utm_*) and signature parameters are removed
+    - the remaining query parameters are sorted
+
+    :param image_url:
+        Any url to an image
+    :rtype: str
+    """
+    url = urlsplit(image_url.strip().replace('&amp;', '&'))
+    host = url.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    query = ''
+    if host not in QUERY_FREE_HOSTS:
+        query = urlencode(sorted(
+            (key, value) for key, value in parse_qsl(url.query, keep_blank_values=True)
+            if not key.startswith('utm_')
+        ))
+
+    return urlunsplit(('https', host, url.path.rstrip('/'), query, ''))
+
+
+class GoogleResultCache:
+    """Caches GoogleCrawler results by image url and content hash
+    Usage:
+
+        google_result_cache = GoogleResultCache('google_cache.db')
+        google_crawler = GoogleCrawler(result_cache=google_result_cache)
+    """
+    def __init__(self, cache_path, max_bytes=64 * 1024 ** 2, ttl=30 * 24 * 60 * 60):
+        """Init for the GoogleResultCache class
+
+        :param cache_path:
+            The path and name of the cache file
+        :param max_bytes:
+            Maximum size of all cached results, defaults to 64 MiB
+        :param ttl:
+            Seconds a result stays valid, defaults to 30 days
+        """
+        self.disk_cache = DiskCache(cache_path, max_bytes)
+        self.ttl = ttl
+
+    @staticmethod
+    def _keys(image_url, content_hash=None):
+        keys = ['url:' + normalize_image_url(image_url)]
+        if content_hash:
+            keys.append('sha256:' + content_hash)
+        return keys
+
+    def get(self, image_url, content_hash=None):
+        """Looks up a previous search for the same image
+
+        :param image_url:
+            A URL to the image
+        :param content_hash:
+            The sha256 hex digest of the image content, defaults to None
+        :return:
+            The result of GoogleCrawler.google_reverse_image_search or None
+        :rtype: Dict
+        """
+        for key in self._keys(image_url, content_hash):
+            cache_entry = self.disk_cache.get(key)
+            if cache_entry is not None:
+                return json.loads(cache_entry.value)
+        return None
+
+    def set(self, image_url, result, content_hash=None):
+        """Stores the result of a search
+
+        :param image_url:
+            A URL to the image
+        :param result:
+            The result of GoogleCrawler.google_reverse_image_search
+        :param content_hash:
+            The sha256 hex digest of the image content, defaults to None
+        """
+        value = json.dumps(result).encode()
+        for key in self._keys(image_url, content_hash):
+            self.disk_cache.set(key, value, self.ttl)
+
+    @property
+    def stats(self):
+        """Hits, misses and evictions of the cache
+
+        :rtype: Dict
+        """
+        return dict(self.disk_cache.stats)
+
+    def close(self):
+        """Closes the cache file"""
+        self.disk_cache.close()
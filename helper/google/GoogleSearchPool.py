@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Runs google reverse image searches in the background
+Lookups are queued by the RedditDBFormatter and processed by a few worker
+threads, which share a token bucket, so google is never asked more often
+than the configured rate. Cached results are returned without a token. Finished lookups are collected and handed back
+as image_processing rows.
+"""
+import queue
+import threading
+
+from helper.ratelimit.TokenBucket import TokenBucket
+
+
+class GoogleSearchPool:
+    """A bounded, rate-limited worker pool for GoogleCrawler lookups
+    Usage:
+
+        google_search_pool = GoogleSearchPool(GoogleCrawler(), workers=2, rate=1)
+        google_search_pool.submit(post_id, title, image_url)
+        for post_id, title, google_process in google_search_pool.completed():
+            ...
+        google_search_pool.close()
+    """
+    def __init__(self, google_crawler, workers=2, rate=1.0, queue_size=1000):
+        """Init for the GoogleSearchPool class
+
+        :param google_crawler:
+            The GoogleCrawler used for the lookups
+        :param workers:
+            Amount of worker threads, defaults to 2
+        :param rate:
+            Maximum lookups per second for all workers together, defaults to 1.0
+        :param queue_size:
+            Maximum amount of waiting lookups, defaults to 1000
+        """
+        self.google_crawler = google_crawler
+        self.token_bucket = TokenBucket(rate)
+        self.lookups = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+        }
+
+        self.workers = [
+            threading.Thread(target=self._work, name=f'google-search-{index}', daemon=True)
+            for index in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, post_id, title, image_url):
+        """Queues a lookup, a full queue blocks until a worker takes the next one
+        Lookups are never dropped, the caller is slowed down to the rate of the workers instead.
+        """
+        self.lookups.put((post_id, title, image_url))
+        self.stats['submitted'] += 1
+
+    def completed(self):
+        """Yields all finished lookups without blocking
+
+        :return: Generator of (post_id, title, google_process) tuples
+        """
+        while True:
+            try:
+                yield self.results.get_nowait()
+            except queue.Empty:
+                return
+
+    def wait(self):
+        """Blocks until all queued lookups are finished"""
+        self.lookups.join()
+
+    @property
+    def queue_depth(self):
+        """Amount of lookups waiting for a worker"""
+        return self.lookups.qsize()
+
+    def close(self):
+        """Finishes all queued lookups and stops the workers"""
+        for _ in self.workers:
+            self.lookups.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def _work(self):
+        while True:
+            lookup = self.lookups.get()
+            try:
+                if lookup is None:
+                    return
+
+                post_id, title, image_url = lookup
+                try:
+                    google_process = self.google_crawler.cached_result(image_url)
+                    if google_process is None:
+                        # Only requests to google need a token, cache hits are free
+                        self.token_bucket.acquire()
+                        google_process = self.google_crawler.search(image_url)
+                except Exception as error:  # a single broken lookup must not stop the worker
+                    print(f"Google reverse image search failed for {image_url}: {error}")
+                    google_process = self.google_crawler.empty_result()
+
+                self.results.put((post_id, title, google_process))
+                with self.stats_lock:
+                    self.stats['completed'] += 1
+            finally:
+                self.lookups.task_done()
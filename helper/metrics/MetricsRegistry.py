@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Collects timings, counters and queue depths of the pipeline
+Every stage reports to the module wide METRICS registry:
+
+    - histograms: latencies of a stage in seconds
+    - counters: bytes, rows, requests, ... which only grow
+    - gauges: values read when exported, e.g. queue depths
+
+The registry is exported as JSON or in the Prometheus text format, so it
+can be compared between runs or scraped.
+"""
+import bisect
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from 0.1 ms up to 1 minute
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class Histogram:
+    """Counts observations per bucket, like a Prometheus histogram"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, share):
+        """Upper bound of the bucket holding the share of all observations"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(share * self.count)
+        seen = 0
+        for upper_bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(upper_bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'max': self.max,
+        }
+
+
+class MetricsRegistry:
+    """A thread-safe collection of named metrics
+    Usage:
+
+        with METRICS.timer('db_flush_seconds'):
+            ...
+        METRICS.count('reddit_response_bytes', len(response.content))
+        METRICS.gauge('google_queue_depth', lambda: google_search_pool.queue_depth)
+        print(METRICS.to_prometheus())
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.descriptions = {}
+
+    def observe(self, name, value, description=None):
+        """Adds an observation to the histogram name"""
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+                self._describe(name, description)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, description=None):
+        """Observes the seconds the with block takes"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, description)
+
+    def count(self, name, amount=1, description=None):
+        """Adds amount to the counter name"""
+        with self.lock:
+            if name not in self.counters:
+                self.counters[name] = 0
+                self._describe(name, description)
+            self.counters[name] += amount
+
+    def gauge(self, name, read, description=None):
+        """Registers a gauge, read is called on every export
+
+        :param read: A callable returning the current value
+        """
+        with self.lock:
+            self.gauges[name] = read
+            self._describe(name, description)
+
+    def _describe(self, name, description):
+        if description:
+            self.descriptions[name] = description
+
+    def reset(self):
+        """Removes all metrics"""
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.descriptions.clear()
+
+    def to_dict(self):
+        """All metrics with histograms summarized
+
+        :rtype: Dict
+        """
+        with self.lock:
+            return {
+                'histograms': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                'counters': dict(self.counters),
+                'gauges': {name: read() for name, read in self.gauges.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, sort_keys=True)
+
+    def to_prometheus(self, prefix='reddit_imagetool_'):
+        """All metrics in the Prometheus text exposition format
+
+        :rtype: str
+        """
+        lines = []
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric = prefix + name
+                self._prometheus_header(lines, name, metric, 'histogram')
+                cumulative = 0
+                for upper_bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{upper_bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum {histogram.sum}')
+                lines.append(f'{metric}_count {histogram.count}')
+
+            for name, value in sorted(self.counters.items()):
+                self._prometheus_header(lines, name, prefix + name + '_total', 'counter')
+                lines.append(f'{prefix}{name}_total {value}')
+
+            for name, read in sorted(self.gauges.items()):
+                self._prometheus_header(lines, name, prefix + name, 'gauge')
+                lines.append(f'{prefix}{name} {read()}')
+        return '\n'.join(lines) + '\n'
+
+    def _prometheus_header(self, lines, name, metric, metric_type):
+        if name in self.descriptions:
+            lines.append(f'# HELP {metric} {self.descriptions[name]}')
+        lines.append(f'# TYPE {metric} {metric_type}')
+
+    def summary(self):
+        """A human readable table of all metrics, slowest stage first
+
+        :rtype: str
+        """
+        metrics = self.to_dict()
+        lines = [f"{'stage':<32} {'count':>9} {'total s':>9} {'mean ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, histogram in sorted(metrics['histograms'].items(), key=lambda item: -item[1]['sum']):
+            lines.append(
+                f"{name:<32} {histogram['count']:>9} {histogram['sum']:>9.2f} {histogram['mean'] * 1000:>9.2f} "
+                f"{histogram['p99'] * 1000:>9.2f} {histogram['max'] * 1000:>9.2f}"
+            )
+        for name, value in sorted(metrics['counters'].items()):
+            lines.append(f"{name:<32} {value:>9}")
+        for name, value in sorted(metrics['gauges'].items()):
+            lines.append(f"{name:<32} {value:>9}")
+        return '\n'.join(lines)
+
+
+METRICS = MetricsRegistry()
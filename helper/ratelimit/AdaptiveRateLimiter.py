@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""Paces requests by the budget the server announces
+Reddit answers every request with its rate limit window:
+
+    X-Ratelimit-Remaining: requests left within the current window
+    X-Ratelimit-Reset: seconds until the window starts over
+
+The remaining requests are spread evenly over the rest of the window, so
+the whole budget is used without running into 429s. A 429 or 5xx pauses
+all requests for Retry-After seconds or, without it, for a jittered,
+exponentially growing backoff.
+"""
+import collections
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class AdaptiveRateLimiter:
+    """A thread-safe rate limiter shared by all requests to one host
+    Usage:
+
+        rate_limiter = AdaptiveRateLimiter()
+        rate_limiter.acquire()  # blocks until the next request may be sent
+        response = session.get(url)
+        rate_limiter.update(response)
+        rate_limiter.effective_rate
+    """
+    def __init__(self, max_rate=None, budget_share=1.0, backoff_factor=0.5, max_backoff=60.0, window=60.0,
+                 clock=time.monotonic, sleep=time.sleep, seed=None):
+        """Init for the AdaptiveRateLimiter class
+
+        :param max_rate:
+            Requests per second never exceeded, defaults to None
+            (only the announced budget is followed)
+        :param budget_share:
+            Share of the announced budget used by this limiter, defaults to 1.0
+            Processes with their own limiters split the budget of one client
+        :param backoff_factor:
+            The first backoff without Retry-After in seconds, doubled on every
+            further failure, defaults to 0.5
+        :param max_backoff:
+            Longest backoff in seconds, defaults to 60
+        :param window:
+            Seconds the effective rate is measured over, defaults to 60
+        :param clock:
+            Monotonic clock in seconds, defaults to time.monotonic
+        :param sleep:
+            Sleeps the given seconds, defaults to time.sleep
+        :param seed:
+            Seed of the backoff jitter, defaults to None
+        :raises ValueError: If max_rate is given, but not above 0
+        """
+        if max_rate is not None and max_rate <= 0:
+            raise ValueError(f"The maximum rate has to be above 0, got {max_rate}")
+
+        self.max_rate = max_rate
+        self.budget_share = budget_share
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.window = window
+        self.clock = clock
+        self.sleep = sleep
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        self.remaining = None
+        self.reset_at = None
+        self.next_request = 0.0
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.failures = 0
+        self.throttled = 0
+        self.sent = collections.deque()
+
+    def acquire(self):
+        """Blocks until the next request may be sent"""
+        while True:
+            with self.lock:
+                now = self.clock()
+                wait = self._wait(now)
+                if wait <= 0:
+                    self.in_flight += 1
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    self.next_request = now + self._interval(now)
+                    self.sent.append(now)
+                    self._forget_sent(now)
+                    return
+            self.sleep(wait)
+
+    def release(self):
+        """Gives up an acquired request, which was never answered"""
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def update(self, response):
+        """Reads the rate limit headers and status of a response
+
+        :param response: The requests.Response of an acquired request
+        :return: Seconds all requests are paused for, 0 if the response was ok
+        :rtype: float
+        """
+        with self.lock:
+            now = self.clock()
+            self.in_flight = max(0, self.in_flight - 1)
+            self._read_budget(response.headers, now)
+
+            if response.status_code not in RETRY_STATUSES:
+                self.failures = 0
+                return 0.0
+
+            self.failures += 1
+            self.throttled += 1
+            retry_after = self._retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                # Up to 10 % on top, so waiting clients do not return at once
+                delay = retry_after * (1 + 0.1 * self.random.random())
+            else:
+                backoff = min(self.max_backoff, self.backoff_factor * 2 ** (self.failures - 1))
+                delay = backoff / 2 + self.random.uniform(0, backoff / 2)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            return delay
+
+    def _read_budget(self, headers, now):
+        try:
+            remaining = float(headers['X-Ratelimit-Remaining'])
+            reset = float(headers['X-Ratelimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        # Requests still in flight were sent before this answer was counted
+        self.remaining = remaining - self.in_flight
+        self.reset_at = now + reset
+
+    @staticmethod
+    def _retry_after(value):
+        """Seconds of a Retry-After header, given in seconds or as an HTTP date"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _wait(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            # A new window, its budget is known after the next response
+            self.remaining = None
+            self.reset_at = None
+
+        wait = max(self.blocked_until, self.next_request) - now
+        if self.remaining is not None and self.remaining * self.budget_share < 1:
+            wait = max(wait, self.reset_at - now)
+        return wait
+
+    def _interval(self, now):
+        """Seconds until the next request, spreading the budget over the window"""
+        interval = 1 / self.max_rate if self.max_rate else 0.0
+        if self.remaining is not None:
+            interval = max(interval, (self.reset_at - now) / max(self.remaining * self.budget_share, 1))
+        return interval
+
+    def _forget_sent(self, now):
+        while self.sent and self.sent[0] < now - self.window:
+            self.sent.popleft()
+
+    @property
+    def effective_rate(self):
+        """Requests per second sent within the last window
+
+        :rtype: float
+        """
+        with self.lock:
+            now = self.clock()
+            self._forget_sent(now)
+            if not self.sent:
+                return 0.0
+            return len(self.sent) / max(now - self.sent[0], 1.0)
+
+    @property
+    def stats(self):
+        """The announced budget, throttled responses and the effective rate
+
+        :rtype: Dict
+        """
+        effective_rate = self.effective_rate
+        with self.lock:
+            now = self.clock()
+            return {
+                'remaining': self.remaining,
+                'reset_in': max(0.0, self.reset_at - now) if self.reset_at is not None else None,
+                'throttled': self.throttled,
+                'requests_per_minute': effective_rate * 60,
+            }
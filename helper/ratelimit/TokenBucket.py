@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+
+class TokenBucket:
+    """A thread-safe token bucket rate limiter
+    The bucket refills with `rate` tokens per second, up to `capacity` tokens.
+    Usage:
+
+        token_bucket = TokenBucket(rate=2, capacity=1)
+        token_bucket.acquire()  # blocks until a token is available
+    """
+    def __init__(self, rate, capacity=1):
+        """Init for the TokenBucket class
+
+        :param rate:
+            Tokens added per second
+        :type rate: float
+        :param capacity:
+            Maximum amount of tokens, which can be used in a burst, defaults to 1
+        :raises ValueError: If rate is not above 0, the bucket would never refill
+        """
+        if rate <= 0:
+            raise ValueError(f"A token bucket needs a rate above 0, got {rate}")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Takes tokens out of the bucket, waits until enough are available
+
+        :param tokens:
+            Amount of tokens to take, defaults to 1
+        """
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, tokens=1):
+        """Takes tokens out of the bucket, if enough are available
+
+        :param tokens:
+            Amount of tokens to take, defaults to 1
+        :return: True, if the tokens were taken
+        :rtype: bool
+        """
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""Records HTTP responses once and replays them without a network
+A cassette is a directory holding one response per request url:
+
+    <sha1 of the url>.json: method, url, status code, reason and headers
+    <sha1 of the url>.body: the decoded response body
+
+The adapters are mounted on the requests session of RedditHttpHandler
+and GoogleCrawler. ReplayServer serves a cassette through a local HTTP
+server instead, e.g. as base_url of RedditHttpHandler.
+"""
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# The body is stored decoded and may be served in a single piece
+DROPPED_HEADERS = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding', 'Connection')
+
+
+class HttpCassette:
+    """Stores responses in a directory, keyed by method and url
+    Usage:
+
+        http_cassette = HttpCassette('cassettes/earthporn')
+        http_cassette.save(response)
+        http_cassette.load('GET', url)
+    """
+    def __init__(self, directory):
+        """Init for the HttpCassette class
+
+        :param directory:
+            The directory of the cassette, it is created if needed
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(method, url):
+        return hashlib.sha1(f'{method} {url}'.encode()).hexdigest()
+
+    def save(self, response):
+        """Stores a response of requests, replacing an older one of the same url
+
+        :param response: A requests.Response
+        """
+        request = response.request
+        key = self.key(request.method, request.url)
+        meta = {
+            'method': request.method,
+            'url': request.url,
+            'status_code': response.status_code,
+            'reason': response.reason,
+            'headers': {
+                name: value for name, value in response.headers.items() if name not in DROPPED_HEADERS
+            },
+        }
+        # The body is written first, a meta file always has its body
+        with open(self._path(key, 'body'), 'wb') as body_file:
+            body_file.write(response.content)
+        with open(self._path(key, 'json'), 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+    def load(self, method, url):
+        """Rebuilds a recorded response
+
+        :return: A requests.Response or None, if the url was not recorded
+        """
+        key = self.key(method, url)
+        try:
+            with open(self._path(key, 'json')) as meta_file:
+                meta = json.load(meta_file)
+            with open(self._path(key, 'body'), 'rb') as body_file:
+                content = body_file.read()
+        except FileNotFoundError:
+            return None
+
+        response = requests.Response()
+        response.status_code = meta['status_code']
+        response.reason = meta['reason']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = url
+        response._content = content
+        return response
+
+    def __iter__(self):
+        """Yields the meta data of every recorded response"""
+        for file_name in sorted(os.listdir(self.directory)):
+            if file_name.endswith('.json'):
+                with open(os.path.join(self.directory, file_name)) as meta_file:
+                    yield json.load(meta_file)
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Sends requests like the HTTPAdapter it replaces and records every response"""
+    def __init__(self, http_cassette, **kwargs):
+        """Init for the RecordingAdapter class
+
+        :param http_cassette: The HttpCassette the responses are stored in
+        :param kwargs: Keyword arguments of HTTPAdapter, e.g. max_retries
+        """
+        self.http_cassette = http_cassette
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        # Only complete responses are replayable, 304s depend on the cache of this run
+        if response.status_code != 304:
+            self.http_cassette.save(response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers requests out of a cassette, the network is never used
+    Requests which were not recorded are answered with a 404.
+    """
+    def __init__(self, http_cassette):
+        """Init for the ReplayAdapter class
+
+        :param http_cassette: The HttpCassette the responses are read from
+        """
+        super().__init__()
+        self.http_cassette = http_cassette
+        self.misses = 0
+
+    def send(self, request, **kwargs):
+        response = self.http_cassette.load(request.method, request.url)
+        if response is None:
+            self.misses += 1
+            response = requests.Response()
+            response.status_code = 404
+            response.reason = 'Not Recorded'
+            response.url = request.url
+            response._content = b''
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def mount_adapter(adapter, *sessions):
+    """Routes all http and https requests of the sessions through adapter
+
+    :param adapter: A requests adapter, e.g. RecordingAdapter or ReplayAdapter
+    :param sessions: requests.Session objects
+    """
+    for session in sessions:
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+
+
+def mount_cassette(reddit, record_dir=None, replay_dir=None):
+    """Records or replays the reddit and google requests of a RedditChecker
+
+    :param reddit: The RedditChecker
+    :param record_dir: The cassette directory to record to, defaults to None
+    :param replay_dir: The cassette directory to replay from, defaults to None
+    :return: The mounted adapter or None
+    """
+    sessions = (reddit.reddit_http_handler.session, reddit.reddit_db_formatter.google_crawler.session)
+    if replay_dir:
+        adapter = ReplayAdapter(HttpCassette(replay_dir))
+    elif record_dir:
+        http_adapter = reddit.reddit_http_handler.http_adapter
+        adapter = RecordingAdapter(
+            HttpCassette(record_dir),
+            max_retries=http_adapter.max_retries,
+            pool_maxsize=http_adapter._pool_maxsize,
+            pool_block=True,
+        )
+        # Keeps connection_stats counting the recorded requests
+        reddit.reddit_http_handler.http_adapter = adapter
+    else:
+        return None
+    mount_adapter(adapter, *sessions)
+    return adapter
+
+
+class ReplayServer:
+    """Serves a cassette through a local HTTP server
+    Responses are found by path and query, the recorded host is ignored.
+    Usage:
+
+        with ReplayServer(HttpCassette('cassettes/earthporn')) as replay_server:
+            RedditHttpHandler(base_url=replay_server.base_url)
+    """
+    def __init__(self, http_cassette, host='127.0.0.1', port=0):
+        """Init for the ReplayServer class
+
+        :param http_cassette: The HttpCassette to serve
+        :param host: The address to listen on, defaults to '127.0.0.1'
+        :param port: The port to listen on, defaults to 0 (any free port)
+        """
+        self.http_cassette = http_cassette
+        self.routes = {}
+        for meta in http_cassette:
+            url = urlsplit(meta['url'])
+            self.routes[(meta['method'], url.path + ('?' + url.query if url.query else ''))] = meta['url']
+
+        replay_server = self
+
+        class _ReplayHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                replay_server._answer(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _answer(self, request_handler):
+        url = self.routes.get((request_handler.command, request_handler.path))
+        response = self.http_cassette.load(request_handler.command, url) if url else None
+        if response is None:
+            request_handler.send_response(404)
+            request_handler.send_header('Content-Length', '0')
+            request_handler.end_headers()
+            return
+
+        request_handler.send_response(response.status_code, response.reason)
+        for name, value in response.headers.items():
+            request_handler.send_header(name, value)
+        request_handler.send_header('Content-Length', str(len(response.content)))
+        request_handler.end_headers()
+        request_handler.wfile.write(response.content)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""Generates reddit listings and google result pages without a network
+The pages are built on request out of the url alone, so any amount of
+subreddits and pages is served without keeping them in memory:
+
+    - every subreddit has `pages` pages of `posts` posts
+    - post ids are unique base36 numbers, the listing cursor 'after' is
+      the fullname of the last post like reddit's
+    - posts are sorted by created_utc, newest first
+
+A seed makes all pages reproducible between benchmark runs.
+"""
+import json
+import random
+import zlib
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+
+# Post numbers of a single subreddit, 2 ** 24 posts per subreddit at most
+POSTS_PER_SUBREDDIT_BITS = 24
+NEWEST_CREATED_UTC = 1577836800.0
+
+
+def post_number(subreddit, index):
+    """Unique number of the index-th post of a subreddit"""
+    return (zlib.crc32(subreddit.lower().encode()) << POSTS_PER_SUBREDDIT_BITS) + index
+
+
+def base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    encoded = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return encoded
+
+
+def synthetic_listing(page, posts=100, seed=0, subreddit='EarthPorn', pages=None):
+    """A listing page with previews, awards and media like reddit's
+
+    :param page: The page number, starting at 0
+    :param posts: Posts per page, defaults to 100
+    :param seed: Seed of all random values, defaults to 0
+    :param subreddit: The name of the subreddit, defaults to 'EarthPorn'
+    :param pages: Pages of the subreddit, the last one has no 'after', defaults to None (endless)
+    :return: The listing as JSON
+    :rtype: bytes
+    """
+    rng = random.Random(f'{seed}/{subreddit}/{page}')
+
+    def image(width):
+        return {'url': f'https://preview.redd.it/{rng.getrandbits(64):x}.jpg?width={width}&s={rng.getrandbits(128):x}',
+                'width': width, 'height': width * 3 // 4}
+
+    children = []
+    for index in range(page * posts, (page + 1) * posts):
+        post_id = base36(post_number(subreddit, index))
+        children.append({'kind': 't3', 'data': {
+            'id': post_id,
+            'name': f't3_{post_id}',
+            'title': ' '.join(rng.choice(('sunset', 'over', 'the', 'mountains', 'oc', '4000x3000')) for _ in range(8)),
+            'subreddit_id': f't5_{zlib.crc32(subreddit.encode()):x}',
+            'subreddit': subreddit,
+            'subreddit_name_prefixed': f'r/{subreddit}',
+            'subreddit_subscribers': 19000000,
+            'author': f'user_{rng.getrandbits(24):x}',
+            'ups': rng.randint(0, 50000),
+            'downs': 0,
+            'score': rng.randint(0, 50000),
+            'upvote_ratio': rng.random(),
+            'gildings': {'gid_1': rng.randint(0, 3)} if rng.random() < 0.2 else {},
+            'num_comments': rng.randint(0, 2000),
+            'domain': 'i.redd.it',
+            'url': f'https://i.redd.it/{post_id}.jpg',
+            'permalink': f'/r/{subreddit}/comments/{post_id}/sunset/',
+            'created_utc': NEWEST_CREATED_UTC - index,
+            'post_hint': 'image',
+            'selftext': '',
+            'link_flair_richtext': [{'e': 'text', 't': 'OC'}],
+            'all_awardings': [
+                {'id': f'award_{award}', 'name': 'Silver', 'description': 'Shows the award.' * 4,
+                 'icon_url': f'https://www.redditstatic.com/gold/awards/icon/{award}.png',
+                 'resized_icons': [image(size) for size in (16, 32, 48, 64, 128)]}
+                for award in range(rng.randint(0, 4))
+            ],
+            'preview': {'images': [{
+                'source': image(4000),
+                'resolutions': [image(width) for width in (108, 216, 320, 640, 960, 1080)],
+                'variants': {},
+                'id': f'{rng.getrandbits(128):x}',
+            }], 'enabled': True},
+            'media_embed': {},
+            'secure_media': None,
+            'thumbnail': f'https://b.thumbs.redditmedia.com/{rng.getrandbits(128):x}.jpg',
+        }})
+
+    after = children[-1]['data']['name'] if pages is None or page + 1 < pages else None
+    return json.dumps({'kind': 'Listing', 'data': {
+        'after': after, 'dist': posts, 'children': children, 'before': None,
+    }}).encode()
+
+
+def synthetic_google_page(image_url):
+    """A reverse image search page GoogleCrawler finds a guess and a first result in
+
+    :rtype: bytes
+    """
+    guess = image_url.rsplit('/', 1)[-1].split('.')[0]
+    return (
+        '<html><body>'
+        f'<a class="fKDtNb" href="https://www.google.com/search?q={guess}" '
+        f'style="font-style:italic">{guess} landscape</a>'
+        f'<div class="r"><a href="https://example.com/{guess}">{guess}</a></div>'
+        '</body></html>'
+    ).encode()
+
+
+class SyntheticAdapter(BaseAdapter):
+    """Answers reddit listing and google search requests with synthetic pages
+    Usage:
+
+        synthetic_adapter = SyntheticAdapter(pages=10, posts=100)
+        mount_adapter(synthetic_adapter, reddit_http_handler.session, google_crawler.session)
+    """
+    def __init__(self, pages=10, posts=100, seed=0, missing_subreddits=()):
+        """Init for the SyntheticAdapter class
+
+        :param pages: Pages of every subreddit, defaults to 10
+        :param posts:
+            Posts per page, defaults to 100
+            Requests asking for fewer posts with 'limit' get fewer
+        :param seed: Seed of all random values, defaults to 0
+        :param missing_subreddits: Subreddits answered with a 404, defaults to ()
+        """
+        super().__init__()
+        self.pages = pages
+        self.posts = posts
+        self.seed = seed
+        self.missing_subreddits = {subreddit.lower() for subreddit in missing_subreddits}
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        query = parse_qs(url.query)
+        if url.path.startswith('/searchbyimage'):
+            return self._response(request, 200, synthetic_google_page(query['image_url'][0]), 'text/html')
+
+        # /r/<subreddit>/<sort>/.json
+        subreddit = url.path.split('/')[2]
+        if subreddit.lower() in self.missing_subreddits:
+            return self._response(request, 404, b'{}')
+
+        posts = min(int(query.get('limit', [self.posts])[0]), self.posts)
+        page = 0
+        if 'after' in query:
+            index = int(query['after'][0].rpartition('_')[2], 36) & ((1 << POSTS_PER_SUBREDDIT_BITS) - 1)
+            page = (index + 1) // posts
+        if page >= self.pages:
+            return self._response(request, 200, json.dumps({'kind': 'Listing', 'data': {
+                'after': None, 'dist': 0, 'children': [], 'before': None,
+            }}).encode())
+
+        content = synthetic_listing(page, posts, self.seed, subreddit, self.pages)
+        return self._response(request, 200, content)
+
+    @staticmethod
+    def _response(request, status_code, content, content_type='application/json'):
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers['Content-Type'] = content_type
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response._content = content
+        return response
+
+    def close(self):
+        pass
@@ -1,28 +1,276 @@
 # -*- coding: utf-8 -*-
+import cProfile
+import os
+import sys
+
 from cmd_line_args import arg_parse_info
+from core.db.DBHandler import DBHandler
 from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.RedditDownloader import RedditDownloader
+from core.reddit.api.RedditScheduler import RedditScheduler
+from core.reddit.api.RedditShardedCrawler import RedditShardedCrawler
 from core.io.FileReader import FileReader
-from core.db.reddit import RedditDBHelper
+from core.db.reddit import ExportDBHelper, ImageSuccessSeriesDBHelper, RedditDBHelper
+from core.db.reddit.RedditDBFormatter import TABLE_ORDER
+from core.reddit.api.requests.RedditResponseCache import RedditResponseCache
+from helper.google.GoogleResultCache import GoogleResultCache
+from helper.metrics.MetricsRegistry import METRICS
+from helper.ratelimit.AdaptiveRateLimiter import AdaptiveRateLimiter
+from helper.replay.HttpCassette import mount_cassette
 
 
 def reddit_deeplearn_imagetool(ARGS):
 
+    if ARGS.export_dir and ARGS.database_type != 'sqlite3':
+        # The images view is exported in the order of SQLite3's rowid
+        print("--export_dir needs a sqlite3 database")
+        sys.exit()
+
+    profiler = None
+    if ARGS.profile_output:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    db_handler = DBHandler(
+        ARGS.database_path,
+        ARGS.database_type,
+        flush_rows=ARGS.batch_size,
+        db_profile=ARGS.database_profile,
+        pool_size=ARGS.database_pool,
+        table_order=TABLE_ORDER,
+    )
+    METRICS.gauge('db_buffered_rows', lambda: db_handler.buffered_rows, 'Rows waiting for the next flush')
+
+    if ARGS.create_database:
+        sql_create_commands = FileReader.read_file(ARGS.database_schema or db_handler.backend.schema_path)
+        db_handler.create_db
+        db_handler.init_database(sql_create_commands)
+
+    if ARGS.processes > 1 and not ARGS.daemon:
+        crawl_sharded(ARGS)
+    else:
+        crawl(ARGS, db_handler)
+
+    if ARGS.timeseries:
+        deleted_rows = ImageSuccessSeriesDBHelper.rollup_image_success_series(db_handler)
+        print(f"image_success_series: {deleted_rows} rows rolled up")
+
+    if ARGS.download_dir:
+        reddit_downloader = RedditDownloader(ARGS.download_dir, max_workers=ARGS.download_workers)
+        RedditDBHelper.download_reddit_images(db_handler, reddit_downloader)
+        reddit_downloader.close()
+
+        throughput = reddit_downloader.throughput
+        print(f"Downloaded {reddit_downloader.stats['images']} images "
+              f"({reddit_downloader.stats['duplicates']} duplicates, {reddit_downloader.stats['failed']} failed) - "
+              f"{throughput['images_per_second']:.1f} images/sec, "
+              f"{throughput['bytes_per_second'] / 1024 ** 2:.2f} MiB/sec")
+
+    if ARGS.hash_images:
+        # numpy and Pillow are only needed to hash images
+        from core.db.reddit import ImageHashDBHelper
+        ImageHashDBHelper.hash_downloaded_images(db_handler)
+
+    if ARGS.embedding_dir:
+        # numpy and Pillow are only needed to embed images
+        from core.db.reddit import EmbeddingDBHelper
+        from core.image.ImageEmbedder import ImageEmbedder
+        image_embedder = ImageEmbedder(ARGS.embedding_kind)
+        embedding_store = EmbeddingDBHelper.open_embedding_store(ARGS.embedding_dir, image_embedder)
+        embedded = EmbeddingDBHelper.embed_downloaded_images(db_handler, embedding_store, image_embedder)
+        print(f"Embedded {embedded} images into {ARGS.embedding_dir} - {len(embedding_store)} vectors")
+
+        if ARGS.vector_index or ARGS.similar_to:
+            search_similar_images(ARGS, db_handler, embedding_store)
+
+    if ARGS.export_dir:
+        db_handler.flush()
+        export_stats = ExportDBHelper.export_view(
+            db_handler, ARGS.export_view, ARGS.export_dir, ARGS.export_format, ARGS.export_partition.split(),
+        )
+        print(f"Exported {export_stats['rows']} rows of {ARGS.export_view} in {export_stats['parts']} parts "
+              f"to {ARGS.export_dir} - watermark {export_stats['watermark']}")
+
+    print_bulk_insert_stats(db_handler.bulk_insert_stats)
+
+    if profiler is not None:
+        profiler.disable()
+    if ARGS.profile or profiler is not None:
+        write_profile(ARGS, profiler)
+
+
+def search_similar_images(ARGS, db_handler, embedding_store):
+    from core.db.reddit import EmbeddingDBHelper
+
+    index_kind = ARGS.vector_index or 'brute_force'
+    index_dir = os.path.join(ARGS.embedding_dir, index_kind)
+    vector_index = EmbeddingDBHelper.open_vector_index(index_dir, embedding_store, index_kind)
+    added = EmbeddingDBHelper.update_vector_index(embedding_store, vector_index)
+    if ARGS.vector_index and added:
+        vector_index.save(index_dir)
+        print(f"Added {added} vectors to the {index_kind} index in {index_dir}")
+
+    if ARGS.similar_to:
+        print(f"Images similar to {ARGS.similar_to}:")
+        for post in EmbeddingDBHelper.similar_images(db_handler, embedding_store, vector_index, ARGS.similar_to):
+            print(f"{post['distance']:.4f} {post['image_id']} r/{post['subreddit']} ups: {post['ups']} "
+                  f"comments: {post['num_comments']} {post['permalink']}")
+
+
+def write_profile(ARGS, profiler):
+    """Prints the metrics summary and writes the profile files
+
+    With ARGS.profile_output set, these files are written:
+        <profile_output>.prof: cProfile stats, e.g. for snakeviz or pstats
+        <profile_output>.json: all metrics as JSON
+        <profile_output>.prom: all metrics in the Prometheus text format
+    """
+    print(METRICS.summary())
+    if profiler is None:
+        return
+
+    profiler.dump_stats(ARGS.profile_output + '.prof')
+    with open(ARGS.profile_output + '.json', 'w') as metrics_file:
+        metrics_file.write(METRICS.to_json())
+    with open(ARGS.profile_output + '.prom', 'w') as metrics_file:
+        metrics_file.write(METRICS.to_prometheus())
+    print(f"Profile written to {ARGS.profile_output}.prof, .json and .prom")
+
+
+def crawl(ARGS, db_handler):
+    """Fetches, formats and inserts all subreddits within this process
+    As a daemon, the subreddits are crawled again and again until Ctrl+C.
+    """
+    response_cache = None
+    if ARGS.cache_path:
+        response_cache = RedditResponseCache(ARGS.cache_path, ARGS.cache_size * 1024 ** 2)
+
+    google_result_cache = None
+    if ARGS.google_cache_path:
+        google_result_cache = GoogleResultCache(ARGS.google_cache_path)
+
     reddit = RedditChecker(
         ARGS.subreddits,
-        db_file_path=ARGS.database_path,
-        db_type=ARGS.database_type
+        db_file_path=None,
+        max_workers=ARGS.workers,
+        max_pages=ARGS.pages,
+        response_cache=response_cache,
+        google_workers=ARGS.google_workers,
+        google_rate=ARGS.google_rate,
+        google_result_cache=google_result_cache,
+        incremental=ARGS.incremental,
+        seen_set_backend=ARGS.dedup_backend,
+        seen_set_options=seen_set_options(ARGS),
+        json_backend=ARGS.json_backend,
+        timeseries=ARGS.timeseries,
+        rate_limiter=AdaptiveRateLimiter(max_rate=ARGS.request_rate),
+    )
+    reddit.db_handler = db_handler
+    mount_cassette(reddit, ARGS.record_dir, ARGS.replay_dir)
+    METRICS.gauge(
+        'reddit_request_rate', lambda: reddit.reddit_http_handler.rate_limiter.effective_rate,
+        'Reddit requests per second within the last minute',
     )
+    if reddit.reddit_db_formatter.google_search_pool:
+        METRICS.gauge(
+            'google_queue_depth', lambda: reddit.reddit_db_formatter.google_search_pool.queue_depth,
+            'Google reverse image searches waiting for a worker',
+        )
+    if ARGS.incremental or ARGS.daemon:
+        RedditDBHelper.load_crawl_state(reddit, db_handler)
+
+    if ARGS.daemon:
+        reddit_scheduler = RedditScheduler(
+            reddit, db_handler, RedditDBHelper.sort_time_pairs(ARGS.reddit_sort, ARGS.reddit_time),
+            min_interval=ARGS.min_interval, max_interval=ARGS.max_interval,
+        )
+        try:
+            reddit_scheduler.run()
+        except KeyboardInterrupt:
+            db_handler.flush()
+        print(f"Scheduler: {reddit_scheduler.stats['batches']} crawls - "
+              f"lag mean {reddit_scheduler.stats['mean_lag']:.1f}s, max {reddit_scheduler.stats['max_lag']:.1f}s")
+    else:
+        reddit_data = RedditDBHelper.generate_reddit_data(
+            reddit, ARGS.reddit_sort, ARGS.reddit_time
+        )
+
+        RedditDBHelper.insert_reddit_data_to_db(reddit.db_handler, reddit_data)
+        RedditDBHelper.save_crawl_checkpoints(reddit.db_handler, reddit.crawl_checkpoint_rows())
+
+    seen_posts = reddit.reddit_db_formatter.seen_posts
+    print(f"{len(seen_posts)} seen posts - {seen_posts.memory_bytes / 1024 ** 2:.1f} MiB")
 
-    reddit_data = RedditDBHelper.generate_reddit_data(
-        reddit, ARGS.reddit_sort, ARGS.reddit_time
+    connection_stats = reddit.reddit_http_handler.connection_stats
+    print(f"{connection_stats['requests']} requests - "
+          f"{connection_stats['connections_opened']} connections opened, "
+          f"{connection_stats['connections_reused']} reused")
+    rate_limiter_stats = reddit.reddit_http_handler.rate_limiter.stats
+    print(f"{rate_limiter_stats['requests_per_minute']:.0f} requests/min - "
+          f"{rate_limiter_stats['throttled']} throttled")
+    reddit.reddit_http_handler.close()
+
+    google_search_pool = reddit.reddit_db_formatter.google_search_pool
+    if google_search_pool:
+        # The lookups of the last posts finish on shutdown
+        RedditDBHelper.insert_reddit_data_to_db(db_handler, [reddit.reddit_db_formatter.close()])
+        print(f"Google reverse image search: {google_search_pool.stats}")
+
+    if google_result_cache:
+        print(f"Google result cache: {google_result_cache.stats}")
+        google_result_cache.close()
+
+    if response_cache:
+        print(f"Response cache: {response_cache.stats}")
+        response_cache.close()
+
+
+def crawl_sharded(ARGS):
+    """Fetches and formats the subreddits in ARGS.processes worker processes,
+    a single writer process inserts the data
+    """
+    crawler = RedditShardedCrawler(
+        ARGS.subreddits,
+        ARGS.database_path,
+        processes=ARGS.processes,
+        incremental=ARGS.incremental,
+        db_options={
+            'db_type': ARGS.database_type,
+            'flush_rows': ARGS.batch_size,
+            'db_profile': ARGS.database_profile,
+            'pool_size': ARGS.database_pool,
+        },
+        checker_options={
+            'max_workers': ARGS.workers,
+            'max_pages': ARGS.pages,
+            'google_workers': ARGS.google_workers,
+            'google_rate': ARGS.google_rate,
+            'cache_path': ARGS.cache_path,
+            'cache_size': ARGS.cache_size,
+            'google_cache_path': ARGS.google_cache_path,
+            'seen_set_backend': ARGS.dedup_backend,
+            'seen_set_options': seen_set_options(ARGS),
+            'json_backend': ARGS.json_backend,
+            'timeseries': ARGS.timeseries,
+            'record_dir': ARGS.record_dir,
+            'replay_dir': ARGS.replay_dir,
+            'request_rate': ARGS.request_rate,
+        },
     )
+    crawler.crawl(RedditDBHelper.sort_time_pairs(ARGS.reddit_sort, ARGS.reddit_time))
+    print_bulk_insert_stats(crawler.bulk_insert_stats)
 
-    if ARGS.create_database:
-        sql_create_commands = FileReader.read_file(ARGS.database_schema)
-        reddit.db_handler.create_db
-        reddit.db_handler.init_database(sql_create_commands)
 
-    RedditDBHelper.insert_reddit_data_to_db(reddit.db_handler, reddit_data)
+def seen_set_options(ARGS):
+    if ARGS.dedup_backend == 'bloom':
+        return {'error_rate': ARGS.dedup_error_rate}
+    return None
+
+
+def print_bulk_insert_stats(bulk_insert_stats):
+    for table_name, table_stats in bulk_insert_stats.items():
+        print(f"{table_name}: {table_stats['rows']} rows - {table_stats['rows_per_second']:.0f} rows/sec")
+
 
 if __name__ == '__main__':
     try:
@@ -18,6 +18,35 @@ CREATE TABLE images (
 
 CREATE index image_id on images(id);
 
+CREATE TABLE image_hashes (
+    image_id VARCHAR(20) PRIMARY KEY NOT NULL,
+    ahash INTEGER,
+    dhash INTEGER,
+    phash INTEGER,
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE TABLE image_files (
+    image_id VARCHAR(20) PRIMARY KEY NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    file_path TEXT,
+    size INT,
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE index image_file_sha256 on image_files(sha256);
+
+CREATE TABLE crawl_checkpoints (
+    subreddit VARCHAR(50) NOT NULL,
+    reddit_sort varchar(10) NOT NULL,
+    reddit_time varchar(10) NOT NULL,
+    newest_created_utc INT,
+    newest_fullname VARCHAR(20),
+    new_posts INT,
+    updated_at DATETIME,
+    PRIMARY KEY(subreddit, reddit_sort, reddit_time)
+);
+
 CREATE TABLE reddit_sort (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     sort varchar(10)
@@ -51,6 +80,19 @@ CREATE TABLE image_success (
 
 CREATE index time_passed on image_success(time_passed);
 
+CREATE TABLE image_success_series (
+    image_id varchar(20) NOT NULL,
+    observed_at INT NOT NULL,
+    ups INT,
+    num_comments INT,
+    gildings INT,
+    resolution INT NOT NULL DEFAULT 0,
+    PRIMARY KEY(image_id, observed_at),
+    FOREIGN KEY(image_id) REFERENCES images(id)
+) WITHOUT ROWID;
+
+CREATE index series_observed_at on image_success_series(observed_at);
+
 CREATE TABLE image_processing (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     image_id varchar(20) NOT NULL UNIQUE,
@@ -0,0 +1,108 @@
+CREATE TABLE subreddits (
+    id VARCHAR(20) PRIMARY KEY NOT NULL,
+    subreddit_name_prefixed VARCHAR(50),
+    subreddit_subscribers INT
+);
+
+CREATE index subreddit_name_prefixed on subreddits(subreddit_name_prefixed);
+
+CREATE TABLE images (
+    id VARCHAR(20) PRIMARY KEY NOT NULL,
+    subreddit_id VARCHAR(20) NOT NULL,
+    image_url TEXT,
+    permalink TEXT,
+    upload_time TIMESTAMP,
+    FOREIGN KEY(subreddit_id) REFERENCES subreddits(id)
+);
+
+CREATE TABLE image_hashes (
+    image_id VARCHAR(20) PRIMARY KEY NOT NULL,
+    ahash BIGINT,
+    dhash BIGINT,
+    phash BIGINT,
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE TABLE image_files (
+    image_id VARCHAR(20) PRIMARY KEY NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    file_path TEXT,
+    size BIGINT,
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE index image_file_sha256 on image_files(sha256);
+
+CREATE TABLE crawl_checkpoints (
+    subreddit VARCHAR(50) NOT NULL,
+    reddit_sort VARCHAR(10) NOT NULL,
+    reddit_time VARCHAR(10) NOT NULL,
+    newest_created_utc BIGINT,
+    newest_fullname VARCHAR(20),
+    new_posts INT,
+    updated_at TIMESTAMP,
+    PRIMARY KEY(subreddit, reddit_sort, reddit_time)
+);
+
+CREATE TABLE reddit_sort (
+    id SMALLINT PRIMARY KEY,
+    sort VARCHAR(10) UNIQUE
+);
+
+CREATE TABLE reddit_time (
+    id SMALLINT PRIMARY KEY,
+    sort VARCHAR(10) UNIQUE
+);
+
+CREATE TABLE image_success (
+    id BIGSERIAL PRIMARY KEY,
+    image_id VARCHAR(20) NOT NULL,
+    ups INT,
+    num_comments INT,
+    gid_1 SMALLINT,
+    gid_2 SMALLINT,
+    gid_3 SMALLINT,
+    reddit_sort SMALLINT,
+    reddit_time SMALLINT,
+    last_checked TIMESTAMP,
+    time_passed TEXT,
+    FOREIGN KEY(image_id) REFERENCES images(id),
+    FOREIGN KEY(reddit_sort) REFERENCES reddit_sort(id),
+    FOREIGN KEY(reddit_time) REFERENCES reddit_time(id)
+);
+
+CREATE index image_success_image_id on image_success(image_id);
+CREATE index time_passed on image_success(time_passed);
+
+CREATE TABLE image_success_series (
+    image_id VARCHAR(20) NOT NULL,
+    observed_at BIGINT NOT NULL,
+    ups INT,
+    num_comments INT,
+    gildings INT,
+    resolution INT NOT NULL DEFAULT 0,
+    PRIMARY KEY(image_id, observed_at),
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE index series_observed_at on image_success_series(observed_at);
+
+CREATE TABLE image_processing (
+    id BIGSERIAL PRIMARY KEY,
+    image_id VARCHAR(20) NOT NULL UNIQUE,
+    title VARCHAR(300),
+    google_permalink TEXT,
+    guess TEXT,
+    first_result TEXT,
+
+    FOREIGN KEY(image_id) REFERENCES images(id)
+);
+
+CREATE index guess ON image_processing(guess);
+
+-- The ids match accepted_sorts and accepted_times of RedditConfigrations, image_success stores them
+INSERT INTO reddit_sort(id, sort)
+VALUES (1, 'controversial'), (2, 'hot'), (3, 'new'), (4, 'rising'), (5, 'top');
+
+INSERT INTO reddit_time(id, sort)
+VALUES (1, 'hour'), (2, 'day'), (3, 'week'), (4, 'month'), (5, 'year'), (6, 'all');
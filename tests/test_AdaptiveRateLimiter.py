@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from helper.ratelimit.AdaptiveRateLimiter import AdaptiveRateLimiter
+
+
+class _Clock:
+    """A clock only moved by sleeping"""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _response(status_code=200, **headers):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers)
+    return response
+
+
+class _ThrottlingHandler(BaseHTTPRequestHandler):
+    """
+    Answers every request with a 429 until `throttled` requests were rejected
+    """
+    protocol_version = 'HTTP/1.1'
+    throttled = 0
+    requests = 0
+
+    def do_GET(self):
+        cls = type(self)
+        cls.requests += 1
+        if cls.requests <= cls.throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+        else:
+            self.send_response(200)
+            self.send_header('X-Ratelimit-Remaining', '99')
+            self.send_header('X-Ratelimit-Reset', '60')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    """
+    Unit-testing the AdaptiveRateLimiter with a fake clock
+    """
+    def setUp(self):
+        self.clock = _Clock()
+        self.rate_limiter = AdaptiveRateLimiter(clock=self.clock, sleep=self.clock.sleep, seed=0)
+
+    def _request(self, response):
+        self.rate_limiter.acquire()
+        return self.rate_limiter.update(response)
+
+    def test_budget_is_spread_over_the_window(self):
+        """
+        Testing if the remaining requests are paced evenly until the reset
+        """
+        self.rate_limiter.window = 1000.0
+        self._request(_response(**{'X-Ratelimit-Remaining': '10', 'X-Ratelimit-Reset': '100'}))
+        for _ in range(9):
+            self.rate_limiter.acquire()
+
+        self.assertEqual(len(self.clock.slept), 8)
+        self.assertAlmostEqual(self.clock.now - 1000.0, 8 * 100 / 9)
+        self.assertEqual(self.rate_limiter.remaining, 1)
+        self.assertAlmostEqual(self.rate_limiter.effective_rate, 10 / (8 * 100 / 9))
+
+        # The last request of the budget is sent with the new window
+        self.rate_limiter.acquire()
+        self.assertAlmostEqual(self.clock.now - 1000.0, 100.0)
+
+    def test_max_rate_above_zero(self):
+        """
+        Testing if a maximum rate of 0 or below is refused instead of turning off the cap
+        """
+        for max_rate in (0, -2.0):
+            self.assertRaises(ValueError, AdaptiveRateLimiter, max_rate=max_rate)
+
+    def test_used_up_budget_waits_for_the_reset(self):
+        """
+        Testing if no request is sent before the reset, once the budget is used up
+        """
+        self._request(_response(**{'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '30'}))
+        self.rate_limiter.acquire()
+
+        self.assertEqual(self.clock.slept, [30.0])
+
+    def test_in_flight_requests_count_against_the_budget(self):
+        """
+        Testing if concurrent requests are subtracted from an announced budget
+        """
+        self.rate_limiter.acquire()
+        self.rate_limiter.acquire()
+        self.rate_limiter.update(_response(**{'X-Ratelimit-Remaining': '5', 'X-Ratelimit-Reset': '60'}))
+
+        self.assertEqual(self.rate_limiter.remaining, 4)
+
+    def test_retry_after_pauses_all_requests(self):
+        """
+        Testing if a 429 with Retry-After blocks the next request that long
+        """
+        delay = self._request(_response(429, **{'Retry-After': '30'}))
+        self.rate_limiter.acquire()
+
+        self.assertGreaterEqual(delay, 30)
+        self.assertLessEqual(delay, 33)
+        self.assertAlmostEqual(self.clock.now - 1000.0, delay)
+        self.assertEqual(self.rate_limiter.stats['throttled'], 1)
+
+    def test_backoff_grows_with_jitter(self):
+        """
+        Testing if failures without Retry-After back off exponentially, a success resets them
+        """
+        delays = [self._request(_response(503)) for _ in range(4)]
+        for failure, delay in enumerate(delays):
+            backoff = 0.5 * 2 ** failure
+            self.assertGreaterEqual(delay, backoff / 2)
+            self.assertLessEqual(delay, backoff)
+
+        self.assertEqual(self._request(_response(200)), 0.0)
+        self.assertLessEqual(self._request(_response(503)), 0.5)
+
+    def test_http_handler_retries_throttled_requests(self):
+        """
+        Testing if RedditHttpHandler retries a 429 once urllib3 no longer does
+        """
+        _ThrottlingHandler.throttled = 2
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _ThrottlingHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            reddit_http_handler = RedditHttpHandler(base_url=f'http://127.0.0.1:{server.server_address[1]}')
+            response = reddit_http_handler.get_response(reddit_http_handler.base_url + '/r/pic/top/.json')
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(_ThrottlingHandler.requests, 3)
+        self.assertEqual(reddit_http_handler.rate_limiter.stats['throttled'], 2)
+        self.assertEqual(reddit_http_handler.rate_limiter.remaining, 99)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+import unittest
+
+from core.db.ConnectionPool import ConnectionPool
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Unit-testing the ConnectionPool
+    """
+    def setUp(self):
+        self.pool = ConnectionPool(lambda: sqlite3.connect(':memory:', check_same_thread=False), size=2, timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_connections_are_reused(self):
+        """
+        Testing if released connections are lent again before new ones are opened
+        """
+        self.assertEqual(self.pool.stats['opened'], 0)
+        with self.pool.connection() as connection:
+            pass
+        with self.pool.connection() as reused_connection:
+            self.assertIs(reused_connection, connection)
+        self.assertEqual(self.pool.stats, {'size': 2, 'opened': 1, 'idle': 1})
+
+    def test_pool_is_bounded(self):
+        """
+        Testing if no more than size connections are opened and a full pool times out
+        """
+        connections = [self.pool.acquire(), self.pool.acquire()]
+        self.assertIsNot(connections[0], connections[1])
+        self.assertRaises(TimeoutError, self.pool.acquire)
+
+        self.pool.release(connections[1])
+        self.assertIs(self.pool.acquire(), connections[1])
+        self.assertEqual(self.pool.stats['opened'], 2)
+        self.assertRaises(ValueError, ConnectionPool, sqlite3.connect, size=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
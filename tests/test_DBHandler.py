@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import unittest
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit.RedditDBFormatter import TABLE_COLUMNS, TABLE_CONVERSIONS, TABLE_ORDER
+from core.io.FileReader import FileReader
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+class TestDBHandler(unittest.TestCase):
+    """
+    Unit-testing the DBHandler
+    """
+    def setUp(self):
+        self.db_handler = DBHandler(':memory:', flush_rows=3, flush_interval=3600)
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+    def _count(self, table_name):
+        return self.db_handler.connection.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+    def test_bulk_insert_flushes_on_row_count(self):
+        """
+        Testing if the buffer is written once flush_rows rows are buffered
+        """
+        for index in range(2):
+            self.db_handler.bulk_insert_to_db('subreddits', {'id': f't5_{index}'})
+        self.assertEqual(self._count('subreddits'), 0)
+
+        self.db_handler.bulk_insert_to_db('subreddits', {'id': 't5_2'})
+        self.assertEqual(self._count('subreddits'), 3)
+        self.assertEqual(self.db_handler.bulk_insert_stats['subreddits']['rows'], 3)
+
+    def test_bulk_insert_flushes_on_interval(self):
+        """
+        Testing if the buffer is written once flush_interval has passed
+        """
+        self.db_handler.flush_interval = 0
+        self.db_handler.bulk_insert_to_db('subreddits', {'id': 't5_0'})
+        self.assertEqual(self._count('subreddits'), 1)
+
+    def test_bulk_insert_skips_duplicates(self):
+        """
+        Testing if duplicates are skipped without losing the rest of the batch
+        """
+        for post_id in ('a', 'b', 'a', 'c'):
+            self.db_handler.bulk_insert_to_db('images', {'id': post_id, 'subreddit_id': 't5_0'})
+        self.db_handler.flush()
+
+        self.assertEqual(self._count('images'), 3)
+
+    def test_bulk_insert_changing_columns(self):
+        """
+        Testing if rows with other columns are written to the same table
+        """
+        self.db_handler.bulk_insert_to_db('subreddits', {'id': 't5_0'})
+        self.db_handler.bulk_insert_to_db('subreddits', {'id': 't5_1', 'subreddit_subscribers': 5})
+        self.db_handler.flush()
+
+        self.assertEqual(self._count('subreddits'), 2)
+
+    def test_bulk_insert_row_conversions(self):
+        """
+        Testing if epochs of formatted rows are turned into the stored text formats by SQLite3
+        """
+        for image_id, time_passed in (('a', 3661), ('b', 2 * 86400 + 5)):
+            self.db_handler.bulk_insert_row(
+                'image_success', TABLE_COLUMNS['image_success'],
+                (image_id, 1, 0, 'top', 'day', 1577836800, time_passed, None, None, None),
+                TABLE_CONVERSIONS['image_success'],
+            )
+        self.db_handler.flush()
+
+        self.assertEqual(
+            self.db_handler.select_from_db("SELECT last_checked, time_passed FROM image_success").fetchall(),
+            [('2020-01-01 00:00:00', '1:01:01'), ('2020-01-01 00:00:00', '2 days, 0:00:05')],
+        )
+
+    def test_flush_writes_referenced_tables_first(self):
+        """
+        Testing if a flush satisfies the foreign keys of rows buffered before the rows they reference
+        """
+        self.db_handler = DBHandler(':memory:', flush_rows=1000, flush_interval=3600, table_order=TABLE_ORDER)
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        self.db_handler.connection.execute("PRAGMA foreign_keys = ON")
+
+        post = {
+            'image_processing': ('a', 'Title', None, None, None),
+            'images': ('a', 't5_0', None, None, 1577836800),
+            'subreddits': ('t5_0', 'r/pics', 1),
+        }
+        for table_name, row in post.items():
+            self.db_handler.bulk_insert_row(table_name, TABLE_COLUMNS[table_name], row, TABLE_CONVERSIONS[table_name])
+        self.db_handler.bulk_insert_to_db('image_hashes', {'image_id': 'a', 'ahash': 1})
+        self.db_handler.flush()
+
+        self.assertEqual(list(self.db_handler.bulk_insert_stats), ['subreddits', 'images', 'image_processing', 'image_hashes'])
+        self.assertEqual(self._count('image_processing'), 1)
+        self.assertEqual(self._count('image_hashes'), 1)
+
+    def test_replace_to_db_moves_checkpoint(self):
+        """
+        Testing if a row with the same primary key is overwritten
+        """
+        checkpoint = {'subreddit': 'pic', 'reddit_sort': 'new', 'reddit_time': 'hour', 'newest_created_utc': 1}
+        self.db_handler.replace_to_db('crawl_checkpoints', [checkpoint])
+        self.db_handler.replace_to_db('crawl_checkpoints', [dict(checkpoint, newest_created_utc=2)])
+
+        self.assertEqual(self._count('crawl_checkpoints'), 1)
+        self.assertEqual(
+            self.db_handler.select_from_db("SELECT newest_created_utc FROM crawl_checkpoints").fetchone()[0], 2
+        )
+
+    def test_update_db(self):
+        """
+        Testing if the changed rows of every statement are counted within one transaction
+        """
+        for index in range(3):
+            self.db_handler.bulk_insert_to_db('subreddits', {'id': f't5_{index}', 'subreddit_subscribers': index})
+
+        changed_rows = self.db_handler.update_db([
+            ("UPDATE subreddits SET subreddit_subscribers = ? WHERE subreddit_subscribers < ?", (5, 2)),
+            ("DELETE FROM subreddits WHERE subreddit_subscribers = ?", (5, )),
+        ])
+
+        self.assertEqual(changed_rows, [2, 2])
+        self.assertEqual(self._count('subreddits'), 1)
+
+    def test_insert_statements_are_cached(self):
+        """
+        Testing if the INSERT text is built once per table and column tuple
+        """
+        self.db_handler.insert_to_db('subreddits', {'id': 't5_0'})
+        self.db_handler.insert_to_db('subreddits', {'id': 't5_1'})
+        self.db_handler.insert_to_db('subreddits', {'subreddit_subscribers': 1, 'id': 't5_2'})
+
+        self.assertEqual(len(self.db_handler.insert_statements), 2)
+        self.assertEqual(self._count('subreddits'), 3)
+
+    def test_fast_profile(self):
+        """
+        Testing if the profile pragmas are applied on connect
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            db_handler = DBHandler(os.path.join(directory, "fast.db"), db_profile='fast')
+            connection = db_handler.connection
+
+            self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+            self.assertEqual(connection.execute("PRAGMA synchronous").fetchone()[0], 1)
+            connection.close()
+
+    def test_lazy_connections(self):
+        """
+        Testing if connections are opened on first use, one per thread, and reopened after closing
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = os.path.join(directory, "lazy.db")
+            db_handler = DBHandler(db_path, pool_size=2)
+            self.assertFalse(os.path.exists(db_path))
+            self.assertEqual(db_handler.pool.stats['opened'], 0)
+
+            db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+            self.assertIs(db_handler.connection, db_handler.connection)
+            other_connections = []
+            thread = threading.Thread(target=lambda: other_connections.append(db_handler.connection))
+            thread.start()
+            thread.join()
+            self.assertIsNot(other_connections[0], db_handler.connection)
+            self.assertEqual(db_handler.pool.stats['opened'], 2)
+
+            db_handler.close()
+            db_handler.insert_to_db('subreddits', {'id': 't5_0'})
+            self.assertEqual(db_handler.select_from_db("SELECT id FROM subreddits").fetchall(), [('t5_0', )])
+            db_handler.close()
+
+    def test_threads_share_one_connection(self):
+        """
+        Testing if threads writing through the default pool of one connection take turns instead of timing out
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            db_handler = DBHandler(os.path.join(directory, "shared.db"), flush_rows=10)
+            db_handler.pool.timeout = 1
+            db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+            errors = []
+
+            def insert_subreddits(thread_index):
+                try:
+                    for index in range(25):
+                        db_handler.bulk_insert_to_db('subreddits', {'id': f't5_{thread_index}_{index}'})
+                    db_handler.flush()
+                    db_handler.insert_to_db('subreddits', {'id': f't5_{thread_index}'})
+                except TimeoutError as error:
+                    errors.append(error)
+
+            threads = [threading.Thread(target=insert_subreddits, args=(thread_index, )) for thread_index in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(db_handler.pool.stats['opened'], 1)
+            self.assertEqual(db_handler.select_from_db("SELECT COUNT(*) FROM subreddits").fetchone()[0], 52)
+            db_handler.close()
+
+    def test_unknown_profile(self):
+        """
+        Testing if an unknown profile is refused
+        """
+        self.assertRaises(KeyError, DBHandler, ':memory:', db_profile='warp')
+        self.assertRaises(KeyError, DBHandler, ':memory:', db_type='oracle')
+
+
+if __name__ == '__main__':
+    unittest.main()
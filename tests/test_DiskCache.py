@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from core.io.DiskCache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    """
+    Unit-testing the DiskCache
+    """
+    def setUp(self):
+        self.disk_cache = DiskCache(':memory:', max_bytes=10)
+
+    def tearDown(self):
+        self.disk_cache.close()
+
+    def test_get_fresh_and_stale(self):
+        """
+        Testing if expired entries are only returned on request
+        """
+        self.disk_cache.set('fresh', b'1', ttl=60, meta={'etag': 'x'})
+        self.disk_cache.set('stale', b'2', ttl=-1)
+
+        self.assertEqual(self.disk_cache.get('fresh').meta, {'etag': 'x'})
+        self.assertIsNone(self.disk_cache.get('stale'))
+        self.assertFalse(self.disk_cache.get('stale', allow_stale=True).is_fresh)
+        self.assertIsNone(self.disk_cache.get('unknown'))
+        self.assertEqual(self.disk_cache.stats['hits'], 1)
+        self.assertEqual(self.disk_cache.stats['stale_hits'], 1)
+        self.assertEqual(self.disk_cache.stats['misses'], 2)
+
+    def test_refresh(self):
+        """
+        Testing if a refreshed entry is fresh again
+        """
+        self.disk_cache.set('key', b'1', ttl=-1)
+        self.disk_cache.refresh('key', ttl=60)
+        self.assertTrue(self.disk_cache.get('key').is_fresh)
+
+    def test_evicts_least_recently_used(self):
+        """
+        Testing if the least recently used entries are evicted first
+        """
+        self.disk_cache.set('a', b'1234', ttl=60)
+        time.sleep(0.01)
+        self.disk_cache.set('b', b'1234', ttl=60)
+        time.sleep(0.01)
+        self.disk_cache.get('a')
+        self.disk_cache.set('c', b'1234', ttl=60)
+
+        self.assertIsNotNone(self.disk_cache.get('a'))
+        self.assertIsNone(self.disk_cache.get('b'))
+        self.assertEqual(self.disk_cache.total_bytes, 8)
+        self.assertEqual(self.disk_cache.stats['evictions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
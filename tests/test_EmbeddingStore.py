@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import EmbeddingDBHelper
+from core.image.EmbeddingStore import EmbeddingStore
+from core.image.ImageEmbedder import ImageEmbedder
+from core.io.FileReader import FileReader
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+def _gradient_image(flip=False, size=128):
+    gradient = np.tile(np.linspace(0, 255, size, dtype=np.uint8), (size, 1))
+    if flip:
+        gradient = gradient.T
+    return Image.fromarray(np.stack([gradient, gradient // 2, np.full_like(gradient, 80)], axis=2))
+
+
+class TestEmbeddingStore(unittest.TestCase):
+    """
+    Unit-testing the embedding store and the image embedder
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store_dir = os.path.join(self.directory.name, 'embeddings')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_and_reopen(self):
+        """
+        Testing if appended vectors are deduplicated and kept when the store is opened again
+        """
+        embedding_store = EmbeddingStore(self.store_dir, dim=4)
+        self.assertEqual(embedding_store.append(['a', 'b', 'a'], np.arange(12).reshape(3, 4)), 2)
+        self.assertEqual(embedding_store.append(['b', 'c'], np.ones((2, 4))), 1)
+
+        embedding_store = EmbeddingStore(self.store_dir)
+        self.assertEqual(len(embedding_store), 3)
+        self.assertIsInstance(embedding_store.vectors, np.memmap)
+        self.assertEqual(embedding_store.get(['c', 'a']).tolist(), [[1] * 4, [0, 1, 2, 3]])
+        with self.assertRaises(ValueError):
+            EmbeddingStore(self.store_dir, dim=8)
+
+    def test_interrupted_append(self):
+        """
+        Testing if rows written after the last complete append are cut off
+        """
+        embedding_store = EmbeddingStore(self.store_dir, dim=2, dtype=np.float16)
+        embedding_store.append(['a'], [[1, 2]])
+        with open(embedding_store.vectors_path, 'ab') as vectors_file:
+            vectors_file.write(np.zeros(2, dtype=np.float16).tobytes())
+        with open(embedding_store.ids_path, 'a') as ids_file:
+            ids_file.write('b\n')
+
+        embedding_store = EmbeddingStore(self.store_dir)
+        self.assertEqual(embedding_store.dtype, np.float16)
+        self.assertNotIn('b', embedding_store)
+        self.assertEqual(os.path.getsize(embedding_store.vectors_path), 4)
+        self.assertEqual(embedding_store.append(['b'], [[3, 4]]), 1)
+        self.assertEqual(EmbeddingStore(self.store_dir).get(['b']).tolist(), [[3, 4]])
+
+    def test_embed(self):
+        """
+        Testing if similar images are closer than different ones
+        """
+        image_embedder = ImageEmbedder()
+        images = np.stack([
+            np.asarray(_gradient_image().resize((64, 64))),
+            np.asarray(_gradient_image(size=96).resize((64, 64))),
+            np.asarray(_gradient_image(flip=True).resize((64, 64))),
+        ])
+        vectors = image_embedder.embed(images)
+
+        self.assertEqual(vectors.shape, (3, image_embedder.dim))
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1, rtol=1e-5)
+        self.assertGreater(vectors[0] @ vectors[1], vectors[0] @ vectors[2])
+
+        pixels = ImageEmbedder('pixels').embed(images)
+        self.assertEqual(pixels.shape, (3, 64 * 64 * 3))
+        self.assertEqual(pixels.dtype, np.float16)
+        with self.assertRaises(KeyError):
+            ImageEmbedder('resnet')
+
+    def test_embed_downloaded_images(self):
+        """
+        Testing if only downloaded images without a vector are embedded and broken files are skipped
+        """
+        db_handler = DBHandler(':memory:')
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        for image_id, image in (('a', _gradient_image()), ('b', _gradient_image(flip=True)), ('c', None)):
+            file_path = os.path.join(self.directory.name, f'{image_id}.jpg')
+            if image is None:
+                with open(file_path, 'wb') as image_file:
+                    image_file.write(b'no image')
+            else:
+                image.save(file_path)
+            db_handler.bulk_insert_to_db('image_files', {
+                'image_id': image_id, 'sha256': image_id * 64, 'file_path': file_path, 'size': 1,
+            })
+        db_handler.flush()
+
+        image_embedder = ImageEmbedder()
+        embedding_store = EmbeddingDBHelper.open_embedding_store(self.store_dir, image_embedder)
+        self.assertEqual(EmbeddingDBHelper.embed_downloaded_images(db_handler, embedding_store, batch_size=1), 2)
+        self.assertEqual(EmbeddingDBHelper.embed_downloaded_images(db_handler, embedding_store), 0)
+        self.assertEqual(embedding_store.ids, ['a', 'b'])
+        np.testing.assert_allclose(
+            embedding_store.get(['a'])[0], image_embedder.embed_files([os.path.join(self.directory.name, 'a.jpg')])[0],
+            rtol=1e-5,
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
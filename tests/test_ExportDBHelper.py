@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import ExportDBHelper
+from core.io import ColumnarWriter
+from core.io.FileReader import FileReader
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+class TestExportDBHelper(unittest.TestCase):
+    """
+    Unit-testing the columnar export
+    """
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_handler = DBHandler(':memory:')
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        for subreddit in ('pics', 'earthporn'):
+            self.db_handler.bulk_insert_to_db('subreddits', {
+                'id': f't5_{subreddit}', 'subreddit_name_prefixed': f'r/{subreddit}', 'subreddit_subscribers': 10,
+            })
+        self._insert_posts(['a', 'b', 'c'])
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _insert_posts(self, post_ids):
+        for index, post_id in enumerate(post_ids):
+            subreddit = 'pics' if index % 2 else 'earthporn'
+            self.db_handler.bulk_insert_to_db('images', {
+                'id': post_id, 'subreddit_id': f't5_{subreddit}', 'image_url': f'https://i.redd.it/{post_id}.jpg',
+                'permalink': f'/r/{subreddit}/comments/{post_id}/', 'upload_time': f'2020-01-0{index + 1} 12:00:00',
+            })
+            self.db_handler.bulk_insert_to_db('image_success', {
+                'image_id': post_id, 'ups': index * 10, 'num_comments': index, 'gid_1': 1, 'gid_2': None,
+                'gid_3': 2, 'reddit_sort': 'top', 'reddit_time': 'day', 'last_checked': '2020-01-05 00:00:00',
+                'time_passed': '1:00:00',
+            })
+        self.db_handler.flush()
+
+    def _export(self, **kwargs):
+        return ExportDBHelper.export_view(
+            self.db_handler, 'training', self.directory.name, export_format='npy', **kwargs
+        )
+
+    def _parts(self):
+        view_dir = os.path.join(self.directory.name, 'training')
+        return sorted(
+            os.path.relpath(root, view_dir) for root, _, files in os.walk(view_dir) if '_columns.json' in files
+        )
+
+    def test_typed_columns(self):
+        """
+        Testing if the training view is exported into memory mapped, typed columns
+        """
+        self.assertEqual(self._export(chunk_rows=2), {'rows': 3, 'parts': 2, 'watermark': 3})
+        columns = ColumnarWriter.read_npy_part(os.path.join(self.directory.name, 'training', 'part-000000000001'))
+
+        self.assertIsInstance(columns['ups'], np.memmap)
+        self.assertEqual(columns['ups'].tolist(), [0, 10])
+        self.assertEqual(columns['gildings'].tolist(), [3, 3])
+        self.assertEqual(columns['subreddit'].tolist(), [b'earthporn', b'pics'])
+        self.assertEqual(str(columns['upload_time'][0]), '2020-01-01T12:00:00')
+        self.assertEqual(columns['sha256'].tolist(), [b'', b''])
+
+    def test_incremental_export(self):
+        """
+        Testing if a second export only appends rows newer than the watermark
+        """
+        self._export()
+        self.assertEqual(self._export()['rows'], 0)
+
+        self._insert_posts(['d'])
+        self.assertEqual(self._export(), {'rows': 1, 'parts': 1, 'watermark': 4})
+        self.assertEqual(self._parts(), ['part-000000000001', 'part-000000000004'])
+
+    def test_partitions(self):
+        """
+        Testing if rows are split into subreddit and date directories
+        """
+        self._export(partition_by=('subreddit', 'date'))
+
+        self.assertEqual(self._parts(), [
+            'subreddit=earthporn/date=2020-01-01/part-000000000001',
+            'subreddit=earthporn/date=2020-01-03/part-000000000001',
+            'subreddit=pics/date=2020-01-02/part-000000000001',
+        ])
+        with self.assertRaises(ValueError):
+            self._export()
+        with self.assertRaises(ValueError):
+            ExportDBHelper.export_view(self.db_handler, 'image_processing', self.directory.name,
+                                       export_format='npy', partition_by=('subreddit', ))
+
+    @unittest.skipUnless(ColumnarWriter.pyarrow, 'pyarrow is not installed')
+    def test_parquet_export(self):
+        """
+        Testing if a Parquet export keeps missing values as nulls
+        """
+        import pyarrow.parquet
+        import pyarrow.types
+
+        ExportDBHelper.export_view(self.db_handler, 'image_success', self.directory.name, export_format='parquet')
+        table = pyarrow.parquet.read_table(
+            os.path.join(self.directory.name, 'image_success', 'part-000000000001.parquet')
+        )
+
+        self.assertEqual(table.column('gid_2').null_count, 3)
+        self.assertTrue(pyarrow.types.is_timestamp(table.schema.field('last_checked').type))
+        self.assertEqual(table.column('last_checked')[0].as_py().isoformat(), '2020-01-05T00:00:00+00:00')
+
+    def test_arguments_without_numpy(self):
+        """
+        Testing if the command line arguments list the views and formats without importing NumPy
+        """
+        loaded = subprocess.run(
+            [sys.executable, '-c', "import sys, cmd_line_args; print('numpy' in sys.modules)"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), capture_output=True, text=True,
+            check=True,
+        )
+        self.assertEqual(loaded.stdout.strip(), 'False')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+import requests
+
+from helper.google.GoogleCrawler import GoogleCrawler
+from helper.google.GoogleResultCache import GoogleResultCache, normalize_image_url
+
+GOOGLE_PAGE = (
+    '<a class="fKDtNb" href="/search?q=cat" style="font-style:italic">cat</a>'
+    '<div class="r"><a href="https://cats.example"'
+)
+
+
+class _OfflineGoogleCrawler(GoogleCrawler):
+    """
+    Answers every search with the same page and counts the requests
+    """
+    def __init__(self, result_cache):
+        super().__init__(result_cache=result_cache)
+        self.requests = 0
+
+    def _request_response(self, url):
+        self.requests += 1
+        response = requests.Response()
+        response.status_code = 200
+        response._content = GOOGLE_PAGE.encode()
+        response.encoding = 'utf-8'
+        return response
+
+
+class TestGoogleResultCache(unittest.TestCase):
+    """
+    Unit-testing the GoogleResultCache
+    """
+    def setUp(self):
+        self.google_result_cache = GoogleResultCache(':memory:')
+        self.google_crawler = _OfflineGoogleCrawler(self.google_result_cache)
+
+    def tearDown(self):
+        self.google_result_cache.close()
+
+    def test_normalize_image_url(self):
+        """
+        Testing if different links to the same image are normalized equally
+        """
+        self.assertEqual(
+            normalize_image_url('http://I.Redd.it/abc.jpg'),
+            normalize_image_url('https://i.redd.it/abc.jpg?utm_source=share#top'),
+        )
+        self.assertEqual(
+            normalize_image_url('https://example.com/a.png?b=2&amp;a=1&utm_medium=x'),
+            'https://example.com/a.png?a=1&b=2',
+        )
+
+    def test_repeated_search_is_cached(self):
+        """
+        Testing if the same image is searched only once
+        """
+        first = self.google_crawler.google_reverse_image_search('https://i.redd.it/abc.jpg')
+        second = self.google_crawler.google_reverse_image_search('http://i.redd.it/abc.jpg?s=1')
+
+        self.assertEqual(first, second)
+        self.assertEqual(first['guess'], 'Cat')
+        self.assertEqual(self.google_crawler.requests, 1)
+
+    def test_search_by_content_hash(self):
+        """
+        Testing if a repost behind another url is found by its content hash
+        """
+        self.google_crawler.google_reverse_image_search('https://i.redd.it/a.jpg', content_hash='ff')
+        self.google_crawler.google_reverse_image_search('https://i.imgur.com/b.jpg', content_hash='ff')
+
+        self.assertEqual(self.google_crawler.requests, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from helper.google.GoogleCrawler import GoogleCrawler
+from helper.google.GoogleResultCache import GoogleResultCache
+from helper.google.GoogleSearchPool import GoogleSearchPool
+
+
+class _SlowGoogleCrawler(GoogleCrawler):
+    """
+    Answers every search after a short delay, without any request
+    """
+    def __init__(self, delay, result_cache=None):
+        super().__init__(result_cache=result_cache)
+        self.delay = delay
+        self.release = threading.Event()
+        self.searches = 0
+
+    def search(self, image_url, content_hash=None):
+        self.searches += 1
+        self.release.wait()
+        time.sleep(self.delay)
+        return dict(self.empty_result(), guess=image_url)
+
+
+class TestGoogleSearchPool(unittest.TestCase):
+    """
+    Unit-testing the GoogleSearchPool
+    """
+    def test_lookups_complete_in_background(self):
+        """
+        Testing if submitting does not wait for the lookups
+        """
+        google_crawler = _SlowGoogleCrawler(delay=0.01)
+        google_search_pool = GoogleSearchPool(google_crawler, workers=2, rate=1000)
+
+        started = time.perf_counter()
+        for index in range(5):
+            google_search_pool.submit(str(index), 'title', f'url{index}')
+        self.assertLess(time.perf_counter() - started, 0.01)
+
+        google_crawler.release.set()
+        google_search_pool.wait()
+        completed = sorted(google_search_pool.completed())
+        google_search_pool.close()
+
+        self.assertEqual([post_id for post_id, _, _ in completed], ['0', '1', '2', '3', '4'])
+        self.assertEqual(completed[0][2]['guess'], 'url0')
+
+    def test_full_queue_blocks(self):
+        """
+        Testing if a full queue makes submit wait for the workers instead of dropping lookups
+        """
+        google_crawler = _SlowGoogleCrawler(delay=0)
+        google_search_pool = GoogleSearchPool(google_crawler, workers=1, rate=1000, queue_size=2)
+
+        submitter = threading.Thread(
+            target=lambda: [google_search_pool.submit(str(index), 'title', 'url') for index in range(5)]
+        )
+        submitter.start()
+        submitter.join(0.2)
+        # One lookup is taken by the worker, two are queued
+        self.assertTrue(submitter.is_alive())
+        self.assertEqual(google_search_pool.stats['submitted'], 3)
+
+        google_crawler.release.set()
+        submitter.join()
+        google_search_pool.close()
+
+        self.assertEqual(google_search_pool.stats['submitted'], 5)
+        self.assertEqual(google_search_pool.stats['completed'], 5)
+
+    def test_rate_limit(self):
+        """
+        Testing if the workers share the rate limit
+        """
+        google_crawler = _SlowGoogleCrawler(delay=0)
+        google_crawler.release.set()
+        google_search_pool = GoogleSearchPool(google_crawler, workers=4, rate=20)
+
+        started = time.perf_counter()
+        for index in range(6):
+            google_search_pool.submit(str(index), 'title', 'url')
+        google_search_pool.wait()
+        google_search_pool.close()
+
+        # The first lookup uses the initial token, the other 5 wait 1/20 s each
+        self.assertGreaterEqual(time.perf_counter() - started, 0.2)
+
+    def test_cache_hits_skip_rate_limit(self):
+        """
+        Testing if cached results are returned without waiting for a token
+        """
+        google_result_cache = GoogleResultCache(':memory:')
+        for index in range(5):
+            google_result_cache.set(f'https://i.redd.it/{index}.jpg', dict(GoogleCrawler.empty_result(), guess='cat'))
+        google_crawler = _SlowGoogleCrawler(delay=0, result_cache=google_result_cache)
+        google_crawler.release.set()
+        # A second token would take 10 s
+        google_search_pool = GoogleSearchPool(google_crawler, workers=2, rate=0.1)
+
+        started = time.perf_counter()
+        for index in range(6):
+            google_search_pool.submit(str(index), 'title', f'https://i.redd.it/{index}.jpg')
+        google_search_pool.wait()
+        completed = sorted(google_search_pool.completed())
+        google_search_pool.close()
+        google_result_cache.close()
+
+        self.assertLess(time.perf_counter() - started, 5)
+        self.assertEqual(google_crawler.searches, 1)
+        self.assertEqual([google_process['guess'] for _, _, google_process in completed],
+                         ['cat'] * 5 + ['https://i.redd.it/5.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import io
+import unittest
+
+import numpy as np
+from PIL import Image
+
+from core.image.HammingIndex import BKTree, MultiIndexHashing
+from core.image.ImageHasher import ImageHasher, _popcount, hamming_distance
+
+
+def _brute_force(ids, hashes, query_hash, radius):
+    distances = hamming_distance(hashes, query_hash)
+    return {(ids[position], int(distances[position])) for position in np.flatnonzero(distances <= radius)}
+
+
+class TestHammingIndex(unittest.TestCase):
+    """
+    Unit-testing the near-duplicate indexes against a brute-force search
+    """
+    @classmethod
+    def setUpClass(cls):
+        random = np.random.default_rng(0)
+        cls.hashes = random.integers(0, 2 ** 63, size=2000, dtype=np.uint64) * np.uint64(2)
+        # Near-duplicates of the first hashes, with 1 to 8 flipped bits
+        flips = [np.uint64(sum(1 << int(bit) for bit in random.choice(64, amount, replace=False)))
+                 for amount in range(1, 9)]
+        cls.hashes = np.concatenate([cls.hashes, cls.hashes[:8] ^ np.array(flips, dtype=np.uint64)])
+        cls.ids = [str(position) for position in range(len(cls.hashes))]
+
+    def _assert_matches_brute_force(self, hash_index):
+        hash_index.add(self.ids, self.hashes)
+        for query_hash in self.hashes[:8]:
+            for radius in (0, 3, 8, 12):
+                self.assertEqual(
+                    set(hash_index.query(query_hash, radius)),
+                    _brute_force(self.ids, self.hashes, query_hash, radius),
+                )
+
+    def test_multi_index_hashing(self):
+        """
+        Testing if multi-index hashing finds exactly the brute-force matches
+        """
+        self._assert_matches_brute_force(MultiIndexHashing())
+
+    def test_bk_tree(self):
+        """
+        Testing if the BK-tree finds exactly the brute-force matches
+        """
+        self._assert_matches_brute_force(BKTree())
+
+    def test_empty_index(self):
+        """
+        Testing if querying an index without any hashes finds nothing
+        """
+        for hash_index in (MultiIndexHashing(), BKTree()):
+            self.assertEqual(hash_index.query(0, 6), [])
+
+    def test_popcount_fallback(self):
+        """
+        Testing if the bit count without np.bitwise_count matches the bits of every hash
+        """
+        self.assertEqual(
+            _popcount(self.hashes).tolist(),
+            [bin(int(hash_value)).count('1') for hash_value in self.hashes],
+        )
+        self.assertEqual(_popcount(np.uint64(2 ** 64 - 1)), 64)
+
+    def test_incremental_add(self):
+        """
+        Testing if hashes added after a query are found
+        """
+        hash_index = MultiIndexHashing()
+        hash_index.add(['a'], [0])
+        self.assertEqual(hash_index.query(1, 1), [('a', 1)])
+        hash_index.add(['b'], [1])
+        self.assertEqual(hash_index.query(1, 1), [('b', 0), ('a', 1)])
+
+    def test_resized_image_is_near_duplicate(self):
+        """
+        Testing if a resized, recompressed picture keeps its perceptual hashes
+        """
+        gradient = np.add.outer(np.arange(256), np.arange(256)) // 2
+        pattern = np.where((np.arange(256)[:, None] // 32 + np.arange(256) // 32) % 2, gradient, 255 - gradient)
+        original = Image.fromarray(pattern.astype(np.uint8)).convert('RGB')
+
+        image_files = []
+        for image in (original, original.resize((180, 180)), original.rotate(90)):
+            image_file = io.BytesIO()
+            image.save(image_file, format='JPEG', quality=70)
+            image_file.seek(0)
+            image_files.append(image_file)
+
+        hashes = ImageHasher.hash_files(image_files)
+        for hash_name in ('ahash', 'dhash', 'phash'):
+            self.assertLessEqual(hamming_distance(hashes[hash_name][1:2], hashes[hash_name][0])[0], 6)
+            self.assertGreater(hamming_distance(hashes[hash_name][2:3], hashes[hash_name][0])[0], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
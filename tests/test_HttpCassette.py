@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from helper.replay.HttpCassette import HttpCassette, ReplayServer, mount_adapter, mount_cassette
+from helper.replay.SyntheticData import SyntheticAdapter
+from tests.test_RedditChecker import _StubRedditHandler
+
+
+class TestHttpCassette(unittest.TestCase):
+    """
+    Unit-testing record and replay of the reddit requests
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubRedditHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubRedditHandler.delay = 0.0
+        _StubRedditHandler.queries = []
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _reddit_checker(self, subreddits, base_url, max_pages=3):
+        reddit = RedditChecker(subreddits, db_file_path=None, max_workers=2, max_pages=max_pages, google_workers=0)
+        reddit.reddit_http_handler = RedditHttpHandler(base_url=base_url, pool_maxsize=2)
+        # Never reach out to google while testing
+        reddit.reddit_db_formatter.google_crawler.google_knows = True
+        return reddit
+
+    def _crawl(self, reddit):
+        return list(reddit._generate_reddit_json('top', 'day'))
+
+    def test_replay_without_requests(self):
+        """
+        Testing if a replayed crawl equals the recorded one without reaching the server
+        """
+        reddit = self._reddit_checker(['deep', 'missing1'], self.base_url)
+        mount_cassette(reddit, record_dir=self.directory.name)
+        recorded = self._crawl(reddit)
+        self.assertEqual(len(_StubRedditHandler.queries), 4)
+        self.assertEqual(reddit.reddit_http_handler.connection_stats['requests'], 4)
+
+        reddit = self._reddit_checker(['deep', 'missing1', 'unknown'], self.base_url)
+        replay_adapter = mount_cassette(reddit, replay_dir=self.directory.name)
+        replayed = self._crawl(reddit)
+
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(len(recorded), 3)
+        self.assertEqual(len(_StubRedditHandler.queries), 4)
+        self.assertEqual(replay_adapter.misses, 1)
+
+    def test_replay_server(self):
+        """
+        Testing if a cassette is served by path and query through a local server
+        """
+        recorded = self._reddit_checker(['deep'], self.base_url)
+        mount_cassette(recorded, record_dir=self.directory.name)
+        recorded = self._crawl(recorded)
+
+        with ReplayServer(HttpCassette(self.directory.name)) as replay_server:
+            replayed = self._crawl(self._reddit_checker(['deep'], replay_server.base_url))
+
+        self.assertEqual(recorded, replayed)
+        self.assertEqual(len(_StubRedditHandler.queries), 3)
+
+    def test_synthetic_listings(self):
+        """
+        Testing if synthetic subreddits are paged through with unique posts
+        """
+        reddit = self._reddit_checker(['a', 'b', 'missing'], 'https://www.reddit.com', max_pages=5)
+        reddit.page_size = 10
+        mount_adapter(
+            SyntheticAdapter(pages=3, posts=10, missing_subreddits=['missing']),
+            reddit.reddit_http_handler.session,
+        )
+        pages = self._crawl(reddit)
+        post_ids = [child['id'] for children, _, _ in pages for child in children]
+
+        self.assertEqual(len(pages), 6)
+        self.assertEqual(len(set(post_ids)), 60)
+        self.assertEqual(pages[0], self._crawl(reddit)[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
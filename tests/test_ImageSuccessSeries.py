@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import ImageSuccessSeriesDBHelper
+from core.db.reddit.RedditDBFormatter import TABLE_COLUMNS, RedditDBFormatter
+from core.io.FileReader import FileReader
+from core.reddit.helper.RedditHelperClasses import RedditDataHolder
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+HOUR = 60 * 60
+
+
+def _reddit_data(post_id, ups, num_comments=0):
+    return RedditDataHolder(
+        title='Title', post_id=post_id, subreddit_id='t5_pic', subreddit_name_prefixed='r/pic',
+        subreddit_subscribers=10, ups=ups, gildings={'gid_1': 1}, num_comments=num_comments,
+        reddit_sort='top', reddit_time='day', domain='i.redd.it', url='https://i.redd.it/a.jpg',
+        permalink='/r/pic/comments/a/', created_utc=1577836800,
+    )
+
+
+class TestImageSuccessSeries(unittest.TestCase):
+    """
+    Unit-testing the popularity time series
+    """
+    def setUp(self):
+        self.db_handler = DBHandler(':memory:')
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+    def _insert(self, image_id, observed_at, ups):
+        self.db_handler.bulk_insert_to_db('image_success_series', {
+            'image_id': image_id, 'observed_at': observed_at, 'ups': ups, 'num_comments': 0, 'gildings': 0,
+        })
+
+    def test_unchanged_observations_are_skipped(self):
+        """
+        Testing if only changed observations become rows
+        """
+        reddit_db_formatter = RedditDBFormatter(timeseries=True, max_tracked_posts=1)
+        # Never reach out to google while testing
+        reddit_db_formatter.google_crawler.google_knows = True
+        posts = list(reddit_db_formatter.format_data([
+            _reddit_data('a', 1), _reddit_data('a', 1), _reddit_data('a', 2),
+        ]))
+        series = [
+            dict(zip(TABLE_COLUMNS['image_success_series'], post['image_success_series']))
+            for post in posts if 'image_success_series' in post
+        ]
+
+        self.assertEqual([row['ups'] for row in series], [1, 2])
+        self.assertEqual(series[0]['gildings'], 1)
+        self.assertIsInstance(series[0]['observed_at'], int)
+        self.assertFalse(any('image_success' in post for post in posts))
+
+        # Only the last post is remembered, 'a' is observed again after 'b'
+        posts = list(reddit_db_formatter.format_data([_reddit_data('b', 1), _reddit_data('a', 2)]))
+        self.assertEqual(sum('image_success_series' in post for post in posts), 2)
+
+    def test_rollup_keeps_last_observation_per_bucket(self):
+        """
+        Testing if old rows are reduced to one row per hour
+        """
+        now = 100 * 24 * HOUR
+        old = now - 2 * 24 * HOUR
+        for minute, ups in ((0, 1), (20, 2), (40, 3), (60, 4)):
+            self._insert('a', old + minute * 60, ups)
+        self._insert('a', now - 60, 5)
+        self.db_handler.flush()
+
+        deleted_rows = ImageSuccessSeriesDBHelper.rollup_image_success_series(self.db_handler, now=now)
+        trajectory = ImageSuccessSeriesDBHelper.image_success_trajectory(self.db_handler, 'a', end=now)
+
+        self.assertEqual(deleted_rows, 2)
+        self.assertEqual([ups for _, ups, _, _ in trajectory], [3, 4, 5])
+        self.assertEqual(ImageSuccessSeriesDBHelper.rollup_image_success_series(self.db_handler, now=now), 0)
+
+    def test_top_risers(self):
+        """
+        Testing if the gain is measured from the value at the start of the window
+        """
+        for image_id, observations in {
+            'a': ((0, 10), (2 * HOUR, 50)),
+            'b': ((0, 0), (HOUR + 1, 30), (3 * HOUR, 100)),
+            'c': ((2 * HOUR, 5), (2 * HOUR + 1, 25)),
+        }.items():
+            for observed_at, ups in observations:
+                self._insert(image_id, observed_at, ups)
+        self.db_handler.flush()
+
+        top_risers = ImageSuccessSeriesDBHelper.top_risers(self.db_handler, HOUR, 2 * HOUR + 10)
+
+        self.assertEqual(top_risers, [('a', 40), ('b', 30), ('c', 20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import unittest
+
+from helper.metrics.MetricsRegistry import Histogram, MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    """
+    Unit-testing the MetricsRegistry
+    """
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+
+    def test_histogram_quantiles(self):
+        """
+        Testing if quantiles are the upper bound of their bucket
+        """
+        histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+        for value in [0.05] * 98 + [5.0, 20.0]:
+            histogram.observe(value)
+
+        self.assertEqual(histogram.quantile(0.5), 0.1)
+        self.assertEqual(histogram.quantile(0.99), 10.0)
+        self.assertEqual(histogram.quantile(1.0), 20.0)
+        self.assertEqual(histogram.bucket_counts, [98, 0, 1, 1])
+
+    def test_concurrent_counts(self):
+        """
+        Testing if counts of many threads add up
+        """
+        def count():
+            for _ in range(1000):
+                self.metrics.count('rows')
+                self.metrics.observe('seconds', 0.001)
+
+        threads = [threading.Thread(target=count) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = self.metrics.to_dict()
+        self.assertEqual(metrics['counters']['rows'], 8000)
+        self.assertEqual(metrics['histograms']['seconds']['count'], 8000)
+
+    def test_json_export(self):
+        """
+        Testing if timers, counters and gauges are exported as JSON
+        """
+        queue_depth = [3]
+        with self.metrics.timer('stage_seconds'):
+            pass
+        self.metrics.count('bytes', 512)
+        self.metrics.gauge('queue_depth', lambda: queue_depth[0])
+        queue_depth[0] = 5
+
+        metrics = json.loads(self.metrics.to_json())
+        self.assertEqual(metrics['histograms']['stage_seconds']['count'], 1)
+        self.assertEqual(metrics['counters'], {'bytes': 512})
+        self.assertEqual(metrics['gauges'], {'queue_depth': 5})
+
+    def test_prometheus_export(self):
+        """
+        Testing if histograms are exported with cumulative buckets
+        """
+        self.metrics.observe('stage_seconds', 0.003, 'A stage')
+        self.metrics.observe('stage_seconds', 100.0)
+        self.metrics.count('rows', 2)
+        lines = self.metrics.to_prometheus(prefix='test_').splitlines()
+
+        self.assertIn('# HELP test_stage_seconds A stage', lines)
+        self.assertIn('# TYPE test_stage_seconds histogram', lines)
+        self.assertIn('test_stage_seconds_bucket{le="0.0025"} 0', lines)
+        self.assertIn('test_stage_seconds_bucket{le="0.005"} 1', lines)
+        self.assertIn('test_stage_seconds_bucket{le="60.0"} 1', lines)
+        self.assertIn('test_stage_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn('test_stage_seconds_count 2', lines)
+        self.assertIn('test_rows_total 2', lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
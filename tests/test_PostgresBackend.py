@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+from core.db import DBBackends
+from core.db.DBHandler import DBHandler
+from core.db.reddit import ImageSuccessSeriesDBHelper, RedditDBHelper
+from core.db.reddit.RedditDBFormatter import TABLE_COLUMNS, TABLE_CONVERSIONS, RedditDBFormatter
+from core.io.FileReader import FileReader
+from core.reddit.config.RedditConfigrations import reddit_configs
+from core.reddit.helper.RedditHelperClasses import RedditDataHolder
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create_postgres.sql")
+INITDB = shutil.which('initdb')
+PG_CTL = shutil.which('pg_ctl')
+# A server to test against instead of a throwaway one, e.g. of the CI, its public schema is dropped
+POSTGRES_DSN = os.environ.get('POSTGRES_TEST_DSN')
+
+
+class _FakeCopy:
+    """
+    Collects the rows of a COPY
+    """
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class _FakeCursor:
+    """
+    Records the statements of a psycopg cursor
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, parameters=None):
+        self.connection.statements.append((sql, parameters))
+
+    def executemany(self, sql, rows):
+        self.connection.statements.append((sql, list(rows)))
+
+    def copy(self, sql):
+        rows = []
+        self.connection.statements.append((sql, rows))
+        return _FakeCopy(rows)
+
+
+class _FakeConnection:
+    """
+    Records the statements of a psycopg connection without a server
+    """
+    def __init__(self):
+        self.statements = []
+        self.transactions = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def execute(self, sql, parameters=None):
+        self.statements.append((sql, parameters))
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield
+
+
+class TestPostgresStatements(unittest.TestCase):
+    """
+    Unit-testing the SQL of the PostgresBackend with a fake connection
+    """
+    def setUp(self):
+        self.backend = DBBackends.PostgresBackend('postgresql://localhost/reddit')
+        self.connection = _FakeConnection()
+
+    def test_staged_insert_statement(self):
+        """
+        Testing if ignoring inserts are staged raw and converted while inserting from the staging table
+        """
+        insert_statement = self.backend.insert_statement(
+            'images', ('id', 'upload_time'), or_ignore=True, conversions=(None, DBBackends.EPOCH_DATETIME)
+        )
+
+        self.assertEqual(
+            insert_statement.values,
+            "INSERT INTO images(id, upload_time) VALUES (%s, to_timestamp(%s::bigint) AT TIME ZONE 'UTC') "
+            "ON CONFLICT DO NOTHING",
+        )
+        self.assertEqual(insert_statement.repeats, (1, 1))
+        self.assertEqual(
+            insert_statement.staging,
+            "CREATE TEMPORARY TABLE IF NOT EXISTS staged_images_0 ON COMMIT DELETE ROWS AS "
+            "SELECT id, NULL::bigint AS upload_time FROM images WITH NO DATA",
+        )
+        self.assertEqual(insert_statement.copy, "COPY staged_images_0(id, upload_time) FROM STDIN")
+        self.assertEqual(
+            insert_statement.insert_staged,
+            "INSERT INTO images(id, upload_time) SELECT id, to_timestamp(upload_time::bigint) AT TIME ZONE 'UTC' "
+            "FROM staged_images_0 ON CONFLICT DO NOTHING",
+        )
+        self.assertEqual(self.backend.insert_statement('images', ('id', ), or_ignore=True).copy,
+                         "COPY staged_images_1(id) FROM STDIN")
+
+    def test_upsert_statement(self):
+        """
+        Testing if replacing inserts update the row of the primary key and are never staged
+        """
+        insert_statement = self.backend.insert_statement(
+            'crawl_checkpoints', ('subreddit', 'newest_created_utc'), or_replace=True
+        )
+
+        self.assertEqual(
+            insert_statement.values,
+            "INSERT INTO crawl_checkpoints(subreddit, newest_created_utc) VALUES (%s, %s) "
+            "ON CONFLICT ON CONSTRAINT crawl_checkpoints_pkey DO UPDATE SET "
+            "subreddit = EXCLUDED.subreddit, newest_created_utc = EXCLUDED.newest_created_utc",
+        )
+        self.assertIsNone(insert_statement.staging)
+        self.assertEqual(self.backend.insert_statement('subreddits', ('id', )).values,
+                         "INSERT INTO subreddits(id) VALUES (%s)")
+
+    def test_small_batches_repeat_values(self):
+        """
+        Testing if small batches use executemany, repeating values their conversion uses more than once
+        """
+        insert_statement = self.backend.insert_statement(
+            'image_success', ('image_id', 'time_passed'), or_ignore=True, conversions=(None, DBBackends.SECONDS_TIME)
+        )
+        self.backend.insert_rows(self.connection, insert_statement, [('a', 3661), ('b', 5)])
+
+        self.assertEqual(self.connection.statements, [
+            (insert_statement.values, [('a', ) + (3661, ) * 6, ('b', ) + (5, ) * 6]),
+        ])
+        self.assertEqual(self.connection.transactions, 0)
+
+    def test_large_batches_are_copied(self):
+        """
+        Testing if batches of copy_min_rows rows are COPY'd raw into the staging table within one transaction
+        """
+        insert_statement = self.backend.insert_statement(
+            'image_success', ('image_id', 'time_passed'), or_ignore=True, conversions=(None, DBBackends.SECONDS_TIME)
+        )
+        rows = [(str(index), index) for index in range(self.backend.copy_min_rows)]
+        self.backend.insert_rows(self.connection, insert_statement, rows)
+
+        self.assertEqual(self.connection.statements, [
+            (insert_statement.staging, None),
+            (insert_statement.copy, rows),
+            (insert_statement.insert_staged, None),
+        ])
+        self.assertEqual(self.connection.transactions, 1)
+
+    def test_execute_placeholders(self):
+        """
+        Testing if '?' placeholders become '%s' and a literal '%' is escaped only with parameters
+        """
+        self.backend.execute(self.connection, "SELECT id FROM images WHERE id = ? AND image_url LIKE '%.jpg'", ('a', ))
+        self.backend.execute(self.connection, "SELECT id FROM images WHERE image_url LIKE '%.jpg'")
+
+        self.assertEqual(self.connection.statements, [
+            ("SELECT id FROM images WHERE id = %s AND image_url LIKE '%%.jpg'", ('a', )),
+            ("SELECT id FROM images WHERE image_url LIKE '%.jpg'", None),
+        ])
+
+
+@unittest.skipUnless(DBBackends.psycopg and (POSTGRES_DSN or INITDB and PG_CTL), 'psycopg or PostgreSQL is not installed')
+class TestPostgresBackend(unittest.TestCase):
+    """
+    Unit-testing the DBHandler against a throwaway PostgreSQL server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = None
+        if POSTGRES_DSN:
+            cls.dsn = POSTGRES_DSN
+            return
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.data_dir = os.path.join(cls.directory.name, 'data')
+        try:
+            subprocess.run([INITDB, '-D', cls.data_dir, '-U', 'postgres', '--auth=trust'],
+                           check=True, capture_output=True)
+            # Only listens on a unix socket within the temporary directory
+            subprocess.run([PG_CTL, '-D', cls.data_dir, '-l', os.path.join(cls.directory.name, 'server.log'), '-w',
+                            '-o', f"-c listen_addresses='' -k {cls.directory.name}", 'start'],
+                           check=True, capture_output=True)
+        except subprocess.CalledProcessError as error:
+            cls.directory.cleanup()
+            raise unittest.SkipTest(f"Could not start PostgreSQL: {error.stderr.decode(errors='replace')}")
+        cls.dsn = f"host={cls.directory.name} user=postgres dbname=postgres"
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.directory is None:
+            return
+        subprocess.run([PG_CTL, '-D', cls.data_dir, '-m', 'immediate', 'stop'], capture_output=True)
+        cls.directory.cleanup()
+
+    def setUp(self):
+        self.db_handler = DBHandler(self.dsn, db_type='postgres', flush_rows=1000, flush_interval=3600)
+        self.db_handler.backend.execute(self.db_handler.connection, "DROP SCHEMA public CASCADE")
+        self.db_handler.backend.execute(self.db_handler.connection, "CREATE SCHEMA public")
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+        self.db_handler.bulk_insert_to_db('subreddits', {'id': 't5_0', 'subreddit_name_prefixed': 'r/pics'})
+        self.db_handler.flush()
+
+    def tearDown(self):
+        self.db_handler.close()
+
+    def _count(self, table_name):
+        return self.db_handler.select_from_db(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+    def test_bulk_insert_skips_duplicates(self):
+        """
+        Testing if COPY'd and single batches skip duplicates without losing the rest of the batch
+        """
+        for post_ids in (range(40), range(30, 50), [50, 50, 51]):
+            for post_id in post_ids:
+                self.db_handler.bulk_insert_to_db('images', {'id': f'{post_id}', 'subreddit_id': 't5_0'})
+            self.db_handler.flush()
+
+        self.assertEqual(self._count('images'), 52)
+        self.assertEqual(self.db_handler.bulk_insert_stats['images']['rows'], 63)
+        self.assertEqual(
+            self.db_handler.select_from_db("SELECT id FROM images WHERE id = ?", ('51', )).fetchall(), [('51', )]
+        )
+
+    def test_bulk_insert_row_conversions(self):
+        """
+        Testing if epochs are converted like SQLite3 does, whether the batch is COPY'd or not
+        """
+        self.db_handler.bulk_insert_to_db('images', {'id': 'a', 'subreddit_id': 't5_0'})
+        for copy_min_rows in (1, 1000):
+            self.db_handler.backend.copy_min_rows = copy_min_rows
+            for time_passed in (3661, 2 * 86400 + 5):
+                self.db_handler.bulk_insert_row(
+                    'image_success', TABLE_COLUMNS['image_success'],
+                    ('a', 1, 0, 5, 2, 1577836800, time_passed, None, None, None),
+                    TABLE_CONVERSIONS['image_success'],
+                )
+            self.db_handler.flush()
+
+        self.assertEqual(
+            self.db_handler.select_from_db(
+                "SELECT last_checked::text, time_passed FROM image_success ORDER BY id"
+            ).fetchall(),
+            [('2020-01-01 00:00:00', '1:01:01'), ('2020-01-01 00:00:00', '2 days, 0:00:05')] * 2,
+        )
+
+    def test_formatted_posts(self):
+        """
+        Testing if the rows formatted from crawled posts satisfy the foreign keys of every table
+        """
+        reddit_db_formatter = RedditDBFormatter()
+        # Never reach out to google while testing
+        reddit_db_formatter.google_crawler.google_knows = True
+        posts = [
+            RedditDataHolder(
+                title='Title', post_id=f'{reddit_sort}_{reddit_time}', subreddit_id='t5_pic',
+                subreddit_name_prefixed='r/pic', subreddit_subscribers=10, ups=1, gildings={}, num_comments=0,
+                reddit_sort=reddit_configs.accepted_sorts[reddit_sort],
+                reddit_time=reddit_configs.accepted_times[reddit_time],
+                domain='i.redd.it', url='https://i.redd.it/a.jpg', permalink='/r/pic/comments/a/',
+                created_utc=1577836800,
+            )
+            for reddit_sort in reddit_configs.accepted_sorts for reddit_time in reddit_configs.accepted_times
+        ]
+        for post in reddit_db_formatter.format_data(posts):
+            RedditDBHelper.insert_formatted_post(self.db_handler, post)
+        self.db_handler.flush()
+
+        self.assertEqual(self._count('image_processing'), len(posts))
+        self.assertEqual(
+            self.db_handler.select_from_db(
+                "SELECT image_success.image_id, reddit_sort.sort || '_' || reddit_time.sort FROM image_success "
+                "JOIN reddit_sort ON reddit_sort.id = image_success.reddit_sort "
+                "JOIN reddit_time ON reddit_time.id = image_success.reddit_time ORDER BY image_success.id"
+            ).fetchall(),
+            [(post.post_id, post.post_id) for post in posts],
+        )
+
+    def test_image_success_series(self):
+        """
+        Testing if the time series is rolled up and queried like with SQLite3
+        """
+        hour = 60 * 60
+        now = 100 * 24 * hour
+        old = now - 2 * 24 * hour
+        for image_id, observations in {
+            'a': ((old, 1), (old + 20 * 60, 2), (old + 40 * 60, 3), (old + hour, 4), (now - 60, 5)),
+            'b': ((old, 0), (now - 60, 30)),
+        }.items():
+            self.db_handler.bulk_insert_to_db('images', {'id': image_id, 'subreddit_id': 't5_0'})
+            for observed_at, ups in observations:
+                self.db_handler.bulk_insert_to_db('image_success_series', {
+                    'image_id': image_id, 'observed_at': observed_at, 'ups': ups, 'num_comments': 0, 'gildings': 0,
+                })
+        self.db_handler.flush()
+
+        self.assertEqual(ImageSuccessSeriesDBHelper.rollup_image_success_series(self.db_handler, now=now), 2)
+        self.assertEqual(
+            ImageSuccessSeriesDBHelper.image_success_trajectory(self.db_handler, 'a', end=now),
+            [(old + 40 * 60, 3, 0, 0), (old + hour, 4, 0, 0), (now - 60, 5, 0, 0)],
+        )
+        self.assertEqual(
+            ImageSuccessSeriesDBHelper.top_risers(self.db_handler, old + 2 * hour, now), [('b', 30), ('a', 1)]
+        )
+
+    def test_replace_to_db_moves_checkpoint(self):
+        """
+        Testing if a row with the same primary key is overwritten
+        """
+        checkpoint = {'subreddit': 'pic', 'reddit_sort': 'new', 'reddit_time': 'hour', 'newest_created_utc': 1}
+        self.db_handler.replace_to_db('crawl_checkpoints', [checkpoint])
+        self.db_handler.replace_to_db('crawl_checkpoints', [dict(checkpoint, newest_created_utc=2)])
+
+        self.assertEqual(self._count('crawl_checkpoints'), 1)
+        self.assertEqual(
+            self.db_handler.select_from_db("SELECT newest_created_utc FROM crawl_checkpoints").fetchone()[0], 2
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
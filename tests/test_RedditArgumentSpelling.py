@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from core.db.reddit.RedditDBHelper import sort_time_pairs
+from core.reddit.helper.RedditArgumentSpelling import SORT_LOOKUP, correct_sort, correct_time, typo_lookup
+
+
+class TestRedditArgumentSpelling(unittest.TestCase):
+    """
+    Unit-testing the correction of sort and time arguments
+    """
+    def test_typo_lookup(self):
+        """
+        Testing if typos within one edit map to their word and ambiguous typos are left out
+        """
+        lookup = typo_lookup(['hot', 'hat'])
+
+        self.assertEqual(lookup['hto'], 'hot')
+        self.assertEqual(lookup['hott'], 'hot')
+        self.assertEqual(lookup['hat'], 'hat')
+        self.assertNotIn('ht', lookup)
+        self.assertEqual(SORT_LOOKUP['top'], 'top')
+
+    def test_correct(self):
+        """
+        Testing if arguments are corrected by the lookup and far typos by their similarity
+        """
+        self.assertEqual(correct_sort('tpo'), 'top')
+        self.assertEqual(correct_sort('Rising'), 'rising')
+        self.assertEqual(correct_sort('controversal'), 'controversial')
+        self.assertEqual(correct_sort('contraversal'), 'controversial')
+        self.assertEqual(correct_time('weak'), 'week')
+        self.assertEqual(correct_time('all'), 'all')
+
+    def test_sort_time_pairs(self):
+        """
+        Testing if the grid is expanded from corrected arguments, each combination once
+        """
+        self.assertEqual(
+            sort_time_pairs('top tpo  new', 'dya day'),
+            [('top', 'day'), ('new', 'day')],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
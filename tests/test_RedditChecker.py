@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from core.reddit.api.requests.RedditResponseCache import RedditResponseCache
+
+
+def _listing(subreddit, amount=2, page=0, pages=1):
+    return {
+        'data': {
+            'after': f't3_{subreddit}_{page + 1}' if page + 1 < pages else None,
+            'children': [
+                {'data': {
+                    'title': f'post {index}',
+                    'id': f'{subreddit}{page}{index}',
+                    'subreddit_id': f't5_{subreddit}',
+                    'subreddit_name_prefixed': f'r/{subreddit}',
+                    'subreddit_subscribers': 10,
+                    'ups': index,
+                    'gildings': {},
+                    'num_comments': 0,
+                    'domain': 'i.redd.it',
+                    'url': f'https://i.redd.it/{subreddit}{index}.jpg',
+                    'permalink': f'/r/{subreddit}/comments/{index}/',
+                    'created_utc': 1577836800 + index,
+                    'post_hint': 'image',
+                }}
+                for index in range(amount)
+            ],
+        },
+    }
+
+
+class _StubRedditHandler(BaseHTTPRequestHandler):
+    """
+    Serves a fake listing for /r/<subreddit>/<sort>/.json
+    Subreddits starting with 'missing' answer with a 404,
+    subreddits starting with 'deep' have three pages.
+    Every listing has an ETag and is answered with 304, if it matches.
+    """
+    protocol_version = 'HTTP/1.1'
+    delay = 0.0
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+    queries = []
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(cls.delay)
+        with cls.lock:
+            cls.running -= 1
+
+        url = urlparse(self.path)
+        subreddit = url.path.split('/')[2]
+        cls.queries.append(parse_qs(url.query))
+        if subreddit.startswith('missing'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        etag = f'"{subreddit}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        after = parse_qs(url.query).get('after', ['_0'])[0]
+        page = int(after.rsplit('_', 1)[1])
+        pages = 3 if subreddit.startswith('deep') else 1
+        body = json.dumps(_listing(subreddit, page=page, pages=pages)).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRedditChecker(unittest.TestCase):
+    """
+    Unit-testing the RedditChecker against a local stub server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubRedditHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubRedditHandler.delay = 0.0
+        _StubRedditHandler.max_running = 0
+        _StubRedditHandler.queries = []
+
+    def _reddit_checker(self, subreddits, max_workers, max_pages=1, response_cache=None):
+        reddit = RedditChecker(
+            subreddits, db_file_path=':memory:', max_workers=max_workers, max_pages=max_pages
+        )
+        reddit.reddit_http_handler = RedditHttpHandler(
+            base_url=self.base_url, pool_maxsize=max_workers, response_cache=response_cache
+        )
+        # Never reach out to google while testing
+        reddit.reddit_db_formatter.google_crawler.google_knows = True
+        return reddit
+
+    def test_generate_reddit_json_keeps_order(self):
+        """
+        Testing if the concurrent stream equals the sequential one
+        """
+        subreddits = ['pic', 'missing1', 'earthporn', 'spaceporn']
+        sequential = list(self._reddit_checker(subreddits, 1)._generate_reddit_json('top', 'day'))
+        concurrent = list(self._reddit_checker(subreddits, 4)._generate_reddit_json('top', 'day'))
+
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual(
+            [children[0]['subreddit_id'] for children, _, _ in concurrent],
+            ['t5_pic', 't5_earthporn', 't5_spaceporn'],
+        )
+        self.assertTrue(all(sort == 'top' and t == 'day' for _, sort, t in concurrent))
+
+    def test_generate_reddit_json_concurrency_limit(self):
+        """
+        Testing if at most max_workers requests are running at once
+        """
+        _StubRedditHandler.delay = 0.05
+        subreddits = [f'sub{index}' for index in range(12)]
+        result = list(self._reddit_checker(subreddits, 3)._generate_reddit_json('new', 'hour'))
+
+        self.assertEqual(len(result), 12)
+        self.assertLessEqual(_StubRedditHandler.max_running, 3)
+        self.assertGreater(_StubRedditHandler.max_running, 1)
+
+    def test_misspelled_arguments(self):
+        """
+        Testing if misspelled sort and time arguments are corrected before the first request
+        """
+        reddit = self._reddit_checker(['pic', 'earthporn'], 2)
+        result = list(reddit._generate_reddit_json('tpo', 'dya'))
+
+        self.assertTrue(all(sort == 'top' and t == 'day' for _, sort, t in result))
+        self.assertEqual(reddit.reddit_http_handler.connection_stats['requests'], 2)
+        self.assertEqual([query['t'] for query in _StubRedditHandler.queries], [['day'], ['day']])
+
+    def test_pagination_follows_after_cursor(self):
+        """
+        Testing if pages are followed until the page budget is used up
+        """
+        reddit = self._reddit_checker(['deep', 'pic'], 2, max_pages=2)
+        result = list(reddit._generate_reddit_json('top', 'all'))
+
+        self.assertEqual(
+            [children[0]['id'] for children, _, _ in result],
+            ['deep00', 'deep10', 'pic00'],
+        )
+        self.assertTrue(all(query['limit'] == ['100'] for query in _StubRedditHandler.queries))
+
+    def test_pagination_stops_without_cursor(self):
+        """
+        Testing if the last page ends the listing before the budget is used up
+        """
+        result = list(self._reddit_checker(['deep'], 2, max_pages=10)._generate_reddit_json('new', 'hour'))
+
+        self.assertEqual(len(result), 3)
+        self.assertEqual(len(_StubRedditHandler.queries), 3)
+
+    def test_connections_are_reused(self):
+        """
+        Testing if the pooled session keeps its connections alive
+        """
+        subreddits = [f'sub{index}' for index in range(12)]
+        reddit = self._reddit_checker(subreddits, 3)
+        list(reddit._generate_reddit_json('new', 'hour'))
+        connection_stats = reddit.reddit_http_handler.connection_stats
+
+        self.assertEqual(connection_stats['requests'], 12)
+        self.assertLessEqual(connection_stats['connections_opened'], 3)
+        self.assertGreaterEqual(connection_stats['connections_reused'], 9)
+
+    def test_response_cache_hits(self):
+        """
+        Testing if fresh listings are served without a request
+        """
+        response_cache = RedditResponseCache(':memory:')
+        first = list(self._reddit_checker(['pic'], 2, response_cache=response_cache)
+                     ._generate_reddit_json('top', 'all'))
+        second = list(self._reddit_checker(['pic'], 2, response_cache=response_cache)
+                      ._generate_reddit_json('top', 'all'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(_StubRedditHandler.queries), 1)
+        self.assertEqual(response_cache.stats['hits'], 1)
+
+    def test_response_cache_revalidates(self):
+        """
+        Testing if expired listings are revalidated with their ETag
+        """
+        response_cache = RedditResponseCache(':memory:', cache_ttls={}, default_ttl=-1)
+        first = list(self._reddit_checker(['pic'], 2, response_cache=response_cache)
+                     ._generate_reddit_json('new', 'hour'))
+        second = list(self._reddit_checker(['pic'], 2, response_cache=response_cache)
+                      ._generate_reddit_json('new', 'hour'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(_StubRedditHandler.queries), 2)
+        self.assertEqual(response_cache.stats['revalidations'], 1)
+
+    def test_incremental_new_stops_at_checkpoint(self):
+        """
+        Testing if a 'new' listing ends at the high-water mark of an earlier run
+        """
+        reddit = self._reddit_checker(['deep'], 2, max_pages=3)
+        reddit.incremental = True
+        reddit.crawl_checkpoints[('deep', 'new', 'hour')] = (1577836800, 't3_deep00')
+        result = list(reddit._generate_reddit_json('new', 'hour'))
+
+        self.assertEqual([[child['id'] for child in children] for children, _, _ in result], [['deep01']])
+        self.assertEqual(len(_StubRedditHandler.queries), 1)
+
+        crawl_checkpoints = reddit.crawl_checkpoint_rows()
+        self.assertEqual(len(crawl_checkpoints), 1)
+        self.assertEqual(crawl_checkpoints[0]['newest_created_utc'], 1577836801)
+        self.assertEqual(crawl_checkpoints[0]['newest_fullname'], 't3_deep01')
+        self.assertEqual(crawl_checkpoints[0]['new_posts'], 1)
+        self.assertEqual(reddit.crawl_checkpoint_rows(), [])
+
+    def test_incremental_checkpoint_within_one_second(self):
+        """
+        Testing if posts of the checkpoint's second are ordered by their id instead of all counting as newer
+        """
+        reddit = self._reddit_checker(['pic'], 1)
+        reddit.crawl_checkpoints[('pic', 'new', 'hour')] = (1577836800, 't3_abc')
+        job_checkpoint = reddit._start_checkpoint('pic', 'new', 'hour')
+        children = [
+            {'id': 'abe', 'name': 't3_abe', 'created_utc': 1577836800},
+            {'id': 'abd', 'name': 't3_abd', 'created_utc': 1577836800},
+            {'id': 'abc', 'name': 't3_abc', 'created_utc': 1577836800},
+            {'id': 'abb', 'name': 't3_abb', 'created_utc': 1577836800},
+            {'id': 'zz', 'name': 't3_zz', 'created_utc': 1577836800},
+        ]
+        remaining, reached_checkpoint = reddit._skip_ingested_posts(job_checkpoint, children)
+
+        self.assertEqual([child['id'] for child in remaining], ['abe', 'abd'])
+        self.assertTrue(reached_checkpoint)
+        self.assertEqual((job_checkpoint['newest_fullname'], job_checkpoint['new_posts']), ('t3_abe', 2))
+
+    def test_incremental_stops_at_known_page(self):
+        """
+        Testing if other listings end once every image on a page is known
+        """
+        reddit = self._reddit_checker(['deep'], 2, max_pages=3)
+        reddit.incremental = True
+        reddit.reddit_db_formatter.seen_posts.update({'deep00', 'deep01'})
+        result = list(reddit._generate_reddit_json('top', 'all'))
+
+        self.assertEqual(len(result), 1)
+        self.assertEqual(len(_StubRedditHandler.queries), 1)
+        self.assertEqual(reddit.crawl_checkpoint_rows()[0]['newest_fullname'], 't3_deep01')
+
+    def test_subreddit_grid_data(self):
+        """
+        Testing if all sort and time combinations are formatted
+        """
+        reddit = self._reddit_checker(['pic', 'earthporn'], 4)
+        posts = list(reddit.subreddit_grid_data([('top', 'day'), ('top', 'week')]))
+        # The google lookups of the last posts are finished on close
+        posts.extend(reddit.reddit_db_formatter.close())
+
+        self.assertEqual(sum('image_success' in post for post in posts), 8)
+        self.assertEqual(sum('images' in post for post in posts), 4)
+        self.assertEqual(sum('image_processing' in post for post in posts), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import time
+import unittest
+
+from core.db.DBBackends import EPOCH_DATETIME, SECONDS_TIME
+from core.db.DBHandler import DBHandler
+from core.db.reddit import RedditDBHelper
+from core.db.reddit.RedditDBFormatter import TABLE_COLUMNS, TABLE_CONVERSIONS, RedditDBFormatter
+from core.io.FileReader import FileReader
+from core.reddit.helper.RedditHelperClasses import RedditDataHolder
+from helper.google.GoogleCrawler import GoogleCrawler
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+def _reddit_data(post_id, ups=1, subreddit_id='t5_pic', created_utc=1577836800):
+    return RedditDataHolder(
+        title='Title', post_id=post_id, subreddit_id=subreddit_id, subreddit_name_prefixed='r/pic',
+        subreddit_subscribers=10, ups=ups, gildings={'gid_1': 1, 'gid_3': 2}, num_comments=3,
+        reddit_sort='top', reddit_time='day', domain='i.redd.it', url=f'https://i.redd.it/{post_id}.jpg',
+        permalink=f'/r/pic/comments/{post_id}/', created_utc=created_utc,
+    )
+
+
+class TestRedditDBFormatter(unittest.TestCase):
+    """
+    Unit-testing the slotted post records and the row tuples formatted from them
+    """
+    def setUp(self):
+        self.reddit_db_formatter = RedditDBFormatter()
+        # Never reach out to google while testing
+        self.reddit_db_formatter.google_crawler.google_knows = True
+
+    def test_slotted_record(self):
+        """
+        Testing if a record has no __dict__, is compared by its fields and is not hashable
+        """
+        reddit_data = _reddit_data('a')
+
+        self.assertFalse(hasattr(reddit_data, '__dict__'))
+        with self.assertRaises(AttributeError):
+            reddit_data.selftext = 'text'
+        self.assertEqual(reddit_data, _reddit_data('a'))
+        self.assertNotEqual(reddit_data, _reddit_data('a', ups=2))
+        self.assertNotEqual(reddit_data, 'a')
+        with self.assertRaises(TypeError):
+            hash(reddit_data)
+        self.assertTrue(repr(reddit_data).startswith("RedditData(title='Title', post_id='a', "))
+
+    def test_rows_follow_table_columns(self):
+        """
+        Testing if every row tuple has a value for every column of its table, in order
+        """
+        started = int(time.time())
+        formatted = list(self.reddit_db_formatter.format_data([_reddit_data('a', created_utc=started - 90)]))
+
+        self.assertEqual(len(formatted), 1)
+        post = formatted[0]
+        self.assertEqual(set(post), {'subreddits', 'images', 'image_processing', 'image_success'})
+        for table_name, row in post.items():
+            self.assertIsInstance(row, tuple)
+            self.assertEqual(len(row), len(TABLE_COLUMNS[table_name]))
+
+        self.assertEqual(post['subreddits'], ('t5_pic', 'r/pic', 10))
+        self.assertEqual(post['images'], ('a', 't5_pic', 'https://i.redd.it/a.jpg', '/r/pic/comments/a/', started - 90))
+        self.assertEqual(post['image_processing'], ('a', 'Title', None, None, None))
+
+        image_success = dict(zip(TABLE_COLUMNS['image_success'], post['image_success']))
+        self.assertEqual((image_success['gid_1'], image_success['gid_2'], image_success['gid_3']), (1, None, 2))
+        self.assertGreaterEqual(image_success['last_checked'], started)
+        self.assertEqual(image_success['time_passed'], image_success['last_checked'] - started + 90)
+
+    def test_seen_posts_only_add_success(self):
+        """
+        Testing if subreddits and images are formatted once, image_success rows on every observation
+        """
+        posts = [_reddit_data('a'), _reddit_data('b'), _reddit_data('a', ups=5), _reddit_data('c', subreddit_id='t5_art')]
+        formatted = list(self.reddit_db_formatter.format_data(posts))
+
+        self.assertEqual([sorted(post) for post in formatted], [
+            ['image_processing', 'image_success', 'images', 'subreddits'],
+            ['image_processing', 'image_success', 'images'],
+            ['image_success'],
+            ['image_processing', 'image_success', 'images', 'subreddits'],
+        ])
+        self.assertEqual(formatted[2]['image_success'][:2], ('a', 5))
+
+    def test_table_conversions(self):
+        """
+        Testing if only the timestamp columns are converted by the database
+        """
+        self.assertEqual(TABLE_CONVERSIONS['images'], (None, None, None, None, EPOCH_DATETIME))
+        self.assertEqual(
+            TABLE_CONVERSIONS['image_success'],
+            (None, None, None, None, None, EPOCH_DATETIME, SECONDS_TIME, None, None, None),
+        )
+        self.assertIsNone(TABLE_CONVERSIONS['subreddits'])
+        self.assertIsNone(TABLE_CONVERSIONS['image_success_series'])
+
+    def test_rows_insert_converted(self):
+        """
+        Testing if inserted row tuples store created_utc as the UTC upload_time
+        """
+        db_handler = DBHandler(':memory:')
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        for post in self.reddit_db_formatter.format_data([_reddit_data('a'), _reddit_data('a', ups=2)]):
+            RedditDBHelper.insert_formatted_post(db_handler, post)
+        db_handler.flush()
+
+        self.assertEqual(
+            db_handler.select_from_db("SELECT id, upload_time FROM images").fetchall(),
+            [('a', '2020-01-01 00:00:00')],
+        )
+        self.assertEqual(
+            db_handler.select_from_db("SELECT ups FROM image_success ORDER BY id").fetchall(), [(1, ), (2, )]
+        )
+        db_handler.close()
+
+    def test_google_lookups_do_not_block(self):
+        """
+        Testing if format_data returns before the lookups are finished and close returns their rows
+        """
+        reddit_db_formatter = RedditDBFormatter(google_workers=1, google_rate=1000)
+        release = threading.Event()
+
+        def search(image_url, content_hash=None):
+            release.wait()
+            return dict(GoogleCrawler.empty_result(), guess=image_url)
+        reddit_db_formatter.google_crawler.search = search
+
+        formatted = list(reddit_db_formatter.format_data([_reddit_data('a'), _reddit_data('b')]))
+        release.set()
+        remaining = reddit_db_formatter.close()
+
+        self.assertFalse(any('image_processing' in post for post in formatted))
+        self.assertEqual(
+            sorted(post['image_processing'][:3:2] for post in remaining),
+            [('a', 'https://i.redd.it/a.jpg'), ('b', 'https://i.redd.it/b.jpg')],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from core.reddit.api.RedditDownloader import RedditDownloader
+
+IMAGES = {
+    '/a.jpg': b'A' * 200000,
+    '/repost.jpg': b'A' * 200000,
+    '/b.png': b'B' * 1000,
+}
+
+
+class _StubImageHandler(BaseHTTPRequestHandler):
+    """
+    Serves IMAGES and supports simple 'bytes=N-' range requests
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path not in IMAGES:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = IMAGES[self.path]
+        range_header = self.headers.get('Range')
+        if range_header:
+            body = body[int(range_header[len('bytes='):-1]):]
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRedditDownloader(unittest.TestCase):
+    """
+    Unit-testing the RedditDownloader against a local stub server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubImageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.reddit_downloader = RedditDownloader(self.directory.name, max_workers=2, chunk_size=4096)
+
+    def tearDown(self):
+        self.reddit_downloader.close()
+        self.directory.cleanup()
+
+    def test_download_is_content_addressed(self):
+        """
+        Testing if duplicates are stored once and failures are skipped
+        """
+        images = [
+            ('1', self.base_url + '/a.jpg'),
+            ('2', self.base_url + '/repost.jpg'),
+            ('3', self.base_url + '/b.png'),
+            ('4', self.base_url + '/missing.jpg'),
+            ('5', self.base_url + '/a.jpg'),
+        ]
+        image_files = list(self.reddit_downloader.download(images))
+
+        self.assertEqual([image_file['image_id'] for image_file in image_files], ['1', '2', '3', '5'])
+        self.assertEqual(image_files[0]['file_path'], image_files[1]['file_path'])
+        self.assertEqual(image_files[0]['sha256'], hashlib.sha256(IMAGES['/a.jpg']).hexdigest())
+        self.assertTrue(image_files[2]['file_path'].endswith('.png'))
+        self.assertEqual(self.reddit_downloader.stats['duplicates'], 1)
+        self.assertEqual(self.reddit_downloader.stats['failed'], 1)
+        with open(image_files[0]['file_path'], 'rb') as image_file:
+            self.assertEqual(image_file.read(), IMAGES['/a.jpg'])
+
+    def test_download_resumes_partial_file(self):
+        """
+        Testing if an interrupted download only fetches the missing bytes
+        """
+        image_url = self.base_url + '/a.jpg'
+        partial_path = os.path.join(
+            self.reddit_downloader.partial_dir, hashlib.sha1(image_url.encode()).hexdigest() + '.part'
+        )
+        with open(partial_path, 'wb') as partial_file:
+            partial_file.write(IMAGES['/a.jpg'][:150000])
+
+        image_file, = self.reddit_downloader.download([('1', image_url)])
+
+        self.assertEqual(image_file['size'], 200000)
+        self.assertEqual(image_file['sha256'], hashlib.sha256(IMAGES['/a.jpg']).hexdigest())
+        self.assertEqual(self.reddit_downloader.stats['bytes'], 50000)
+        self.assertFalse(os.path.exists(partial_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
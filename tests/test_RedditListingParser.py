@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import json
+import unittest
+
+from core.reddit.helper.RedditListingParser import CHILD_FIELDS, PARSER_BACKENDS, parse_listing
+
+
+def _listing_page():
+    return json.dumps({
+        'kind': 'Listing',
+        'data': {
+            'after': 't3_b',
+            'dist': 2,
+            'children': [
+                {'kind': 't3', 'data': {
+                    'id': 'a',
+                    'name': 't3_a',
+                    'title': 'first',
+                    'gildings': {'gid_1': 2},
+                    'created_utc': 1577836800.0,
+                    'ups': 5,
+                    'post_hint': 'image',
+                    'preview': {'images': [{'source': {'url': 'x', 'title': 'not projected'}}]},
+                    'all_awardings': [{'id': 'award', 'name': 'not projected'}],
+                }},
+                {'kind': 't3', 'data': {
+                    'id': 'b',
+                    'title': 'second',
+                    'gildings': {},
+                    'created_utc': 1577836801,
+                    'selftext': 'not projected',
+                }},
+            ],
+        },
+    }).encode()
+
+
+class TestRedditListingParser(unittest.TestCase):
+    """
+    Unit-testing the listing parser backends
+    """
+    def test_backends_project_the_same_fields(self):
+        """
+        Testing if every installed backend keeps exactly the projected fields
+        """
+        expected = [
+            {'id': 'a', 'name': 't3_a', 'title': 'first', 'gildings': {'gid_1': 2},
+             'created_utc': 1577836800.0, 'ups': 5, 'post_hint': 'image'},
+            {'id': 'b', 'title': 'second', 'gildings': {}, 'created_utc': 1577836801},
+        ]
+        for backend in PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                children, after = parse_listing(_listing_page(), backend)
+
+                self.assertEqual(children, expected)
+                self.assertEqual(after, 't3_b')
+                self.assertTrue(all(set(child) <= CHILD_FIELDS for child in children))
+
+    def test_last_page(self):
+        """
+        Testing if a missing cursor ends the listing
+        """
+        content = json.dumps({'data': {'after': None, 'children': []}}).encode()
+        for backend in PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(parse_listing(content, backend), ([], None))
+
+    def test_no_listing(self):
+        """
+        Testing if an answer without listing raises a KeyError
+        """
+        for backend in PARSER_BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(KeyError):
+                    parse_listing(b'{"error": 404}', backend)
+
+    def test_unknown_backend(self):
+        """
+        Testing if an unknown backend names the available ones
+        """
+        with self.assertRaises(KeyError):
+            parse_listing(_listing_page(), 'simdjson')
+
+
+if __name__ == '__main__':
+    unittest.main()
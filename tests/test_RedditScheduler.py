@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+
+from core.db.DBHandler import DBHandler
+from core.io.FileReader import FileReader
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.RedditScheduler import RedditScheduler
+from core.reddit.api.requests.RedditHttpHandler import RedditHttpHandler
+from tests.test_RedditChecker import _StubRedditHandler
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRedditScheduler(unittest.TestCase):
+    """
+    Unit-testing the RedditScheduler against a local stub server
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _StubRedditHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubRedditHandler.delay = 0.0
+        _StubRedditHandler.queries = []
+
+        self.db_handler = DBHandler(':memory:')
+        self.db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+
+        reddit = RedditChecker(['pic', 'missing1'], db_file_path=None, max_workers=2, google_workers=0)
+        reddit.reddit_http_handler = RedditHttpHandler(base_url=self.base_url, pool_maxsize=2)
+        # Never reach out to google while testing
+        reddit.reddit_db_formatter.google_crawler.google_knows = True
+
+        self.clock = _Clock()
+        self.reddit_scheduler = RedditScheduler(
+            reddit, self.db_handler, [('new', 'hour')], min_interval=60, max_interval=3600,
+            initial_interval=300, clock=self.clock,
+        )
+
+    def _count(self, table_name):
+        return self.db_handler.connection.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+
+    def test_due_jobs_are_crawled_and_stored(self):
+        """
+        Testing if all jobs run at once and their data and checkpoints are stored
+        """
+        self.reddit_scheduler.run(max_batches=1)
+        stats = self.reddit_scheduler.stats
+
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(self._count('images'), 2)
+        self.assertEqual(self._count('crawl_checkpoints'), 1)
+        self.assertGreater(stats['jobs']['pic/new/hour']['last_duration'], 0)
+        self.assertEqual(self.reddit_scheduler.schedule[0][0], self.clock.now + 300)
+
+    def test_quiet_jobs_are_polled_less(self):
+        """
+        Testing if a crawl without new posts doubles the interval
+        """
+        self.reddit_scheduler.run_due_jobs()
+        self.clock.now += 300
+        self.reddit_scheduler.run_due_jobs()
+        stats = self.reddit_scheduler.stats
+
+        self.assertEqual(stats['jobs']['pic/new/hour']['interval'], 600)
+        self.assertEqual(stats['jobs']['pic/new/hour']['runs'], 2)
+        # The missing subreddit is not requested again
+        self.assertEqual(len(_StubRedditHandler.queries), 3)
+
+    def test_busy_jobs_are_polled_more(self):
+        """
+        Testing if the interval follows the post velocity and stays within its bounds
+        """
+        job_stats = {'interval': 300.0, 'last_run': 0.0}
+
+        # 10 posts within 100 seconds, 25 posts are expected after 250 seconds
+        self.assertEqual(self.reddit_scheduler._next_interval(job_stats, 10, 100.0), 275)
+        self.assertEqual(self.reddit_scheduler._next_interval(job_stats, 100, 100.0), 150)
+        self.assertEqual(self.reddit_scheduler._next_interval(dict(job_stats, interval=80), 100, 100.0), 60)
+
+    def test_initial_interval_within_bounds(self):
+        """
+        Testing if an initial interval outside of the bounds is clamped before the second crawl
+        """
+        for initial_interval, interval in ((5, 60), (7200, 3600)):
+            reddit_scheduler = RedditScheduler(
+                self.reddit_scheduler.reddit, self.db_handler, [('new', 'hour')], min_interval=60,
+                max_interval=3600, initial_interval=initial_interval, clock=self.clock,
+            )
+            reddit_scheduler.run_due_jobs()
+
+            self.assertEqual(reddit_scheduler.stats['jobs']['pic/new/hour']['interval'], interval)
+            self.assertEqual(reddit_scheduler.schedule[0][0], self.clock.now + interval)
+
+
+if __name__ == '__main__':
+    unittest.main()
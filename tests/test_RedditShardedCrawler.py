@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import time
+import unittest
+
+from core.db.DBHandler import DBHandler
+from core.io.FileReader import FileReader
+from core.reddit.api.RedditChecker import RedditChecker
+from core.reddit.api.RedditShardedCrawler import RedditShardedCrawler, _shard_checker
+from helper.replay.HttpCassette import HttpCassette, mount_adapter
+from helper.replay.SyntheticData import SyntheticAdapter
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+SUBREDDITS = ['a', 'b', 'c']
+CHECKER_OPTIONS = {'max_workers': 2, 'max_pages': 2, 'page_size': 20, 'google_workers': 0}
+
+
+class _RecordingSyntheticAdapter(SyntheticAdapter):
+    """
+    Answers with synthetic pages and records them into a cassette
+    """
+    def __init__(self, http_cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.http_cassette = http_cassette
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.http_cassette.save(response)
+        return response
+
+
+class TestRedditShardedCrawler(unittest.TestCase):
+    """
+    Unit-testing the RedditShardedCrawler with replayed synthetic subreddits
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.cassette = tempfile.TemporaryDirectory()
+        reddit = RedditChecker(SUBREDDITS, db_file_path=None, incremental=True, **CHECKER_OPTIONS)
+        mount_adapter(
+            _RecordingSyntheticAdapter(HttpCassette(cls.cassette.name), pages=2, posts=20),
+            reddit.reddit_http_handler.session, reddit.reddit_db_formatter.google_crawler.session,
+        )
+        cls.posts = list(reddit.subreddit_grid_data([('top', 'day')]))
+        cls.checkpoints = {
+            checkpoint['subreddit']: checkpoint['newest_created_utc'] for checkpoint in reddit.crawl_checkpoint_rows()
+        }
+        reddit.reddit_http_handler.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cassette.cleanup()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file_path = os.path.join(self.directory.name, 'reddit.db')
+        db_handler = DBHandler(self.db_file_path)
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        db_handler.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _crawler(self, **kwargs):
+        return RedditShardedCrawler(
+            SUBREDDITS, self.db_file_path, processes=2,
+            checker_options=dict(CHECKER_OPTIONS, replay_dir=self.cassette.name), **kwargs
+        )
+
+    def test_sharded_crawl(self):
+        """
+        Testing if the shards write the posts and checkpoints of a crawl in a single process
+        """
+        crawler = self._crawler(rows_per_message=7, incremental=True)
+        crawler.crawl([('top', 'day')])
+
+        db_handler = DBHandler(self.db_file_path)
+        image_ids = {row[0] for row in db_handler.select_from_db("SELECT id FROM images").fetchall()}
+        checkpoints = dict(db_handler.select_from_db(
+            "SELECT subreddit, newest_created_utc FROM crawl_checkpoints"
+        ).fetchall())
+        db_handler.close()
+
+        self.assertEqual(len(self.posts), 120)
+        self.assertEqual(image_ids, {post['images'][0] for post in self.posts})
+        self.assertEqual(crawler.bulk_insert_stats['images']['rows'], 120)
+        self.assertEqual(checkpoints, self.checkpoints)
+        self.assertEqual(set(checkpoints), set(SUBREDDITS))
+
+    def test_dead_writer_stops_workers(self):
+        """
+        Testing if the workers are stopped instead of waiting forever on the queue of a crashed writer
+        """
+        crawler = self._crawler(rows_per_message=1, queue_size=1, db_options={'db_type': 'unknown'})
+
+        started = time.perf_counter()
+        crawler.crawl([('top', 'day')])
+
+        self.assertLess(time.perf_counter() - started, 60)
+        self.assertEqual(crawler.bulk_insert_stats, {})
+
+    def test_shards_share_the_rates(self):
+        """
+        Testing if every worker asks reddit and google with its share of the rates
+        """
+        reddit = _shard_checker(
+            SUBREDDITS, dict(CHECKER_OPTIONS, google_workers=1, request_rate=2.0, google_rate=1.0, shards=4),
+            incremental=False,
+        )
+        reddit.reddit_http_handler.close()
+        reddit.reddit_db_formatter.close()
+
+        self.assertEqual(reddit.reddit_http_handler.rate_limiter.max_rate, 0.5)
+        self.assertEqual(reddit.reddit_db_formatter.google_search_pool.token_bucket.rate, 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from helper.dedup.SeenSet import BloomSeenSet, CompactSeenSet, create_seen_set
+
+
+class TestSeenSet(unittest.TestCase):
+    """
+    Unit-testing the seen set backends
+    """
+    def test_compact_seen_set_is_exact(self):
+        """
+        Testing if every added id is found, no other id is found and the table grows
+        """
+        seen_set = CompactSeenSet(capacity=4)
+        post_ids = [f'{number:x}z' for number in range(1000)]
+        seen_set.update(post_ids)
+        seen_set.update(post_ids[:10])
+
+        self.assertEqual(len(seen_set), 1000)
+        self.assertTrue(all(post_id in seen_set for post_id in post_ids))
+        self.assertFalse(any(f'{number:x}y' in seen_set for number in range(1000)))
+        self.assertGreaterEqual(len(seen_set.slots), 1000 / seen_set.max_load)
+
+    def test_compact_seen_set_keys(self):
+        """
+        Testing if fullnames match their id and undecodable keys are kept exactly
+        """
+        seen_set = CompactSeenSet()
+        seen_set.add('t3_hx3k2a')
+        seen_set.add('not-base-36')
+
+        self.assertIn('hx3k2a', seen_set)
+        self.assertIn('not-base-36', seen_set)
+        self.assertNotIn('not-base-37', seen_set)
+        self.assertEqual(len(seen_set), 2)
+
+    def test_compact_seen_set_ambiguous_keys(self):
+        """
+        Testing if keys, which would decode to a negative or an already used number, are kept exactly
+        """
+        seen_set = CompactSeenSet()
+
+        self.assertNotIn('-1', seen_set)
+        seen_set.update(['-1', '+a', ' b', '0c'])
+
+        self.assertIn('-1', seen_set)
+        self.assertNotIn('1', seen_set)
+        self.assertNotIn('a', seen_set)
+        self.assertNotIn('b', seen_set)
+        self.assertNotIn('c', seen_set)
+        self.assertEqual(len(seen_set), 4)
+
+    def test_bloom_seen_set_error_rate(self):
+        """
+        Testing if added keys are always found and the false positive rate holds
+        """
+        seen_set = BloomSeenSet(capacity=10000, error_rate=0.01)
+        seen_set.update(f'post{index}' for index in range(10000))
+        false_positives = sum(f'other{index}' in seen_set for index in range(10000))
+
+        self.assertTrue(all(f'post{index}' in seen_set for index in range(10000)))
+        self.assertLess(false_positives / 10000, 0.02)
+        self.assertLess(seen_set.memory_bytes, 10000 * 2)
+
+    def test_memory_footprint(self):
+        """
+        Testing if the compact set needs less memory than a Python set
+        """
+        post_ids = [f'{number:x}' for number in range(36 ** 4, 36 ** 4 + 10000)]
+        python_set = create_seen_set('set')
+        compact_set = create_seen_set('exact')
+        python_set.update(post_ids)
+        compact_set.update(post_ids)
+
+        self.assertLess(compact_set.memory_bytes * 3, python_set.memory_bytes)
+
+    def test_unknown_backend(self):
+        """
+        Testing if an unknown backend names the available ones
+        """
+        with self.assertRaises(KeyError):
+            create_seen_set('cuckoo')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import argparse
+import time
+import unittest
+
+from cmd_line_args import positive_float
+from helper.ratelimit.TokenBucket import TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+    """
+    Unit-testing the TokenBucket
+    """
+    def test_refill(self):
+        """
+        Testing if a token is taken right away from a full bucket and refilled at the rate
+        """
+        token_bucket = TokenBucket(rate=50)
+        started = time.perf_counter()
+        token_bucket.acquire()
+        self.assertFalse(token_bucket.try_acquire())
+        token_bucket.acquire()
+
+        self.assertGreaterEqual(time.perf_counter() - started, 0.015)
+
+    def test_rate_above_zero(self):
+        """
+        Testing if a bucket, which would never refill, is refused by the bucket and the arguments
+        """
+        for rate in (0, -1):
+            self.assertRaises(ValueError, TokenBucket, rate)
+            self.assertRaises(argparse.ArgumentTypeError, positive_float, str(rate))
+        self.assertEqual(positive_float('0.5'), 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
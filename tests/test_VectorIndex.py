@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from core.db.DBHandler import DBHandler
+from core.db.reddit import EmbeddingDBHelper
+from core.image.EmbeddingStore import EmbeddingStore
+from core.image.VectorIndex import BruteForceIndex, IVFPQIndex, load_vector_index
+from core.io.FileReader import FileReader
+
+
+SQL_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "sql", "create.sql")
+
+
+class TestVectorIndex(unittest.TestCase):
+    """
+    Unit-testing the vector indexes against a brute-force NumPy search
+    """
+    @classmethod
+    def setUpClass(cls):
+        random = np.random.default_rng(0)
+        centers = random.normal(size=(50, 32))
+        vectors = centers[random.integers(0, 50, size=2000)] + 0.3 * random.normal(size=(2000, 32))
+        cls.vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+        cls.ids = [str(position) for position in range(len(cls.vectors))]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _exact(self, query_vector, k):
+        distances = ((self.vectors - query_vector) ** 2).sum(axis=1)
+        return [self.ids[position] for position in np.argsort(distances)[:k]]
+
+    def test_brute_force(self):
+        """
+        Testing if the brute-force index finds the exact neighbours, also of vectors added after a query
+        """
+        vector_index = BruteForceIndex(32)
+        vector_index.add(self.ids[:1000], self.vectors[:1000])
+        self.assertIn(vector_index.query(self.vectors[1500], k=1)[0][0], self.ids[:1000])
+        vector_index.add(self.ids[1000:], self.vectors[1000:])
+
+        for query_vector in self.vectors[::200]:
+            matches = vector_index.query(query_vector, k=5)
+            self.assertEqual([match_id for match_id, _ in matches], self._exact(query_vector, 5))
+            self.assertAlmostEqual(matches[0][1], 0, places=5)
+
+    def test_ivfpq(self):
+        """
+        Testing if IVF-PQ finds the query vector itself and reranks to exact distances
+        """
+        vector_index = IVFPQIndex(32, lists=16, subvectors=8, probes=4)
+        vector_index.add(self.ids[:1000], self.vectors[:1000])
+        vector_index.train()
+        vector_index.add(self.ids[1000:], self.vectors[1000:])
+
+        recalled = 0
+        for position in range(0, 2000, 50):
+            matches = vector_index.query(self.vectors[position], k=10, rerank_vectors=self.vectors)
+            self.assertEqual(matches[0][0], self.ids[position])
+            recalled += len({match_id for match_id, _ in matches} & set(self._exact(self.vectors[position], 10)))
+        self.assertGreater(recalled / 400, 0.8)
+
+    def test_ivfpq_postpones_training(self):
+        """
+        Testing if IVF-PQ searches exactly until it has enough vectors to train all its lists
+        """
+        vector_index = IVFPQIndex(32, lists=16, subvectors=8, probes=4)
+        vector_index.add(self.ids[:10], self.vectors[:10])
+        exact_index = BruteForceIndex(32)
+        exact_index.add(self.ids[:10], self.vectors[:10])
+        self.assertEqual(vector_index.query(self.vectors[3], k=3), exact_index.query(self.vectors[3], k=3))
+
+        index_dir = os.path.join(self.directory.name, 'small')
+        vector_index.save(index_dir)
+        vector_index = load_vector_index(index_dir)
+        self.assertFalse(vector_index.is_trained)
+
+        vector_index.add(self.ids[10:], self.vectors[10:])
+        recalled = 0
+        for position in range(0, 2000, 50):
+            matches = vector_index.query(self.vectors[position], k=10)
+            recalled += len({match_id for match_id, _ in matches} & set(self._exact(self.vectors[position], 10)))
+        self.assertTrue(vector_index.is_trained)
+        self.assertEqual((vector_index.lists, vector_index.codebooks.shape[1]), (16, 256))
+        self.assertGreater(recalled / 400, 0.7)
+
+    def test_save_and_load(self):
+        """
+        Testing if a saved index answers like the original and keeps accepting vectors
+        """
+        for vector_index in (BruteForceIndex(32), IVFPQIndex(32, lists=16, subvectors=8)):
+            index_dir = os.path.join(self.directory.name, vector_index.kind)
+            vector_index.add(self.ids[:1500], self.vectors[:1500])
+            vector_index.save(index_dir)
+
+            loaded_index = load_vector_index(index_dir)
+            self.assertIsInstance(loaded_index, type(vector_index))
+            for query_vector in self.vectors[:1500:300]:
+                self.assertEqual(loaded_index.query(query_vector), vector_index.query(query_vector))
+
+            loaded_index.add(self.ids[1500:], self.vectors[1500:])
+            self.assertEqual(len(loaded_index), 2000)
+            self.assertEqual(loaded_index.query(self.vectors[1999], k=1)[0][0], '1999')
+            with self.assertRaises(ValueError):
+                (IVFPQIndex if vector_index.kind == 'brute_force' else BruteForceIndex).load(index_dir)
+
+    def test_similar_images(self):
+        """
+        Testing if similar images are joined with their latest popularity
+        """
+        db_handler = DBHandler(':memory:')
+        db_handler.init_database(FileReader.read_file(SQL_SCHEMA_PATH))
+        db_handler.bulk_insert_to_db('subreddits', {
+            'id': 't5_pics', 'subreddit_name_prefixed': 'r/pics', 'subreddit_subscribers': 10,
+        })
+        for image_id, ups in (('a', 1), ('a', 5), ('b', 7), ('c', 9)):
+            db_handler.bulk_insert_to_db('images', {
+                'id': image_id, 'subreddit_id': 't5_pics', 'image_url': f'https://i.redd.it/{image_id}.jpg',
+                'permalink': f'/r/pics/comments/{image_id}/', 'upload_time': '2020-01-01 12:00:00',
+            })
+            db_handler.bulk_insert_to_db('image_success', {
+                'image_id': image_id, 'ups': ups, 'num_comments': 0, 'gid_1': None, 'gid_2': None,
+                'gid_3': None, 'reddit_sort': 'top', 'reddit_time': 'day',
+                'last_checked': '2020-01-05 00:00:00', 'time_passed': '1:00:00',
+            })
+        db_handler.flush()
+
+        embedding_store = EmbeddingStore(os.path.join(self.directory.name, 'embeddings'), dim=2)
+        embedding_store.append(['a', 'b'], [[1, 0], [0, 1]])
+        vector_index = BruteForceIndex(2)
+        self.assertEqual(EmbeddingDBHelper.update_vector_index(embedding_store, vector_index), 2)
+        embedding_store.append(['c'], [[0.9, 0.1]])
+        self.assertEqual(EmbeddingDBHelper.update_vector_index(embedding_store, vector_index), 1)
+
+        similar = EmbeddingDBHelper.similar_images(db_handler, embedding_store, vector_index, 'a', k=2)
+        self.assertEqual([(post['image_id'], post['ups'], post['subreddit']) for post in similar],
+                         [('a', 5, 'pics'), ('c', 9, 'pics')])
+        other_store = EmbeddingStore(os.path.join(self.directory.name, 'other'), dim=2)
+        with self.assertRaises(ValueError):
+            EmbeddingDBHelper.update_vector_index(other_store, vector_index)
+
+
+if __name__ == '__main__':
+    unittest.main()